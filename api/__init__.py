@@ -14,7 +14,7 @@
 from flask import Flask, request, g, render_template_string
 from flask_cors import CORS
 import os
-from api.lib import config_manager, database_manager, loggerManager
+from api.lib import config_manager, database_manager, migration_manager, json_provider, loggerManager
 
 
 def create_app(test_config=None):
@@ -25,8 +25,12 @@ def create_app(test_config=None):
     # Load configuration
     app = load_configuration(app)
 
+    # JSON encoder of jsonify and of the streamed responses
+    app = json_provider.init_app(app)
+
     # Database
     database_manager.init_app(app=app)
+    migration_manager.init_app(app=app)
 
     # Create instance folder
     app = create_instance_directory(app)
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author:        barnabas
+@email:         barnabasaugustino@gmail.com
+@Description:   In-process cache of the reference data endpoints (specializations, cities, popular specializations,
+                stats). Every worker process owns its cache: entries expire after a TTL, the number of entries is
+                bounded and the least recently used entry is evicted first.
+
+                The data of these endpoints changes only with imports: write paths running in the application call
+                on_import / on_enrichment_write, imports run by external processes are bounded by the TTL.
+
+                With SHARED_CACHE_BACKEND set, a miss is served by the cache shared by all the workers
+                (shared_cache) before running the query.
+
+                conditional_response adds ETag / Last-Modified to GET endpoints from a per-country data version and
+                answers 304 to unchanged polls before the view runs its queries.
+"""
+
+import os
+import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict
+from datetime import timezone
+from flask import current_app, request, make_response, g
+from api.lib import database_manager, sql_queries, shared_cache, loggerManager
+
+# Data read by every cached endpoint: a write invalidates only the endpoints reading the data it touched
+CACHED_ENDPOINTS = {
+    'specializations': {'doctors'},
+    'popular_specializations': {'doctors'},
+    'cities': {'doctors'},
+    'stats': {'doctors'},
+    'data_version': {'doctors', 'enrichment'},
+}
+
+
+class TTLCache(object):
+    """LRU cache with a time to live, shared by the threads of a worker process"""
+
+    def __init__(self, max_entries=256, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def get(self, key):
+        """Returns (True, value) for a fresh entry, (False, None) otherwise"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return self
+
+    def invalidate(self, predicate=None):
+        """Drop the entries whose key matches predicate (all of them without predicate), returns how many"""
+        with self.lock:
+            keys = [key for key in self.entries if predicate is None or predicate(key)]
+            for key in keys:
+                del self.entries[key]
+            self.invalidations += len(keys)
+        return len(keys)
+
+    def status(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """Returns the cache of the current worker process, creating it on first use"""
+    global _cache, _cache_pid
+    with _cache_lock:
+        # A forked worker starts with an empty cache and its own counters
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = TTLCache(max_entries=current_app.config.get('REFERENCE_CACHE_MAX_ENTRIES', 256),
+                              ttl=current_app.config.get('REFERENCE_CACHE_TTL', 300))
+            _cache_pid = os.getpid()
+    return _cache
+
+
+def is_enabled():
+    return current_app.config.get('REFERENCE_CACHE_ENABLED', True) and current_app.config.get('REFERENCE_CACHE_TTL', 300) > 0
+
+
+def make_key(endpoint, country_code, params=None):
+    """(endpoint, country, params) with the params sorted, so equal requests share the entry"""
+    return endpoint, country_code.upper(), tuple(sorted((params or {}).items()))
+
+
+def get_or_load(endpoint, country_code, params, loader):
+    """
+    Returns the cached result of an endpoint, calling loader() on a miss
+    :param endpoint: str, one of CACHED_ENDPOINTS
+    :param country_code: str, country code (DE, IT)
+    :param params: dict, parameters of the query (part of the key)
+    :param loader: callable returning the result; its exceptions are not cached
+    :return: result
+    """
+    # The response is built from cacheable data: compression keeps its compressed body
+    g.cached_data = True
+    load = loader
+    if shared_cache.is_enabled():
+        def load():
+            return shared_cache.get_or_load(endpoint, country_code, params, loader)
+
+    if not is_enabled():
+        return load()
+
+    cache = get_cache()
+    key = make_key(endpoint, country_code, params)
+    found, value = cache.get(key)
+    if found:
+        return value
+
+    value = load()
+    cache.set(key, value)
+    return value
+
+
+def invalidate(country_code=None, endpoints=None):
+    """
+    Drop cached results of the current worker
+    :param country_code: str, only this country (all countries if None)
+    :param endpoints: iterable of endpoint names (all endpoints if None)
+    :return: int, number of dropped entries (per-worker and shared)
+    """
+    # Entries of the other workers: only the shared tier can be reached from here
+    dropped_shared = shared_cache.invalidate(country_code=country_code, endpoints=endpoints)
+    if _cache is None or _cache_pid != os.getpid():
+        return dropped_shared
+    country_code = country_code.upper() if country_code else None
+    endpoints = set(endpoints) if endpoints is not None else None
+
+    def matches(key):
+        endpoint, key_country, params = key
+        return (country_code is None or key_country == country_code) and (endpoints is None or endpoint in endpoints)
+
+    dropped = _cache.invalidate(matches) + dropped_shared
+    if dropped:
+        loggerManager.logger.info(f"Reference cache: dropped {dropped} entries (country={country_code}, endpoints={endpoints})")
+    return dropped
+
+
+def invalidate_data(data, country_code=None):
+    """Drop the cached endpoints reading the given data ('doctors', 'enrichment', ...)"""
+    endpoints = [endpoint for endpoint, reads in CACHED_ENDPOINTS.items() if data in reads]
+    if not endpoints:
+        return 0
+    return invalidate(country_code=country_code, endpoints=endpoints)
+
+
+def on_import(country_code=None):
+    """Hook for the import paths: doctors, clinics, specializations and opinions changed"""
+    return invalidate_data('doctors', country_code=country_code)
+
+
+def on_enrichment_write(country_code=None):
+    """Hook for the enrichment write paths: Google Places data or enrichment attempts changed"""
+    return invalidate_data('enrichment', country_code=country_code)
+
+
+def get_status():
+    """Counters of the cache of the current worker, for monitoring"""
+    return dict(get_cache().status(), enabled=is_enabled(), shared=shared_cache.get_status())
+
+
+def get_data_version(country_code):
+    """
+    Version of the data of a country, from the latest doctors.modified, google_places_data.updated_at and
+    enrichment_attempts.attempted_at. It is kept DATA_VERSION_TTL seconds in the cache of the worker and dropped
+    by on_import / on_enrichment_write, so the other workers see a write after DATA_VERSION_TTL seconds at most.
+    :param country_code: str, country code (DE, IT)
+    :return: dict {'version': str, 'last_modified': datetime (UTC) or None}
+    """
+    country_code = country_code.upper()
+    ttl = current_app.config.get('DATA_VERSION_TTL', 5)
+    key = make_key('data_version', country_code)
+    if ttl > 0:
+        found, value = get_cache().get(key)
+        if found:
+            return value
+
+    query, params = sql_queries.get_data_version_query(country_code=country_code)
+    cursor = database_manager.get_cursor(country_code)
+    database_manager.execute_statement(cursor, query, params)
+    row = cursor.fetchone()
+    changes = [row['doctors_modified'], row['google_places_updated'], row['enrichment_attempted']]
+
+    # HTTP dates have no time zone and a precision of one second: naive timestamps are read as UTC
+    timestamps = [(change if change.tzinfo else change.replace(tzinfo=timezone.utc)).astimezone(timezone.utc)
+                  for change in changes if change is not None]
+    value = {
+        'version': hashlib.sha1('|'.join(str(change) for change in changes).encode('utf-8')).hexdigest()[:16],
+        'last_modified': max(timestamps).replace(microsecond=0) if timestamps else None
+    }
+    if ttl > 0:
+        get_cache().set(key, value, ttl=ttl)
+    return value
+
+
+def get_request_country(args, kwargs):
+    """Country of a view call: country argument of the view, otherwise the country request parameter"""
+    country = kwargs.get('country')
+    if country is None and args and isinstance(args[0], str):
+        country = args[0]
+    if country is None:
+        country = request.args.get('country', 'IT')
+    return str(country).upper()
+
+
+def conditional_response(view):
+    """
+    Decorator of the GET views whose output depends only on the data of a country and on the request URL.
+    The ETag is built from the data version of the country and the URL: a request with a matching If-None-Match
+    (or, without it, an If-Modified-Since not older than the data) gets a 304 without running the view.
+    Other responses get ETag, Last-Modified and Cache-Control: no-cache, so clients revalidate every poll.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # Parameters sent in a body are not part of the URL, hence of the ETag
+        if request.method not in ('GET', 'HEAD') or request.content_length \
+                or not current_app.config.get('CONDITIONAL_RESPONSES', True):
+            return view(*args, **kwargs)
+
+        country = get_request_country(args, kwargs)
+        if country not in ['DE', 'IT'] or not database_manager.is_country_configured(country):
+            # The view answers with the proper error
+            return view(*args, **kwargs)
+
+        try:
+            data_version = get_data_version(country)
+        except Exception as e:
+            loggerManager.logger.error(f"Data version not available for country {country}: {e}")
+            return view(*args, **kwargs)
+
+        etag = hashlib.sha1(f"{country}:{data_version['version']}:{request.full_path}".encode('utf-8')).hexdigest()[:32]
+        last_modified = data_version['last_modified']
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = bool(last_modified and request.if_modified_since and last_modified <= request.if_modified_since)
+
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author:        barnabas
+@email:         barnabasaugustino@gmail.com
+@Description:   Compression of the responses of the api and enhanced_api blueprints (after_request hook). The encoding
+                is negotiated from Accept-Encoding: br (brotli, needs the optional brotli package) or gzip. Only
+                bodies of at least COMPRESSION_MIN_SIZE bytes are compressed, smaller ones would not gain much.
+                Streamed responses (NDJSON) are sent as they are, so every line still reaches the client when ready.
+
+                Responses built from the reference cache (cache_manager.get_or_load) are compressed once: the
+                compressed body is kept by the worker, keyed by encoding and hash of the body, and reused while
+                the same body is served.
+"""
+
+import os
+import gzip
+import hashlib
+import threading
+from flask import current_app, request, g
+from api.lib import cache_manager
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts both with the same quality
+ENCODINGS = ('br', 'gzip')
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml', 'image/svg+xml'
+}
+
+_compressed_cache = None
+_compressed_cache_pid = None
+_compressed_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    return current_app.config.get('COMPRESSION_ENABLED', True)
+
+
+def get_compressed_cache():
+    """Compressed bodies of the cached responses of the current worker process, created on first use"""
+    global _compressed_cache, _compressed_cache_pid
+    with _compressed_cache_lock:
+        if _compressed_cache is None or _compressed_cache_pid != os.getpid():
+            _compressed_cache = cache_manager.TTLCache(
+                max_entries=current_app.config.get('COMPRESSION_CACHE_MAX_ENTRIES', 64),
+                ttl=current_app.config.get('REFERENCE_CACHE_TTL', 300))
+            _compressed_cache_pid = os.getpid()
+    return _compressed_cache
+
+
+def choose_encoding():
+    """Content coding accepted by the client (highest quality, br first on ties), None for identity"""
+    accepted = request.accept_encodings
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        quality = accepted.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=current_app.config.get('COMPRESSION_BROTLI_QUALITY', 4))
+    return gzip.compress(data, compresslevel=current_app.config.get('COMPRESSION_GZIP_LEVEL', 6), mtime=0)
+
+
+def is_compressible(response):
+    return (200 <= response.status_code < 300 and response.status_code != 204
+            and not response.direct_passthrough and not response.is_streamed
+            and 'Content-Encoding' not in response.headers
+            and (response.mimetype in COMPRESSIBLE_MIMETYPES or response.mimetype.startswith('text/')))
+
+
+def compress_response(response):
+    """after_request hook of the blueprints: compress the body when the client accepts it and it is large enough"""
+    if not is_enabled() or not is_compressible(response):
+        return response
+
+    # The representation depends on Accept-Encoding even when it is sent uncompressed
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+    data = response.get_data()
+    if len(data) < current_app.config.get('COMPRESSION_MIN_SIZE', 1024):
+        return response
+
+    if g.get('cached_data'):
+        cache = get_compressed_cache()
+        key = (encoding, hashlib.sha1(data).hexdigest())
+        found, compressed = cache.get(key)
+        if not found:
+            compressed = compress(data, encoding)
+            cache.set(key, compressed)
+    else:
+        compressed = compress(data, encoding)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def get_status():
+    """Compression settings and counters of the compressed bodies cache of the current worker, for monitoring"""
+    return dict(get_compressed_cache().status(), enabled=is_enabled(),
+                encodings=[encoding for encoding in ENCODINGS if encoding != 'br' or brotli is not None],
+                min_size=current_app.config.get('COMPRESSION_MIN_SIZE', 1024))
@@ -42,6 +42,63 @@ class Configuration(object):
         }
     }
 
+    # Connection pool, one per country database in every worker process
+    DATABASE_POOL_MIN_SIZE = int(os.environ.get('DATABASE_POOL_MIN_SIZE') if os.environ.get('DATABASE_POOL_MIN_SIZE') else config.get('DATABASE_POOL_MIN_SIZE') or 1)
+    DATABASE_POOL_MAX_SIZE = int(os.environ.get('DATABASE_POOL_MAX_SIZE') if os.environ.get('DATABASE_POOL_MAX_SIZE') else config.get('DATABASE_POOL_MAX_SIZE') or 10)
+    # Seconds of inactivity after which a connection is pinged before being handed out
+    DATABASE_POOL_HEALTH_CHECK_INTERVAL = int(os.environ.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL') if os.environ.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL') else config.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL') or 30)
+
+    # Server-side prepared statements, cached per pooled connection (disable behind pgbouncer transaction pooling)
+    DATABASE_PREPARED_STATEMENTS = (os.environ.get('DATABASE_PREPARED_STATEMENTS') if os.environ.get('DATABASE_PREPARED_STATEMENTS') else config.get('DATABASE_PREPARED_STATEMENTS') or 'true').lower() in ('1', 'true', 'yes')
+    DATABASE_PREPARED_STATEMENTS_MAX = int(os.environ.get('DATABASE_PREPARED_STATEMENTS_MAX') if os.environ.get('DATABASE_PREPARED_STATEMENTS_MAX') else config.get('DATABASE_PREPARED_STATEMENTS_MAX') or 100)
+
+    # Batch of complete doctor profiles: max doctors per request and doctors loaded per group of section queries
+    COMPLETE_PROFILE_BATCH_MAX = int(os.environ.get('COMPLETE_PROFILE_BATCH_MAX') if os.environ.get('COMPLETE_PROFILE_BATCH_MAX') else config.get('COMPLETE_PROFILE_BATCH_MAX') or 200)
+    COMPLETE_PROFILE_BATCH_CHUNK = int(os.environ.get('COMPLETE_PROFILE_BATCH_CHUNK') if os.environ.get('COMPLETE_PROFILE_BATCH_CHUNK') else config.get('COMPLETE_PROFILE_BATCH_CHUNK') or 25)
+
+    # In-process cache of the reference data endpoints (specializations, cities, popular specializations, stats)
+    REFERENCE_CACHE_ENABLED = (os.environ.get('REFERENCE_CACHE_ENABLED') if os.environ.get('REFERENCE_CACHE_ENABLED') else config.get('REFERENCE_CACHE_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL') if os.environ.get('REFERENCE_CACHE_TTL') else config.get('REFERENCE_CACHE_TTL') or 300)
+    REFERENCE_CACHE_MAX_ENTRIES = int(os.environ.get('REFERENCE_CACHE_MAX_ENTRIES') if os.environ.get('REFERENCE_CACHE_MAX_ENTRIES') else config.get('REFERENCE_CACHE_MAX_ENTRIES') or 256)
+
+    # Cache shared by all the workers, behind the per-worker one: '' (disabled), 'sqlite' or 'redis'
+    SHARED_CACHE_BACKEND = os.environ.get('SHARED_CACHE_BACKEND') if os.environ.get('SHARED_CACHE_BACKEND') else config.get('SHARED_CACHE_BACKEND') or ''
+    SHARED_CACHE_PATH = os.environ.get('SHARED_CACHE_PATH') if os.environ.get('SHARED_CACHE_PATH') else config.get('SHARED_CACHE_PATH')
+    SHARED_CACHE_REDIS_URL = os.environ.get('SHARED_CACHE_REDIS_URL') if os.environ.get('SHARED_CACHE_REDIS_URL') else config.get('SHARED_CACHE_REDIS_URL')
+    # Seconds an entry is fresh (REFERENCE_CACHE_TTL when not set), then served stale while one worker refreshes it
+    SHARED_CACHE_TTL = int(os.environ.get('SHARED_CACHE_TTL') if os.environ.get('SHARED_CACHE_TTL') else config.get('SHARED_CACHE_TTL') or 0)
+    SHARED_CACHE_STALE_TTL = int(os.environ.get('SHARED_CACHE_STALE_TTL') if os.environ.get('SHARED_CACHE_STALE_TTL') else config.get('SHARED_CACHE_STALE_TTL') or 3600)
+    SHARED_CACHE_LOCK_TIMEOUT = int(os.environ.get('SHARED_CACHE_LOCK_TIMEOUT') if os.environ.get('SHARED_CACHE_LOCK_TIMEOUT') else config.get('SHARED_CACHE_LOCK_TIMEOUT') or 30)
+    # Seconds a worker waits for an entry another worker is computing before running the query itself
+    SHARED_CACHE_WAIT_TIMEOUT = float(os.environ.get('SHARED_CACHE_WAIT_TIMEOUT') if os.environ.get('SHARED_CACHE_WAIT_TIMEOUT') else config.get('SHARED_CACHE_WAIT_TIMEOUT') or 5)
+
+    # ETag / Last-Modified on the doctor and reference endpoints, and seconds a worker reuses the data version
+    CONDITIONAL_RESPONSES = (os.environ.get('CONDITIONAL_RESPONSES') if os.environ.get('CONDITIONAL_RESPONSES') else config.get('CONDITIONAL_RESPONSES') or 'true').lower() in ('1', 'true', 'yes')
+    DATA_VERSION_TTL = int(os.environ.get('DATA_VERSION_TTL') if os.environ.get('DATA_VERSION_TTL') else config.get('DATA_VERSION_TTL') or 5)
+
+    # Rows per multi-row INSERT of the batch write endpoints (enrichment attempts, Google Places)
+    BATCH_INSERT_PAGE_SIZE = int(os.environ.get('BATCH_INSERT_PAGE_SIZE') if os.environ.get('BATCH_INSERT_PAGE_SIZE') else config.get('BATCH_INSERT_PAGE_SIZE') or 1000)
+
+    # Rows fetched per round trip by the server-side cursors of the streamed (NDJSON) responses and by run_query
+    STREAM_FETCH_SIZE = int(os.environ.get('STREAM_FETCH_SIZE') if os.environ.get('STREAM_FETCH_SIZE') else config.get('STREAM_FETCH_SIZE') or 500)
+    # Queries slower than this (milliseconds, execute and fetch) are logged with their timing
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS') if os.environ.get('SLOW_QUERY_MS') else config.get('SLOW_QUERY_MS') or 1000)
+
+    # JSON encoder of the responses: 'auto' (orjson when installed), 'orjson' or 'stdlib'
+    JSON_BACKEND = os.environ.get('JSON_BACKEND') if os.environ.get('JSON_BACKEND') else config.get('JSON_BACKEND') or 'auto'
+    # Datetimes in the responses: 'http' (HTTP dates, as the stdlib encoder of Flask) or 'iso' (ISO 8601)
+    JSON_DATETIME_FORMAT = os.environ.get('JSON_DATETIME_FORMAT') if os.environ.get('JSON_DATETIME_FORMAT') else config.get('JSON_DATETIME_FORMAT') or 'http'
+    # /doctors and /doctors/search items built as JSON by Postgres and passed through (only with http datetimes)
+    SQL_JSON_ITEMS = (os.environ.get('SQL_JSON_ITEMS') if os.environ.get('SQL_JSON_ITEMS') else config.get('SQL_JSON_ITEMS') or 'true').lower() in ('1', 'true', 'yes')
+
+    # gzip / br compression of the api and enhanced_api responses of at least COMPRESSION_MIN_SIZE bytes
+    COMPRESSION_ENABLED = (os.environ.get('COMPRESSION_ENABLED') if os.environ.get('COMPRESSION_ENABLED') else config.get('COMPRESSION_ENABLED') or 'true').lower() in ('1', 'true', 'yes')
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE') if os.environ.get('COMPRESSION_MIN_SIZE') else config.get('COMPRESSION_MIN_SIZE') or 1024)
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL') if os.environ.get('COMPRESSION_GZIP_LEVEL') else config.get('COMPRESSION_GZIP_LEVEL') or 6)
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY') if os.environ.get('COMPRESSION_BROTLI_QUALITY') else config.get('COMPRESSION_BROTLI_QUALITY') or 4)
+    # Compressed bodies of the responses of the reference cache kept by every worker
+    COMPRESSION_CACHE_MAX_ENTRIES = int(os.environ.get('COMPRESSION_CACHE_MAX_ENTRIES') if os.environ.get('COMPRESSION_CACHE_MAX_ENTRIES') else config.get('COMPRESSION_CACHE_MAX_ENTRIES') or 64)
+
     # Legacy database configuration (for backward compatibility)
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') if os.environ.get('DATABASE_URI') else config.get('DATABASE_URI')
     DB_SERVER = os.environ.get('DB_ENGINE') if os.environ.get('DB_ENGINE') else config.get('DB_ENGINE')
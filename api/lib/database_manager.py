@@ -15,8 +15,17 @@ from flask import current_app, g, request, abort
 from flask.cli import with_appcontext
 import time
 import os
+import re
+import atexit
+import uuid
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
 import psycopg2
 import psycopg2.extras
+import psycopg2.pool
+import psycopg2.errors
 from sqlalchemy import create_engine, text
 from dotenv import dotenv_values
 # Internal dependencies
@@ -81,10 +90,10 @@ class DbInitializePostgres(object):
         return self
 
     def create_tables(self):
+        # Imported here: migration_manager depends on this module
+        from api.lib import migration_manager
         self.connect_db()
-        queries = os.path.join('setup_tables.sql')
-        with open(queries, 'r') as f:
-            self.cursor.execute(f.read())
+        migration_manager.upgrade_connection(self.conn, label=f"database {self.db_name}")
         self.close_conn()
         return self
 
@@ -92,27 +101,20 @@ class DbInitializePostgres(object):
 class ExecuteQueries(DbInitializePostgres):
     def __init__(self):
         super(ExecuteQueries, self).__init__()
-        self.query_result = None
+        self.query_result = QueryResult()
 
-    def execute_query(self, query, country_code=None):
+    def execute_query(self, query, country_code=None, params=None):
         """
         :Description: Execute only insert or update query commands
         :param query: str, query to be executed
         :param country_code: str, country code (DE, IT) for multi-database support
-        :return: Inserted or updated record
+        :param params: dict, values of the %(name)s placeholders of the query
+        :return: self, with the rows in query_result (QueryResult)
         """
         try:
             if query:
-                # Use country-specific cursor if available, otherwise default cursor
-                cursor = getattr(g, f'cursor_{country_code.lower()}', g.cursor) if country_code else g.cursor
-                cursor.execute(query)
-                self.query_result = cursor.fetchall()
-                if len(self.query_result) == 1:
-                    self.query_result = dict(self.query_result[0])
-                elif len(self.query_result) > 1:
-                    self.query_result = [dict(record) for record in self.query_result]
-                else:
-                    self.query_result = None
+                # Use the country-specific connection if available, otherwise the default country one
+                self.query_result = run_query(country_code or get_default_country(), query, params)
 
         except Exception as e:
             err_msg = f'Error in execute_query: {query}: {e}'
@@ -126,6 +128,18 @@ class ExecuteQueries(DbInitializePostgres):
                 abort(err_msg)
         return self
 
+    def iter_query(self, query, country_code=None, params=None, row_type=None):
+        """
+        :Description: Iterate the rows of a query in bounded memory, with a server-side cursor (see stream_query).
+                      Nothing runs until the iteration starts.
+        :param query: str, query to be executed
+        :param country_code: str, country code (DE, IT) for multi-database support
+        :param params: dict, values of the %(name)s placeholders of the query
+        :param row_type: None for RealDictRow, Row for tuple rows sharing the column index
+        :return: generator of rows
+        """
+        return stream_query(country_code or get_default_country(), query, params, row_type=row_type)
+
 
 def get_db_config(country_code):
     """Get database configuration for specific country"""
@@ -133,6 +147,257 @@ def get_db_config(country_code):
     return db_params.get(country_code.upper(), {})
 
 
+def is_db_config_complete(db_config):
+    """Check that all the connection parameters of a country are present"""
+    required_fields = ['host', 'port', 'user', 'password', 'db_name']
+    return bool(db_config) and all(db_config.get(field) for field in required_fields)
+
+
+class PreparedStatementsConnection(psycopg2.extensions.connection):
+    """psycopg2 connection remembering the statements prepared in its server session"""
+
+    def __init__(self, *args, **kwargs):
+        super(PreparedStatementsConnection, self).__init__(*args, **kwargs)
+        # statement name -> names of its parameters, in $n order (least recently used first)
+        self.prepared_statements = OrderedDict()
+
+
+PARAMETER_PATTERN = re.compile(r"%\((\w+)\)s|%%")
+
+
+def to_prepared_statement(query):
+    """
+    :Description: Convert a query using %(name)s placeholders to the $n form required by PREPARE
+    :param query: str, query built by sql_queries
+    :return: tuple (query with $n placeholders, list of parameter names in $n order)
+    """
+    names = []
+
+    def replace(match):
+        name = match.group(1)
+        if name is None:
+            return '%'
+        if name not in names:
+            names.append(name)
+        return f'${names.index(name) + 1}'
+
+    return PARAMETER_PATTERN.sub(replace, query), names
+
+
+def statement_name(query):
+    """Stable name of a prepared statement, derived from the query text"""
+    return 'mi_' + hashlib.md5(query.encode('utf-8')).hexdigest()
+
+
+def execute_statement(cursor, query, params=None):
+    """
+    :Description: Execute a query on a request cursor. The query is prepared once per pooled connection and then
+                  run with EXECUTE, so Postgres parses and plans it once instead of on every request.
+                  Plain execution is used when DATABASE_PREPARED_STATEMENTS is disabled.
+    :param cursor: psycopg2 cursor
+    :param query: str, query with %(name)s placeholders
+    :param params: dict, values of the placeholders
+    :return: cursor
+    """
+    connection = cursor.connection
+    if not current_app.config.get('DATABASE_PREPARED_STATEMENTS', True) \
+            or not isinstance(connection, PreparedStatementsConnection):
+        cursor.execute(query, params)
+        return cursor
+
+    name = statement_name(query)
+    try:
+        _execute_prepared(cursor, name, query, params)
+    except (psycopg2.errors.InvalidSqlStatementName, psycopg2.errors.FeatureNotSupported) as e:
+        # The session lost the statement (DISCARD ALL) or the schema changed under it
+        # ("cached plan must not change result type"): prepare it again, once
+        if not connection.autocommit:
+            raise
+        loggerManager.logger.warning(f"Preparing statement {name} again: {e}")
+        _deallocate(cursor, name)
+        _execute_prepared(cursor, name, query, params)
+    return cursor
+
+
+def _execute_prepared(cursor, name, query, params):
+    statements = cursor.connection.prepared_statements
+    if name in statements:
+        statements.move_to_end(name)
+    else:
+        prepared_query, parameter_names = to_prepared_statement(query)
+        cursor.execute(f'PREPARE {name} AS {prepared_query}')
+        statements[name] = parameter_names
+        # At least the statement just prepared is kept, even with DATABASE_PREPARED_STATEMENTS_MAX=0
+        max_statements = max(current_app.config.get('DATABASE_PREPARED_STATEMENTS_MAX', 100), 1)
+        while len(statements) > max_statements:
+            _deallocate(cursor, next(iter(statements)))
+
+    parameter_names = statements[name]
+    if parameter_names:
+        placeholders = ', '.join(['%s'] * len(parameter_names))
+        cursor.execute(f'EXECUTE {name} ({placeholders})', [params[key] for key in parameter_names])
+    else:
+        cursor.execute(f'EXECUTE {name}')
+
+
+def _deallocate(cursor, name):
+    if cursor.connection.prepared_statements.pop(name, None) is not None:
+        try:
+            cursor.execute(f'DEALLOCATE {name}')
+        except psycopg2.errors.InvalidSqlStatementName:
+            pass
+
+
+class CountryConnectionPool(object):
+    """Pool of psycopg2 connections to one country database, owned by a single worker process"""
+
+    def __init__(self, country_code, host=None, port=None, user=None, password=None, db_name=None,
+                 min_size=1, max_size=10, health_check_interval=30):
+        self.country_code = country_code.upper()
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.db_name = db_name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.pool = None
+        self.last_used = {}
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Open the pool on first use (min_size connections are created here)"""
+        with self.lock:
+            if self.pool is None or self.pool.closed:
+                loggerManager.logger.info(f"Opening connection pool for {self.country_code} database at "
+                                          f"{self.host}:{self.port} (min={self.min_size}, max={self.max_size})")
+                self.pool = psycopg2.pool.ThreadedConnectionPool(
+                    self.min_size, self.max_size,
+                    host=self.host, port=self.port, dbname=self.db_name, user=self.user, password=self.password,
+                    connection_factory=PreparedStatementsConnection
+                )
+        return self
+
+    def get_conn(self):
+        """Check out a healthy connection, replacing the broken ones"""
+        self.connect()
+        for i in range(self.max_size + 1):
+            conn = self.pool.getconn()
+            if not conn.closed and not conn.autocommit:
+                # Same behaviour as the connections opened by DbInitializePostgres
+                conn.autocommit = True
+            if self.is_healthy(conn):
+                return conn
+            loggerManager.logger.warning(f"Discarding broken connection from {self.country_code} pool")
+            self.last_used.pop(id(conn), None)
+            self.pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError(f"No healthy connection available for country: {self.country_code}")
+
+    def put_conn(self, conn, close=False):
+        """Give a connection back to the pool"""
+        if self.pool is None or self.pool.closed:
+            conn.close()
+            return self
+        close = close or bool(conn.closed)
+        if close:
+            self.last_used.pop(id(conn), None)
+        else:
+            self.last_used[id(conn)] = time.monotonic()
+        self.pool.putconn(conn, close=close)
+        return self
+
+    def is_healthy(self, conn):
+        """Connections idle for longer than health_check_interval are pinged before use"""
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        last_used = self.last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error as e:
+            loggerManager.logger.warning(f"Health check failed for {self.country_code} connection: {e}")
+            return False
+
+    def close_all(self):
+        if self.pool is not None and not self.pool.closed:
+            self.pool.closeall()
+        self.last_used.clear()
+        return self
+
+    def status(self):
+        opened = self.pool is not None and not self.pool.closed
+        return {
+            'opened': opened,
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'idle': len(self.pool._pool) if opened else 0,
+            'in_use': len(self.pool._used) if opened else 0
+        }
+
+
+_country_pools = {}
+_country_pools_pid = None
+_country_pools_lock = threading.Lock()
+
+
+def get_country_pool(country_code):
+    """Returns the connection pool of a country, creating it lazily in the current worker process"""
+    global _country_pools_pid
+    country_code = country_code.upper()
+    with _country_pools_lock:
+        # Pools must never be shared across a fork: start from scratch in a new worker
+        if _country_pools_pid != os.getpid():
+            _country_pools.clear()
+            _country_pools_pid = os.getpid()
+
+        country_pool = _country_pools.get(country_code)
+        if country_pool is None:
+            db_config = get_db_config(country_code)
+            if not is_db_config_complete(db_config):
+                raise ValueError(f"Database configuration not found for country: {country_code}")
+
+            country_pool = CountryConnectionPool(
+                country_code,
+                host=db_config.get('host'),
+                port=db_config.get('port'),
+                user=db_config.get('user'),
+                password=db_config.get('password'),
+                db_name=db_config.get('db_name'),
+                min_size=current_app.config.get('DATABASE_POOL_MIN_SIZE', 1),
+                max_size=current_app.config.get('DATABASE_POOL_MAX_SIZE', 10),
+                health_check_interval=current_app.config.get('DATABASE_POOL_HEALTH_CHECK_INTERVAL', 30)
+            )
+            _country_pools[country_code] = country_pool
+    return country_pool
+
+
+def get_pools_status():
+    """Status of the pools opened by the current worker"""
+    if _country_pools_pid != os.getpid():
+        return {}
+    return {country_code: country_pool.status() for country_code, country_pool in _country_pools.items()}
+
+
+def close_all_pools():
+    """Close every pooled connection of the current worker"""
+    if _country_pools_pid != os.getpid():
+        return
+    for country_pool in _country_pools.values():
+        try:
+            country_pool.close_all()
+        except Exception as e:
+            loggerManager.logger.error(f"Error closing connection pool for {country_pool.country_code}: {e}")
+
+
+atexit.register(close_all_pools)
+
+
 def connect_db(country_code=None):
     """Returns engine, connector and cursor for specific country"""
     if country_code:
@@ -158,40 +423,216 @@ def connect_db(country_code=None):
     return pg.engine, pg.conn, pg.cursor
 
 
-def connect_all_country_dbs():
-    """Connect to all configured country databases"""
-    connections = {}
+def is_country_configured(country_code):
+    """Check that the database of a country can be used (no connection is opened)"""
+    return is_db_config_complete(get_db_config(country_code))
+
+
+def get_default_country():
+    """First configured country, used when a query does not specify one"""
+    for country_code in current_app.config.get('DATABASE_PARAMS', {}).keys():
+        if is_country_configured(country_code):
+            return country_code
+    raise ValueError("No country database configured")
+
+
+def get_connection(country_code):
+    """
+    :Description: Returns the connection of a country for the current request, checking it out of the
+                  pool on first use. It is given back to the pool in the request teardown.
+    :param country_code: str, country code (DE, IT)
+    :return: psycopg2 connection
+    """
+    return _acquire(country_code)['conn']
+
+
+def get_cursor(country_code):
+    """
+    :Description: Returns the RealDictCursor of a country for the current request (see get_connection)
+    :param country_code: str, country code (DE, IT)
+    :return: psycopg2 RealDictCursor
+    """
+    return _acquire(country_code)['cursor']
+
+
+def _acquire(country_code):
+    if not country_code:
+        raise ValueError("Country code is required to get a database connection")
+    country_code = country_code.lower()
+    if '_db_connections' not in g:
+        g._db_connections = {}
+
+    connection = g._db_connections.get(country_code)
+    if connection is None:
+        if not is_country_configured(country_code):
+            raise ValueError(f"Database configuration not found for country: {country_code.upper()}")
+        conn = get_country_pool(country_code).get_conn()
+        connection = {
+            'conn': conn,
+            'cursor': conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        }
+        g._db_connections[country_code] = connection
+        g.db_connected = True
+        loggerManager.logger.info(f"Checked out pooled connection for {country_code} database")
+    return connection
+
+
+@contextmanager
+def transaction(country_code):
+    """
+    :Description: Run the statements of the block on the request connection of a country in one transaction:
+                  committed at the end of the block, rolled back if it raises. A nested block joins the outer one.
+    :param country_code: str, country code (DE, IT)
+    :return: psycopg2 RealDictCursor of the request connection
+    """
+    connection = _acquire(country_code)
+    conn = connection['conn']
+    if not conn.autocommit:
+        yield connection['cursor']
+        return
+
+    conn.autocommit = False
     try:
-        db_params = current_app.config.get('DATABASE_PARAMS', {})
-        loggerManager.logger.info(f"Found database parameters for countries: {list(db_params.keys())}")
-        
-        for country_code in db_params.keys():
-            try:
-                db_config = db_params[country_code]
-                
-                # Check if all required config is present
-                required_fields = ['host', 'port', 'user', 'password', 'db_name']
-                if not all(db_config.get(field) for field in required_fields):
-                    loggerManager.logger.warning(f"Incomplete database configuration for country {country_code}")
-                    continue
-                    
-                loggerManager.logger.info(f"Attempting to connect to {country_code} database at {db_config.get('host')}:{db_config.get('port')}")
-                
-                engine, conn, cursor = connect_db(country_code)
-                connections[country_code.lower()] = {
-                    'engine': engine,
-                    'conn': conn,
-                    'cursor': cursor
-                }
-                loggerManager.logger.info(f"Successfully connected to database for country: {country_code}")
-            except Exception as e:
-                loggerManager.logger.error(f"Failed to connect to database for country {country_code}: {e}")
-                
-    except Exception as e:
-        loggerManager.logger.error(f"Error connecting to country databases: {e}")
-    
-    loggerManager.logger.info(f"Successfully connected to {len(connections)} databases: {list(connections.keys())}")
-    return connections
+        yield connection['cursor']
+        conn.commit()
+    except BaseException:
+        # Also GeneratorExit, when a streamed response is closed before its end
+        conn.rollback()
+        raise
+    finally:
+        # Pooled connections are always in autocommit outside of a transaction block
+        if not conn.closed:
+            conn.autocommit = True
+
+
+class Row(tuple):
+    """
+    Row of a streamed result: a tuple of values and the column index shared by all the rows of the result
+    (see row_class), so a row costs one tuple instead of one dict. It is read like a dict (row['doctor_id'],
+    row.get('city_name'), 'clinics' in row, dict(row)) or by position (row[0]).
+    A Row is serialized to JSON as a list and cannot be pickled: convert it with dict(row) first.
+    """
+    __slots__ = ()
+    columns = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self.columns[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        index = self.columns.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def keys(self):
+        return self.columns.keys()
+
+    def items(self):
+        return zip(self.columns, self)
+
+
+_row_classes = {}
+
+
+def row_class(columns):
+    """Row subclass with the column index of a result, one per distinct list of columns"""
+    columns = tuple(columns)
+    cls = _row_classes.get(columns)
+    if cls is None:
+        cls = type('Row', (Row,), {'__slots__': (), 'columns': {name: index for index, name in enumerate(columns)}})
+        _row_classes[columns] = cls
+    return cls
+
+
+class QueryResult(list):
+    """
+    Result of run_query: the rows as plain dicts, always a list (empty without rows), with the columns and the
+    time spent executing and fetching the query. The dicts are built once from the fetched tuples.
+    It is serialized to JSON and pickled as a list.
+    """
+
+    def __init__(self, rows=(), columns=(), elapsed_ms=None):
+        super(QueryResult, self).__init__(rows)
+        self.columns = list(columns)
+        self.elapsed_ms = elapsed_ms
+
+    def first(self):
+        """First row, None without rows"""
+        return self[0] if self else None
+
+
+def run_query(country_code, query, params=None, fetch_size=None):
+    """
+    :Description: Execute a query on the request connection of a country (see execute_statement) and read its rows
+                  fetch_size at a time into a QueryResult. Queries slower than SLOW_QUERY_MS are logged.
+    :param country_code: str, country code (DE, IT)
+    :param query: str, query with %(name)s placeholders
+    :param params: dict, values of the placeholders
+    :param fetch_size: int, rows per fetchmany (STREAM_FETCH_SIZE by default)
+    :return: QueryResult
+    """
+    fetch_size = fetch_size or current_app.config.get('STREAM_FETCH_SIZE', 500)
+    # Tuple cursor on the request connection (same transaction): rows become dicts without a RealDictRow in between
+    cursor = get_connection(country_code).cursor()
+    try:
+        start = time.perf_counter()
+        execute_statement(cursor, query, params)
+        result = QueryResult(columns=[column.name for column in cursor.description or ()])
+        if cursor.description:
+            columns = result.columns
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                result.extend(dict(zip(columns, row)) for row in rows)
+        result.elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    finally:
+        cursor.close()
+
+    if result.elapsed_ms >= current_app.config.get('SLOW_QUERY_MS', 1000):
+        loggerManager.logger.warning(f"Slow query {statement_name(query)} on {country_code.upper()}: "
+                                     f"{result.elapsed_ms} ms, {len(result)} rows")
+    return result
+
+
+def stream_query(country_code, query, params=None, fetch_size=None, row_type=None):
+    """
+    :Description: Iterate the rows of a query with a server-side (named) cursor on the request connection of a
+                  country, fetching fetch_size rows at a time, so a large result is never held in memory.
+                  The cursor lives in a transaction (see transaction): consume the generator or close it before
+                  running other statements on the same connection.
+    :param country_code: str, country code (DE, IT)
+    :param query: str, query with %(name)s placeholders
+    :param params: dict, values of the placeholders
+    :param fetch_size: int, rows per round trip (STREAM_FETCH_SIZE by default)
+    :param row_type: None for RealDictRow, Row for tuple rows sharing the column index
+    :return: generator of rows
+    """
+    fetch_size = fetch_size or current_app.config.get('STREAM_FETCH_SIZE', 500)
+    with transaction(country_code) as request_cursor:
+        # Named cursors are not prepared: DECLARE ... CURSOR FOR EXECUTE is not supported
+        cursor = request_cursor.connection.cursor(
+            name=f"stream_{uuid.uuid4().hex}",
+            cursor_factory=None if row_type is Row else psycopg2.extras.RealDictCursor
+        )
+        try:
+            cursor.execute(query, params)
+            make_row = None
+            while True:
+                rows = cursor.fetchmany(fetch_size)
+                if not rows:
+                    break
+                if row_type is Row:
+                    # The description of a named cursor is known after the first fetch
+                    make_row = make_row or row_class(column.name for column in cursor.description)
+                    rows = map(make_row, rows)
+                yield from rows
+        finally:
+            if cursor.connection.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+                cursor.close()
 
 
 def close_db(engine, connector, cursor):
@@ -206,25 +647,26 @@ def close_db(engine, connector, cursor):
         loggerManager.logger.error(f"Error closing database connection: {e}")
 
 
+def release_db(country_code, connector, cursor):
+    """Close the cursor and give the connection back to the country pool"""
+    try:
+        if cursor is not None and not cursor.closed:
+            cursor.close()
+    except Exception as e:
+        loggerManager.logger.error(f"Error closing cursor for country {country_code}: {e}")
+    try:
+        get_country_pool(country_code).put_conn(connector)
+    except Exception as e:
+        loggerManager.logger.error(f"Error releasing database connection for country {country_code}: {e}")
+
+
 def close_all_db_connections():
-    """Close all database connections"""
+    """Give all the connections acquired by the request back to their pools"""
     try:
-        # Close country-specific connections
-        for country in ['de', 'it']:
-            if hasattr(g, f'engine_{country}'):
-                close_db(
-                    getattr(g, f'engine_{country}'),
-                    getattr(g, f'conn_{country}'),
-                    getattr(g, f'cursor_{country}')
-                )
-                delattr(g, f'engine_{country}')
-                delattr(g, f'conn_{country}')
-                delattr(g, f'cursor_{country}')
-        
-        # Close default connection if exists
-        if hasattr(g, 'engine'):
-            close_db(g.engine, g.conn, g.cursor)
-            
+        connections = g.pop('_db_connections', None) or {}
+        for country_code, connection in connections.items():
+            release_db(country_code, connection['conn'], connection['cursor'])
+            loggerManager.logger.debug(f"Released {country_code} database connection")
         g.db_connected = False
     except Exception as e:
         loggerManager.logger.error(f"Error closing all database connections: {e}")
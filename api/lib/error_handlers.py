@@ -20,10 +20,9 @@ class InvalidAPIUsage(Exception):
         self.message = message
         self.status_code = status_code
         self.payload = payload
-        # Disconnect from db
+        # Give the connections back to the pools
         if g.get("db_connected"):
-            database_manager.close_db(g.engine, g.conn, g.cursor)
-            g.db_connected = False
+            database_manager.close_all_db_connections()
 
     def to_dict(self):
         rv = dict(self.payload or ())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author:        barnabas
+@email:         barnabasaugustino@gmail.com
+@Description:   JSON provider of the application (app.json), used by jsonify, by the NDJSON streams and to parse the
+                request bodies. JSON_BACKEND selects the encoder:
+
+                    auto     orjson when it is installed, the standard library otherwise
+                    orjson   orjson, needs the optional orjson package
+                    stdlib   the json module of the standard library, as Flask does by default
+
+                Both backends write the same documents as the default provider of Flask: sorted keys, Decimal and UUID
+                as strings, datetime and date as HTTP dates, tuples as lists. They also write numpy arrays and scalars
+                as lists and numbers. With JSON_DATETIME_FORMAT=iso datetimes are written as ISO 8601 instead, which
+                orjson does natively. orjson does not escape non-ASCII characters: the body is UTF-8, as declared by
+                the mimetype.
+"""
+
+import json
+import uuid
+import decimal
+import dataclasses
+from datetime import date, datetime, time, timezone
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+from api.lib import loggerManager
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+DATETIME_FORMATS = ('http', 'iso')
+
+WEEKDAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """werkzeug.http.http_date of a datetime or date (naive values are UTC), without going through email.utils"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        return f"{WEEKDAYS[value.weekday()]}, {value.day:02d} {MONTHS[value.month - 1]} {value.year:04d} " \
+               f"{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT"
+    return f"{WEEKDAYS[value.weekday()]}, {value.day:02d} {MONTHS[value.month - 1]} {value.year:04d} 00:00:00 GMT"
+
+
+def default_http(o):
+    """Types json and orjson do not write, as the default provider of Flask writes them"""
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if isinstance(o, time):
+        return o.isoformat()
+    # Tuple subclasses (database_manager.Row) are lists for json, orjson writes only tuple itself
+    if isinstance(o, tuple):
+        return list(o)
+    # numpy arrays and scalars, without importing numpy
+    if hasattr(o, 'tolist'):
+        return o.tolist()
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def default_iso(o):
+    """As default_http, with datetime, date and time in ISO 8601"""
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    return default_http(o)
+
+
+class MedInsightJSONProvider(DefaultJSONProvider):
+    """DefaultJSONProvider writing with orjson when available, see the module description"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = (app.config.get('JSON_BACKEND') or 'auto').lower()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown JSON_BACKEND: {backend}, supported backends: {', '.join(BACKENDS)}")
+        if backend == 'orjson' and orjson is None:
+            raise ValueError("JSON_BACKEND=orjson needs the orjson package")
+        datetime_format = (app.config.get('JSON_DATETIME_FORMAT') or 'http').lower()
+        if datetime_format not in DATETIME_FORMATS:
+            raise ValueError(f"Unknown JSON_DATETIME_FORMAT: {datetime_format}, supported formats: {', '.join(DATETIME_FORMATS)}")
+
+        self.backend = 'orjson' if orjson is not None and backend != 'stdlib' else 'stdlib'
+        self.datetime_format = datetime_format
+        self.default = default_iso if datetime_format == 'iso' else default_http
+        if self.backend == 'orjson':
+            self.orjson_option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if datetime_format == 'http':
+                # Otherwise orjson writes them in ISO 8601
+                self.orjson_option |= orjson.OPT_PASSTHROUGH_DATETIME
+        loggerManager.logger.info(f"JSON provider: {self.backend} backend, {datetime_format} datetimes")
+
+    def get_orjson_option(self, sort_keys=None, indent=None):
+        option = self.orjson_option
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj, sort_keys=None, indent=None):
+        """UTF-8 JSON of obj, without going through a str on the orjson backend"""
+        if self.backend == 'orjson':
+            return orjson.dumps(obj, default=self.default, option=self.get_orjson_option(sort_keys, indent))
+        dump_args = {'indent': indent} if indent else {'separators': (',', ':')}
+        if sort_keys is not None:
+            dump_args['sort_keys'] = sort_keys
+        return DefaultJSONProvider.dumps(self, obj, **dump_args).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # orjson writes only compact or 2 spaces indented documents with its own escaping: other arguments go to json
+        if self.backend != 'orjson' or kwargs.get('indent') not in (None, 2) \
+                or set(kwargs) - {'indent', 'sort_keys', 'separators', 'ensure_ascii'}:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj, sort_keys=kwargs.get('sort_keys'), indent=kwargs.get('indent')).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if self.backend != 'orjson' or kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = 2 if (self.compact is None and self._app.debug) or self.compact is False else None
+        return self._app.response_class(self.dumps_bytes(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+    def raw_items_response(self, items, **fields):
+        """
+        Response {"items": [...], **fields} whose items are JSON texts already encoded (the json_items queries of
+        sql_queries): they are joined as they are, without being decoded and encoded again. Always compact.
+        :param items: list of str, JSON text of every item
+        :param fields: other keys of the document, written by dumps
+        """
+        body = b'{"items":[' + ','.join(items).encode('utf-8') + b']'
+        body += b',' + self.dumps_bytes(fields)[1:] if fields else b'}'
+        return self._app.response_class(body + b"\n", mimetype=self.mimetype)
+
+
+def sql_items_enabled():
+    """The json_items queries of sql_queries can be used: SQL_JSON_ITEMS is on and datetimes are HTTP dates"""
+    return current_app.config.get('SQL_JSON_ITEMS', True) and getattr(current_app.json, 'datetime_format', None) == 'http'
+
+
+def init_app(app):
+    """Registers the provider as app.json"""
+    app.json_provider_class = MedInsightJSONProvider
+    app.json = MedInsightJSONProvider(app)
+    return app
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author:        barnabas
+@email:         barnabasaugustino@gmail.com
+@gitlab:        https://gitlab.com/projects28/medinsights-be.git
+@Domain name
+@Hostname
+@Description:   Versioned SQL migrations, applied to every country database.
+                Migrations are the files migrations/NNNN_name.sql, applied in version order and recorded in
+                public.schema_migrations. A file starting with "-- migrate:no-transaction" runs statement by
+                statement in autocommit (needed by CREATE INDEX CONCURRENTLY), the others in one transaction.
+                Invalid indexes left by a failed concurrent build are dropped and built again on the next run.
+                Migrations read the country of the database with current_setting('medinsight.country_code'),
+                set on the session by the upgrade ('IT' when the country is not known, as in the query builders).
+                CLI: "flask db-upgrade" applies them, "flask db-check-indexes" reports the missing indexes,
+                "flask db-rebuild-enrichment-state" and "flask db-rebuild-search-projection" rebuild the
+                enrichment state and the lite search projection (after imports).
+"""
+
+# External dependencies
+import os
+import re
+import click
+import psycopg2
+import psycopg2.extras
+from flask import current_app
+from flask.cli import with_appcontext
+# Internal dependencies
+from api.lib import database_manager, sql_queries, cache_manager, loggerManager
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                              'migrations')
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_(\w+)\.sql$")
+NO_TRANSACTION_MARKER = '-- migrate:no-transaction'
+# Country of the databases upgraded without one (init-db), the default of the query builders
+DEFAULT_COUNTRY = 'IT'
+CREATE_INDEX_PATTERN = re.compile(
+    r"^\s*CREATE\s+(?:UNIQUE\s+)?INDEX\s+(?:CONCURRENTLY\s+)?(?:IF\s+NOT\s+EXISTS\s+)?([\w.]+)\s+ON\s+(?:ONLY\s+)?([\w.]+)",
+    re.IGNORECASE)
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS public.schema_migrations (
+        version VARCHAR(4) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )
+"""
+
+INVALID_INDEXES_QUERY = """
+    SELECT n.nspname || '.' || ic.relname
+    FROM pg_index i
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_namespace n ON n.oid = ic.relnamespace
+    WHERE NOT i.indisvalid
+    AND n.nspname || '.' || ic.relname = ANY(%(indexes)s)
+"""
+
+
+def list_migrations(directory=None):
+    """
+    :Description: Migrations available on disk, in version order
+    :param directory: str, migrations directory (default MIGRATIONS_DIR)
+    :return: list of dict with version, name, path and transactional
+    """
+    directory = directory or MIGRATIONS_DIR
+    migrations = []
+    for file_name in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE_PATTERN.match(file_name)
+        if not match:
+            continue
+        path = os.path.join(directory, file_name)
+        with open(path, 'r') as f:
+            first_line = f.readline().strip()
+        migrations.append({
+            'version': match.group(1),
+            'name': match.group(2),
+            'path': path,
+            'transactional': first_line != NO_TRANSACTION_MARKER
+        })
+
+    versions = [migration['version'] for migration in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicated migration versions in {directory}: {versions}")
+    return migrations
+
+
+def split_statements(sql):
+    """
+    :Description: Split a migration file in single statements (one statement ends with ";" at the end of a line).
+                  Comment lines are dropped.
+    :param sql: str, content of a migration file
+    :return: list of str
+    """
+    statements = []
+    current = []
+    for line in sql.splitlines():
+        if not line.strip() or line.strip().startswith('--'):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(';'):
+            statements.append('\n'.join(current))
+            current = []
+    if current:
+        statements.append('\n'.join(current))
+    return statements
+
+
+def connect_country(country_code):
+    """
+    :Description: Dedicated connection to the database of a country (not taken from the request pools)
+    :param country_code: str, country code (DE, IT)
+    :return: psycopg2 connection
+    """
+    db_config = database_manager.get_db_config(country_code)
+    if not database_manager.is_db_config_complete(db_config):
+        raise ValueError(f"Database configuration not found for country: {country_code}")
+    connection = psycopg2.connect(
+        host=db_config.get('host'),
+        port=db_config.get('port'),
+        user=db_config.get('user'),
+        password=db_config.get('password'),
+        dbname=db_config.get('db_name')
+    )
+    connection.autocommit = True
+    return connection
+
+
+def get_applied_versions(connection):
+    """
+    :param connection: psycopg2 connection
+    :return: set of the versions already applied
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_MIGRATIONS_TABLE)
+        cursor.execute("SELECT version FROM public.schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+
+
+def apply_migration(connection, migration):
+    """
+    :Description: Apply one migration and record it in public.schema_migrations
+    :param connection: psycopg2 connection
+    :param migration: dict, as returned by list_migrations
+    """
+    with open(migration['path'], 'r') as f:
+        sql = f.read()
+
+    record = "INSERT INTO public.schema_migrations (version, name) VALUES (%(version)s, %(name)s)"
+    if migration['transactional']:
+        connection.autocommit = False
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql)
+                cursor.execute(record, migration)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.autocommit = True
+    else:
+        # Statements are idempotent (IF NOT EXISTS), but a failed or cancelled CREATE INDEX CONCURRENTLY leaves an
+        # INVALID index that IF NOT EXISTS would skip: it is dropped before the statement runs again, and the
+        # migration is recorded only when all its indexes are valid
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            indexes = []
+            for statement in split_statements(sql):
+                index = created_index(statement)
+                if index:
+                    drop_invalid_indexes(cursor, [index])
+                    indexes.append(index)
+                cursor.execute(statement)
+            invalid = get_invalid_indexes(cursor, indexes)
+            if invalid:
+                raise RuntimeError(f"Migration {migration['version']}_{migration['name']} left invalid indexes: "
+                                   f"{', '.join(invalid)}")
+            cursor.execute(record, migration)
+
+
+def created_index(statement):
+    """
+    :param statement: str, one statement of a migration
+    :return: str, schema qualified name of the index created by a CREATE INDEX statement (schema of its table),
+             None for other statements
+    """
+    match = CREATE_INDEX_PATTERN.match(statement)
+    if not match:
+        return None
+    name, table = match.group(1), match.group(2)
+    schema = table.split('.')[0] if '.' in table else 'public'
+    return name if '.' in name else f"{schema}.{name}"
+
+
+def get_invalid_indexes(cursor, indexes):
+    """
+    :param cursor: psycopg2 cursor
+    :param indexes: list of schema qualified index names
+    :return: list of the indexes that exist and are not valid (pg_index.indisvalid)
+    """
+    if not indexes:
+        return []
+    cursor.execute(INVALID_INDEXES_QUERY, {'indexes': list(indexes)})
+    return [row[0] for row in cursor.fetchall()]
+
+
+def drop_invalid_indexes(cursor, indexes):
+    """Drop the invalid leftovers of a failed CREATE INDEX CONCURRENTLY, so that the statement builds them again"""
+    for index in get_invalid_indexes(cursor, indexes):
+        loggerManager.logger.warning(f"Dropping invalid index {index} to build it again")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index}")
+
+
+def get_pending_migrations(connection, directory=None):
+    """
+    :param connection: psycopg2 connection
+    :param directory: str, migrations directory (default MIGRATIONS_DIR)
+    :return: list of the migrations not applied yet, in version order
+    """
+    applied_versions = get_applied_versions(connection)
+    return [migration for migration in list_migrations(directory) if migration['version'] not in applied_versions]
+
+
+def upgrade_connection(connection, directory=None, label='', country_code=None):
+    """
+    :Description: Apply the pending migrations on a connection
+    :param connection: psycopg2 connection in autocommit mode
+    :param directory: str, migrations directory (default MIGRATIONS_DIR)
+    :param label: str, database name used in the logs
+    :param country_code: str, country of the database, read by the backfills of the migrations
+    :return: list of the versions applied
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT set_config('medinsight.country_code', %(country_code)s, false)",
+                       {'country_code': (country_code or DEFAULT_COUNTRY).upper()})
+    applied = []
+    for migration in get_pending_migrations(connection, directory):
+        loggerManager.logger.info(f"Applying migration {migration['version']}_{migration['name']} to {label}")
+        apply_migration(connection, migration)
+        applied.append(migration['version'])
+    return applied
+
+
+def upgrade_country(country_code, directory=None):
+    """
+    :Description: Apply the pending migrations to the database of a country. Needs an application context.
+    :param country_code: str, country code (DE, IT)
+    :param directory: str, migrations directory (default MIGRATIONS_DIR)
+    :return: list of the versions applied
+    """
+    country_code = country_code.upper()
+    connection = connect_country(country_code)
+    try:
+        return upgrade_connection(connection, directory, label=f"country {country_code}", country_code=country_code)
+    finally:
+        connection.close()
+
+
+# Indexes the query builders of sql_queries rely on. columns are compared with the key columns of the existing
+# indexes (as printed by pg_get_indexdef), so an equivalent index created by hand under another name is accepted.
+REQUIRED_INDEXES = [
+    {'table': 'doctors.doctors', 'method': 'btree', 'columns': ['rate DESC', 'doctor_id'],
+     'used_by': 'ORDER BY rate DESC, doctor_id and cursor pagination of the doctor listings'},
+    {'table': 'doctors.doctors', 'method': 'gin', 'columns': ['full_name gin_trgm_ops'],
+     'used_by': 'search_term filter'},
+    {'table': 'doctors.doctors', 'method': 'gin', 'columns': ['given_name gin_trgm_ops'],
+     'used_by': 'search_term filter'},
+    {'table': 'doctors.doctors', 'method': 'gin', 'columns': ['surname gin_trgm_ops'],
+     'used_by': 'search_term filter'},
+    {'table': 'doctors.doctors_clinics_map', 'method': 'btree', 'columns': ['doctor_id'],
+     'used_by': 'clinics of a doctor'},
+    {'table': 'doctors.doctors_clinics_map', 'method': 'btree', 'columns': ['clinic_id'],
+     'used_by': 'doctors of a clinic'},
+    {'table': 'doctors.doctors_specializations_map', 'method': 'btree', 'columns': ['doctor_id'],
+     'used_by': 'specializations of a doctor'},
+    {'table': 'doctors.clinics', 'method': 'btree', 'columns': ['upper(city_name)'],
+     'used_by': 'city filter'},
+    {'table': 'doctors.specializations', 'method': 'btree', 'columns': ['upper(specialization_name)'],
+     'used_by': 'profession filter'},
+    {'table': 'doctors.clinics_service_options_map', 'method': 'btree', 'columns': ['doctor_id', 'clinic_id'],
+     'used_by': 'services of a doctor in a clinic'},
+    {'table': 'doctors.google_places_data', 'method': 'btree', 'columns': ['doctor_id'],
+     'used_by': 'Google Places data of a doctor'},
+    {'table': 'doctors.enrichment_attempts', 'method': 'btree', 'unique': True,
+     'columns': ['doctor_id', 'country_code', 'enrichment_source'],
+     'used_by': 'enrichment status joins and ON CONFLICT of the attempts upsert'},
+    {'table': 'doctors.doctors', 'method': 'btree', 'columns': ['modified'],
+     'used_by': 'data version of the conditional responses'},
+    {'table': 'doctors.google_places_data', 'method': 'btree', 'columns': ['country_code', 'updated_at'],
+     'used_by': 'data version of the conditional responses'},
+    {'table': 'doctors.enrichment_attempts', 'method': 'btree', 'columns': ['country_code', 'attempted_at'],
+     'used_by': 'data version of the conditional responses'},
+    {'table': 'doctors.enrichment_state', 'method': 'btree', 'unique': True, 'columns': ['doctor_id', 'country_code'],
+     'used_by': 'enrichment status lookups and ON CONFLICT of the state refresh'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'btree', 'columns': ['rate DESC', 'doctor_id'],
+     'used_by': 'order and cursor pagination of the lite search'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'gin', 'columns': ['city_names'],
+     'used_by': 'city filter of the lite search'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'gin', 'columns': ['specialization_names'],
+     'used_by': 'profession filter of the lite search'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'gin', 'columns': ['full_name gin_trgm_ops'],
+     'used_by': 'search_term filter of the lite search'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'gin', 'columns': ['given_name gin_trgm_ops'],
+     'used_by': 'search_term filter of the lite search'},
+    {'table': 'doctors.doctor_search_projection', 'method': 'gin', 'columns': ['surname gin_trgm_ops'],
+     'used_by': 'search_term filter of the lite search'},
+]
+
+TABLE_INDEXES_QUERY = """
+    SELECT am.amname as method, i.indisunique as is_unique, pg_get_indexdef(i.indexrelid) as definition
+    FROM pg_index i
+    JOIN pg_class t ON t.oid = i.indrelid
+    JOIN pg_namespace n ON n.oid = t.relnamespace
+    JOIN pg_class ic ON ic.oid = i.indexrelid
+    JOIN pg_am am ON am.oid = ic.relam
+    WHERE n.nspname = %(schema)s
+    AND t.relname = %(table)s
+    AND i.indisvalid
+    AND i.indpred IS NULL
+"""
+
+
+def normalize_index_column(column):
+    """Comparable form of an index key column: lower case, without casts to text, parentheses and spaces"""
+    column = column.lower().replace('::text', '').replace('::character varying', '')
+    return re.sub(r"[()\s]", '', column)
+
+
+def index_key_columns(definition, method):
+    """
+    :param definition: str, CREATE INDEX statement returned by pg_get_indexdef
+    :param method: str, access method of the index
+    :return: list of the key columns (INCLUDE columns excluded)
+    """
+    start = definition.index(f"USING {method} (") + len(f"USING {method} (")
+    columns, current, depth = [], '', 0
+    for char in definition[start:]:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == ',' and depth == 0:
+            columns.append(current.strip())
+            current = ''
+            continue
+        current += char
+    columns.append(current.strip())
+    return columns
+
+
+def index_satisfies(index, required):
+    """True when an existing index can serve a required index: same method, same leading key columns"""
+    if index['method'] != required['method']:
+        return False
+    if required.get('unique') and not index['is_unique']:
+        return False
+    columns = [normalize_index_column(column) for column in index_key_columns(index['definition'], index['method'])]
+    required_columns = [normalize_index_column(column) for column in required['columns']]
+    return columns[:len(required_columns)] == required_columns
+
+
+def check_indexes(connection):
+    """
+    :Description: Compare the indexes of a database with REQUIRED_INDEXES. Invalid and partial indexes do not count.
+    :param connection: psycopg2 connection
+    :return: list of the required indexes that are missing
+    """
+    missing = []
+    table_indexes = {}
+    with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+        for required in REQUIRED_INDEXES:
+            if required['table'] not in table_indexes:
+                schema, table = required['table'].split('.')
+                cursor.execute(TABLE_INDEXES_QUERY, {'schema': schema, 'table': table})
+                table_indexes[required['table']] = cursor.fetchall()
+            if not any(index_satisfies(index, required) for index in table_indexes[required['table']]):
+                missing.append(required)
+    return missing
+
+
+def rebuild_enrichment_state(country_code, doctor_ids=None):
+    """
+    :Description: Refresh doctors.enrichment_state on the database of a country. Needs an application context.
+    :param country_code: str, country code (DE, IT)
+    :param doctor_ids: list of doctor ids (every doctor of the country if None)
+    :return: dict {'refreshed': int, 'removed': int}
+    """
+    country_code = country_code.upper()
+    query, params = sql_queries.refresh_enrichment_state_query(doctor_ids=doctor_ids, country_code=country_code)
+    connection = connect_country(country_code)
+    try:
+        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            result = dict(cursor.fetchone())
+    finally:
+        connection.close()
+    cache_manager.on_enrichment_write(country_code)
+    return result
+
+
+def rebuild_search_projection(country_code, doctor_ids=None):
+    """
+    :Description: Refresh doctors.doctor_search_projection on the database of a country. Needs an application context.
+    :param country_code: str, country code (DE, IT)
+    :param doctor_ids: list of doctor ids (the whole table if None)
+    :return: dict {'refreshed': int, 'removed': int}
+    """
+    country_code = country_code.upper()
+    query, params = sql_queries.refresh_doctor_search_projection_query(doctor_ids=doctor_ids, country_code=country_code)
+    connection = connect_country(country_code)
+    try:
+        with connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute(query, params)
+            result = dict(cursor.fetchone())
+    finally:
+        connection.close()
+    # Imports change the reference data too
+    cache_manager.on_import(country_code)
+    return result
+
+
+def get_configured_countries():
+    """Countries of DATABASE_PARAMS with a complete configuration"""
+    return [country_code for country_code in current_app.config.get('DATABASE_PARAMS', {}).keys()
+            if database_manager.is_country_configured(country_code)]
+
+
+@click.command('db-upgrade')
+@click.option('--country', 'countries', multiple=True, help='Country to upgrade (default: every configured country)')
+@with_appcontext
+def db_upgrade_command(countries):
+    """Apply the pending migrations to the country databases"""
+    for country_code in countries or get_configured_countries():
+        applied = upgrade_country(country_code)
+        if applied:
+            click.echo(f"{country_code.upper()}: applied migrations {', '.join(applied)}")
+        else:
+            click.echo(f"{country_code.upper()}: already up to date")
+
+
+@click.command('db-check-indexes')
+@click.option('--country', 'countries', multiple=True, help='Country to check (default: every configured country)')
+@with_appcontext
+def db_check_indexes_command(countries):
+    """Report the indexes the query builders rely on that are missing, exit with status 1 if any"""
+    any_missing = False
+    for country_code in countries or get_configured_countries():
+        connection = connect_country(country_code)
+        try:
+            pending = get_pending_migrations(connection)
+            missing = check_indexes(connection)
+        finally:
+            connection.close()
+
+        country_code = country_code.upper()
+        if pending:
+            click.echo(f"{country_code}: pending migrations {', '.join(m['version'] for m in pending)}")
+        if not missing:
+            click.echo(f"{country_code}: all required indexes found")
+            continue
+        any_missing = True
+        for required in missing:
+            click.echo(f"{country_code}: missing index on {required['table']} "
+                       f"USING {required['method']} ({', '.join(required['columns'])}) - {required['used_by']}")
+    if any_missing:
+        raise SystemExit(1)
+
+
+@click.command('db-rebuild-enrichment-state')
+@click.option('--country', 'countries', multiple=True, help='Country to rebuild (default: every configured country)')
+@click.option('--doctor-id', 'doctor_ids', multiple=True, type=int, help='Refresh only these doctors')
+@with_appcontext
+def db_rebuild_enrichment_state_command(countries, doctor_ids):
+    """Rebuild the enrichment state of the doctors (doctors.enrichment_state) from Google Places data and attempts"""
+    for country_code in countries or get_configured_countries():
+        result = rebuild_enrichment_state(country_code, doctor_ids=list(doctor_ids) or None)
+        click.echo(f"{country_code.upper()}: {result['refreshed']} doctors refreshed, {result['removed']} removed")
+
+
+@click.command('db-rebuild-search-projection')
+@click.option('--country', 'countries', multiple=True, help='Country to rebuild (default: every configured country)')
+@click.option('--doctor-id', 'doctor_ids', multiple=True, type=int,
+              help='Refresh only these doctors (for imports touching a few doctors)')
+@with_appcontext
+def db_rebuild_search_projection_command(countries, doctor_ids):
+    """Rebuild the lite search projection (doctors.doctor_search_projection), e.g. after an import"""
+    for country_code in countries or get_configured_countries():
+        result = rebuild_search_projection(country_code, doctor_ids=list(doctor_ids) or None)
+        click.echo(f"{country_code.upper()}: {result['refreshed']} doctors refreshed, {result['removed']} removed")
+
+
+def init_app(app):
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_check_indexes_command)
+    app.cli.add_command(db_rebuild_enrichment_state_command)
+    app.cli.add_command(db_rebuild_search_projection_command)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author:        barnabas
+@email:         barnabasaugustino@gmail.com
+@Description:   Optional cache tier shared by all the gunicorn workers, behind the per-worker cache of cache_manager.
+                SHARED_CACHE_BACKEND selects the store:
+
+                    sqlite  a SQLite file on the local disk (SHARED_CACHE_PATH), no server needed
+                    redis   a Redis server (SHARED_CACHE_REDIS_URL), needs the optional redis package
+
+                An entry is fresh for SHARED_CACHE_TTL seconds, then stale for SHARED_CACHE_STALE_TTL seconds.
+                When a stale entry is read, one worker takes the refresh lock and recomputes it while the other
+                workers keep serving the stale value, so an expired entry is recomputed once and not by every
+                worker at the same time. A missing entry (first read, invalidation) takes the same lock: the other
+                workers wait for the entry up to SHARED_CACHE_WAIT_TIMEOUT seconds, then run the query themselves. Values are pickled: the store must be reachable only by this application.
+"""
+
+import os
+import time
+import json
+import pickle
+import sqlite3
+import hashlib
+import threading
+from flask import current_app
+from api.lib import loggerManager
+
+KEY_PREFIX = 'medinsight:cache:'
+# Part of every key, bumped when the shape of the cached values changes: entries of older releases are not read
+VALUE_FORMAT = 2
+
+
+def make_key(endpoint, country_code, params=None):
+    """endpoint:country:hash of the normalized params and of VALUE_FORMAT"""
+    normalized = json.dumps([VALUE_FORMAT, params or {}], sort_keys=True, default=str)
+    return f"{endpoint}:{country_code.upper()}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+
+class SQLiteBackend(object):
+    """Shared cache in a SQLite file: one connection per thread of every worker process"""
+
+    def __init__(self, path, lock_timeout=30):
+        self.path = path
+        self.lock_timeout = lock_timeout
+        self.local = threading.local()
+        self.writes = 0
+        with self.connection() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    country_code TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    fresh_until REAL NOT NULL,
+                    stale_until REAL NOT NULL
+                )
+            """)
+            # Refresh locks, also taken for entries that do not exist yet
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS cache_locks (
+                    key TEXT PRIMARY KEY,
+                    locked_until REAL NOT NULL
+                )
+            """)
+
+    def connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    def get(self, key):
+        """Returns (value, is_fresh), None when the entry is missing or too old"""
+        now = time.time()
+        row = self.connection().execute(
+            'SELECT value, fresh_until FROM cache_entries WHERE key = ? AND stale_until > ?', (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1] > now
+
+    def set(self, key, endpoint, country_code, value, ttl, stale_ttl):
+        now = time.time()
+        connection = self.connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, endpoint, country_code, value, fresh_until, stale_until) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, endpoint, country_code.upper(), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), now + ttl, now + ttl + stale_ttl)
+        )
+        connection.execute('DELETE FROM cache_locks WHERE key = ?', (key,))
+        self.writes += 1
+        if self.writes % 100 == 0:
+            connection.execute('DELETE FROM cache_entries WHERE stale_until < ?', (now,))
+            connection.execute('DELETE FROM cache_locks WHERE locked_until < ?', (now,))
+
+    def try_lock(self, key):
+        """Take the refresh lock of an entry (missing or stale), False when another worker holds it"""
+        now = time.time()
+        cursor = self.connection().execute(
+            'INSERT INTO cache_locks (key, locked_until) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET locked_until = excluded.locked_until WHERE cache_locks.locked_until < ?',
+            (key, now + self.lock_timeout, now)
+        )
+        return cursor.rowcount == 1
+
+    def release(self, key):
+        self.connection().execute('DELETE FROM cache_locks WHERE key = ?', (key,))
+
+    def invalidate(self, country_code=None, endpoints=None):
+        conditions, values = [], []
+        if country_code:
+            conditions.append('country_code = ?')
+            values.append(country_code.upper())
+        if endpoints is not None:
+            endpoints = list(endpoints)
+            if not endpoints:
+                return 0
+            conditions.append(f"endpoint IN ({', '.join('?' for endpoint in endpoints)})")
+            values.extend(endpoints)
+        where = ('WHERE ' + ' AND '.join(conditions)) if conditions else ''
+        return self.connection().execute(f'DELETE FROM cache_entries {where}', values).rowcount
+
+    def status(self):
+        entries = self.connection().execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'entries': entries}
+
+
+class RedisBackend(object):
+    """Shared cache on a Redis server, the entries expire in Redis once they are too old to be served stale"""
+
+    def __init__(self, url, lock_timeout=30):
+        # Optional dependency, needed only with SHARED_CACHE_BACKEND=redis
+        import redis
+        self.url = url
+        self.lock_timeout = lock_timeout
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        data = self.client.get(KEY_PREFIX + key)
+        if data is None:
+            return None
+        fresh_until, value = pickle.loads(data)
+        return value, fresh_until > time.time()
+
+    def set(self, key, endpoint, country_code, value, ttl, stale_ttl):
+        data = pickle.dumps((time.time() + ttl, value), pickle.HIGHEST_PROTOCOL)
+        pipeline = self.client.pipeline()
+        pipeline.set(KEY_PREFIX + key, data, ex=max(int(ttl + stale_ttl), 1))
+        pipeline.delete(KEY_PREFIX + key + ':lock')
+        pipeline.execute()
+
+    def try_lock(self, key):
+        return bool(self.client.set(KEY_PREFIX + key + ':lock', os.getpid(), nx=True, ex=self.lock_timeout))
+
+    def release(self, key):
+        self.client.delete(KEY_PREFIX + key + ':lock')
+
+    def invalidate(self, country_code=None, endpoints=None):
+        country_pattern = country_code.upper() if country_code else '*'
+        patterns = [f"{KEY_PREFIX}{endpoint}:{country_pattern}:*" for endpoint in endpoints] if endpoints is not None \
+            else [f"{KEY_PREFIX}*:{country_pattern}:*"]
+        dropped = 0
+        for pattern in patterns:
+            keys = list(self.client.scan_iter(match=pattern, count=500))
+            if keys:
+                dropped += self.client.delete(*keys)
+        return dropped
+
+    def status(self):
+        return {'backend': 'redis', 'url': self.url.split('@')[-1]}
+
+
+class SharedCache(object):
+    """Stale-while-revalidate reads over a shared backend, with the counters of the current worker"""
+
+    def __init__(self, backend, ttl=300, stale_ttl=3600, wait_timeout=5, wait_interval=0.05):
+        self.backend = backend
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.wait_timeout = wait_timeout
+        self.wait_interval = wait_interval
+        self.lock = threading.Lock()
+        self.hits = self.stale_hits = self.misses = self.refreshes = self.waits = self.wait_timeouts = self.errors = 0
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_or_load(self, endpoint, country_code, params, loader):
+        key = make_key(endpoint, country_code, params)
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            loggerManager.logger.error(f"Shared cache read failed for {key}: {e}")
+            self.count('errors')
+            return loader()
+
+        if entry is not None:
+            value, is_fresh = entry
+            if is_fresh:
+                self.count('hits')
+                return value
+            if not self.try_lock(key, locked_on_error=False):
+                # Another worker is recomputing the entry: serve the stale value meanwhile
+                self.count('stale_hits')
+                return value
+            self.count('refreshes')
+            return self.load(key, endpoint, country_code, loader)
+
+        self.count('misses')
+        if not self.try_lock(key, locked_on_error=True):
+            # Another worker is computing the entry: wait for it instead of running the same query
+            entry = self.wait_for(key)
+            if entry is not None:
+                self.count('waits')
+                return entry[0]
+            self.count('wait_timeouts')
+            loggerManager.logger.warning(f"Shared cache entry {key} not ready after {self.wait_timeout}s, loading it")
+            value = loader()
+            self.store(key, endpoint, country_code, value)
+            return value
+        return self.load(key, endpoint, country_code, loader)
+
+    def load(self, key, endpoint, country_code, loader):
+        """Run the loader holding the lock of the entry and store its value (storing releases the lock)"""
+        try:
+            value = loader()
+        except Exception:
+            self.release(key)
+            raise
+        self.store(key, endpoint, country_code, value)
+        return value
+
+    def try_lock(self, key, locked_on_error):
+        try:
+            return self.backend.try_lock(key)
+        except Exception as e:
+            loggerManager.logger.error(f"Shared cache lock failed for {key}: {e}")
+            self.count('errors')
+            return locked_on_error
+
+    def wait_for(self, key):
+        """Poll the backend until the entry is written by the lock holder, None after wait_timeout seconds"""
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(self.wait_interval)
+            try:
+                entry = self.backend.get(key)
+            except Exception as e:
+                loggerManager.logger.error(f"Shared cache read failed for {key}: {e}")
+                self.count('errors')
+                return None
+            if entry is not None:
+                return entry
+        return None
+
+    def store(self, key, endpoint, country_code, value):
+        try:
+            self.backend.set(key, endpoint, country_code, value, self.ttl, self.stale_ttl)
+        except Exception as e:
+            loggerManager.logger.error(f"Shared cache write failed for {key}: {e}")
+            self.count('errors')
+
+    def release(self, key):
+        try:
+            self.backend.release(key)
+        except Exception as e:
+            loggerManager.logger.error(f"Shared cache unlock failed for {key}: {e}")
+
+    def invalidate(self, country_code=None, endpoints=None):
+        try:
+            return self.backend.invalidate(country_code=country_code, endpoints=endpoints)
+        except Exception as e:
+            loggerManager.logger.error(f"Shared cache invalidation failed: {e}")
+            self.count('errors')
+            return 0
+
+    def status(self):
+        with self.lock:
+            output = {
+                'ttl': self.ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'refreshes': self.refreshes,
+                'waits': self.waits,
+                'wait_timeouts': self.wait_timeouts,
+                'errors': self.errors
+            }
+        try:
+            output.update(self.backend.status())
+        except Exception as e:
+            output['error'] = str(e)
+        return output
+
+
+_shared_cache = None
+_shared_cache_pid = None
+_shared_cache_lock = threading.Lock()
+
+
+def is_enabled():
+    return bool(current_app.config.get('SHARED_CACHE_BACKEND'))
+
+
+def create_backend():
+    backend = current_app.config.get('SHARED_CACHE_BACKEND', '').lower()
+    lock_timeout = current_app.config.get('SHARED_CACHE_LOCK_TIMEOUT', 30)
+    if backend == 'sqlite':
+        path = current_app.config.get('SHARED_CACHE_PATH') or os.path.join(current_app.instance_path, 'shared_cache.sqlite3')
+        return SQLiteBackend(path, lock_timeout=lock_timeout)
+    if backend == 'redis':
+        return RedisBackend(current_app.config.get('SHARED_CACHE_REDIS_URL') or 'redis://localhost:6379/0',
+                            lock_timeout=lock_timeout)
+    raise ValueError(f"Unknown SHARED_CACHE_BACKEND: {backend}, supported backends: sqlite, redis")
+
+
+def get_shared_cache():
+    """Returns the shared cache client of the current worker process, creating it on first use"""
+    global _shared_cache, _shared_cache_pid
+    with _shared_cache_lock:
+        # Connections must never be shared across a fork
+        if _shared_cache is None or _shared_cache_pid != os.getpid():
+            ttl = current_app.config.get('SHARED_CACHE_TTL') or current_app.config.get('REFERENCE_CACHE_TTL', 300)
+            _shared_cache = SharedCache(create_backend(), ttl=ttl,
+                                        stale_ttl=current_app.config.get('SHARED_CACHE_STALE_TTL', 3600),
+                                        wait_timeout=current_app.config.get('SHARED_CACHE_WAIT_TIMEOUT', 5))
+            _shared_cache_pid = os.getpid()
+    return _shared_cache
+
+
+def get_or_load(endpoint, country_code, params, loader):
+    """Returns the shared result of an endpoint, see SharedCache.get_or_load"""
+    try:
+        shared_cache = get_shared_cache()
+    except Exception as e:
+        loggerManager.logger.error(f"Shared cache not available: {e}")
+        return loader()
+    return shared_cache.get_or_load(endpoint, country_code, params, loader)
+
+
+def invalidate(country_code=None, endpoints=None):
+    if not is_enabled():
+        return 0
+    try:
+        return get_shared_cache().invalidate(country_code=country_code, endpoints=endpoints)
+    except Exception as e:
+        loggerManager.logger.error(f"Shared cache not available: {e}")
+        return 0
+
+
+def get_status():
+    if not is_enabled():
+        return {'enabled': False}
+    try:
+        return dict(get_shared_cache().status(), enabled=True)
+    except Exception as e:
+        return {'enabled': True, 'error': str(e)}
@@ -11,499 +11,507 @@
 
 """
 
+import json
 from api.lib import loggerManager
 
+
+def json_param(value):
+    """Serialize dict/list values for json/jsonb columns, other values are passed as they are"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def keyset_condition(cursor, params, alias='d'):
+    """
+    Keyset predicate for the (rate DESC, doctor_id) order: doctors that come after the cursor.
+    In a DESC order NULL rates come first, so a cursor with a NULL rate is still inside the NULL block.
+    :param cursor: tuple (rate, doctor_id) of the last doctor of the previous page
+    :param params: dict of the query parameters, updated with the cursor values
+    :param alias: alias of the doctors table
+    :return: string SQL condition
+    """
+    rate, doctor_id = cursor
+    params['cursor_doctor_id'] = doctor_id
+    if rate is None:
+        return f"({alias}.rate IS NOT NULL OR {alias}.doctor_id > %(cursor_doctor_id)s)"
+    params['cursor_rate'] = rate
+    return f"({alias}.rate < %(cursor_rate)s OR ({alias}.rate = %(cursor_rate)s AND {alias}.doctor_id > %(cursor_doctor_id)s))"
+
+
+def escape_like(value):
+    """Escape the LIKE wildcards typed by the user, so that % and _ are matched literally"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def name_search_condition(search_term, params, alias='d'):
+    """
+    Case insensitive substring match of search_term on the doctor names.
+    ILIKE on the plain columns can use the trigram GIN indexes (migrations/0001_doctor_name_trigram.sql),
+    UPPER(column) LIKE UPPER(pattern) could only be answered with a sequential scan.
+    :param search_term: string, text typed by the user
+    :param params: dict of the query parameters, updated with the pattern
+    :param alias: alias of the doctors table
+    :return: string SQL condition
+    """
+    params['search_pattern'] = f"%{escape_like(search_term)}%"
+    return (f"({alias}.full_name ILIKE %(search_pattern)s OR {alias}.given_name ILIKE %(search_pattern)s "
+            f"OR {alias}.surname ILIKE %(search_pattern)s)")
+
+
+def name_relevance_expression(search_term, params, alias='d'):
+    """
+    Trigram similarity between search_term and the closest doctor name, used by order=relevance (needs pg_trgm)
+    :return: string SQL expression, between 0 and 1
+    """
+    params['search_term'] = search_term
+    return (f"GREATEST(word_similarity(%(search_term)s, {alias}.full_name), "
+            f"word_similarity(%(search_term)s, {alias}.given_name), "
+            f"word_similarity(%(search_term)s, {alias}.surname))")
+
+
 def search_doctors_lite_query(
     search_term=None, city=None, profession=None, 
     min_rate=None, max_rate=None, has_slots=None, 
     allow_questions=None, limit=None, enriched_only=None,
-    country_code='IT'
+    country_code='IT', cursor=None, order='rate'
 ):
     """
-    Query lite CORRETTA che elimina completamente i duplicati di doctor_id
+    Query lite CORRETTA che elimina completamente i duplicati di doctor_id.
+    Reads only doctors.doctor_search_projection (one row per doctor, see refresh_doctor_search_projection_query):
+    primary city, primary specialization, clinics and enrichment status are precomputed there.
+    :param cursor: tuple (rate, doctor_id), return the doctors after it (keyset pagination)
+    :param order: 'rate' (rate DESC, doctor_id) or 'relevance' (name similarity first, only with a search_term)
+    :return: tuple (SQL query string, params dict)
     """
-    
-    base_query = f"""
-        WITH doctor_base AS (
-            SELECT DISTINCT
-                d.doctor_id, 
-                d.full_name, 
-                d.rate, 
-                d.has_slots, 
-                d.allow_questions
-            FROM doctors.doctors d
-        )
-        SELECT 
-            db.doctor_id, 
-            db.full_name, 
-            db.rate, 
-            db.has_slots, 
-            db.allow_questions,
-            -- Città principale
-            (SELECT c_sub.city_name
-             FROM doctors.doctors_clinics_map dcm_sub
-             JOIN doctors.clinics c_sub ON dcm_sub.clinic_id = c_sub.clinic_id
-             WHERE dcm_sub.doctor_id = db.doctor_id
-             ORDER BY c_sub.clinic_id
-             LIMIT 1) as primary_city,
-            -- Specializzazione principale
-            (SELECT s_sub.specialization_name
-             FROM doctors.doctors_specializations_map dsm_sub
-             JOIN doctors.specializations s_sub ON dsm_sub.specialization_id = s_sub.specialization_id
-             WHERE dsm_sub.doctor_id = db.doctor_id
-             ORDER BY s_sub.is_popular DESC, s_sub.specialization_name
-             LIMIT 1) as primary_specialization,
-            -- Cliniche come JSON array
-            (SELECT COALESCE(
-                json_agg(
-                    jsonb_build_object(
-                        'clinic_id', c_json.clinic_id,
-                        'clinic_name', c_json.clinic_name,
-                        'street', c_json.street,
-                        'city_name', c_json.city_name,
-                        'post_code', c_json.post_code,
-                        'province', c_json.province,
-                        'latitude', c_json.latitude,
-                        'longitude', c_json.longitude,
-                        'calendar_active', c_json.calendar_active,
-                        'online_payment', c_json.online_payment
-                    )
-                ),
-                '[]'::json
-            )
-            FROM doctors.doctors_clinics_map dcm_json
-            JOIN doctors.clinics c_json ON dcm_json.clinic_id = c_json.clinic_id
-            WHERE dcm_json.doctor_id = db.doctor_id
-            ) as clinics,
-            -- Stato arricchimento
-            (SELECT 
-                CASE 
-                    WHEN gpd_sub.google_place_id IS NOT NULL THEN 'enriched'
-                    WHEN ea_sub.id IS NOT NULL AND ea_sub.attempt_status = 'success' THEN 'enriched'
-                    WHEN ea_sub.id IS NOT NULL AND ea_sub.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                    WHEN ea_sub.id IS NOT NULL THEN 'attempted'
-                    ELSE 'never_attempted'
-                END
-            FROM doctors.doctors d_sub
-            LEFT JOIN doctors.google_places_data gpd_sub ON d_sub.doctor_id = gpd_sub.doctor_id
-            LEFT JOIN doctors.enrichment_attempts ea_sub ON (
-                d_sub.doctor_id = ea_sub.doctor_id 
-                AND ea_sub.country_code = '{country_code}' 
-                AND ea_sub.enrichment_source = 'google_places'
-            )
-            WHERE d_sub.doctor_id = db.doctor_id
-            LIMIT 1
-            ) as enrichment_status,
-            -- Flag Google
-            (SELECT 
-                CASE WHEN gpd_flag.google_place_id IS NOT NULL THEN true ELSE false END
-            FROM doctors.google_places_data gpd_flag
-            WHERE gpd_flag.doctor_id = db.doctor_id
-            LIMIT 1
-            ) as has_google_data,
-            -- Rating Google
-            (SELECT gpd_rating.rating
-            FROM doctors.google_places_data gpd_rating
-            WHERE gpd_rating.doctor_id = db.doctor_id
-            LIMIT 1
-            ) as google_rating,
-            -- Reviews count Google
-            (SELECT gpd_reviews.reviews_count
-            FROM doctors.google_places_data gpd_reviews
-            WHERE gpd_reviews.doctor_id = db.doctor_id
-            LIMIT 1
-            ) as google_reviews_count
-        FROM doctor_base db
-    """
-
-    # Add WHERE conditions to the CTE
-    doctor_filters = []
-    
+    params = {}
+
+    filters = []
+    page_order = "p.rate DESC, p.doctor_id"
+
     if search_term:
-        search_term = search_term.replace("'", "''")
-        doctor_filters.append(f"(UPPER(d.full_name) LIKE UPPER('%{search_term}%') OR UPPER(d.given_name) LIKE UPPER('%{search_term}%') OR UPPER(d.surname) LIKE UPPER('%{search_term}%'))")
+        filters.append(name_search_condition(search_term, params, alias='p'))
+        if order == 'relevance':
+            page_order = f"{name_relevance_expression(search_term, params, alias='p')} DESC, {page_order}"
 
     if min_rate is not None:
-        doctor_filters.append(f"d.rate >= {min_rate}")
+        params['min_rate'] = min_rate
+        filters.append("p.rate >= %(min_rate)s")
 
     if max_rate is not None:
-        doctor_filters.append(f"d.rate <= {max_rate}")
+        params['max_rate'] = max_rate
+        filters.append("p.rate <= %(max_rate)s")
 
     if has_slots is not None:
-        doctor_filters.append(f"d.has_slots = {has_slots}")
+        params['has_slots'] = has_slots
+        filters.append("p.has_slots = %(has_slots)s")
 
     if allow_questions is not None:
-        doctor_filters.append(f"d.allow_questions = {allow_questions}")
-
-    # Apply doctor-level filters to the CTE
-    if doctor_filters:
-        base_query = base_query.replace(
-            "FROM doctors.doctors d",
-            f"FROM doctors.doctors d WHERE " + " AND ".join(doctor_filters)
-        )
-
-    # Where conditions for the main query
-    conditions = ["1=1"]
+        params['allow_questions'] = allow_questions
+        filters.append("p.allow_questions = %(allow_questions)s")
 
+    # city_names / specialization_names hold the upper case names of all the clinics / specializations (GIN indexes)
     if city:
-        city = city.upper().replace("'", "''")
-        conditions.append(f"""db.doctor_id IN (
-            SELECT dcm_city.doctor_id 
-            FROM doctors.doctors_clinics_map dcm_city
-            JOIN doctors.clinics c_city ON dcm_city.clinic_id = c_city.clinic_id
-            WHERE UPPER(c_city.city_name) = '{city}'
-        )""")
+        params['city'] = [city.upper()]
+        filters.append("p.city_names @> %(city)s::text[]")
 
     if profession:
-        profession = profession.upper().replace("'", "''")
-        conditions.append(f"""db.doctor_id IN (
-            SELECT dsm_prof.doctor_id 
-            FROM doctors.doctors_specializations_map dsm_prof
-            JOIN doctors.specializations s_prof ON dsm_prof.specialization_id = s_prof.specialization_id
-            WHERE UPPER(s_prof.specialization_name) = '{profession}'
-        )""")
+        params['profession'] = [profession.upper()]
+        filters.append("p.specialization_names @> %(profession)s::text[]")
 
+    # has_google_data is NULL only for the doctors without Google Places data
     if enriched_only is not None:
-        if enriched_only:
-            conditions.append(f"""db.doctor_id IN (
-                SELECT gpd_enr.doctor_id 
-                FROM doctors.google_places_data gpd_enr 
-                WHERE gpd_enr.doctor_id IS NOT NULL
-            )""")
-        else:
-            conditions.append(f"""db.doctor_id NOT IN (
-                SELECT gpd_not.doctor_id 
-                FROM doctors.google_places_data gpd_not 
-                WHERE gpd_not.doctor_id IS NOT NULL
-            )""")
-
-    # Add WHERE clause
-    base_query += " WHERE " + " AND ".join(conditions)
-    
-    # Order and limit
-    base_query += " ORDER BY db.rate DESC, db.doctor_id"
-    
+        filters.append("p.has_google_data IS NOT NULL" if enriched_only else "p.has_google_data IS NULL")
+
+    if cursor:
+        filters.append(keyset_condition(cursor, params, alias='p'))
+
+    where = ("WHERE " + "\n            AND ".join(filters)) if filters else ""
+
     if limit is None:
         limit = 1000
-    base_query += f" LIMIT {limit}"
+    params['limit'] = limit
+
+    base_query = f"""
+        SELECT 
+            p.doctor_id, 
+            p.full_name, 
+            p.rate, 
+            p.has_slots, 
+            p.allow_questions,
+            p.primary_city,
+            p.primary_specialization,
+            p.clinics,
+            p.enrichment_status,
+            p.has_google_data,
+            p.google_rating,
+            p.google_reviews_count
+        FROM doctors.doctor_search_projection p
+        {where}
+        ORDER BY {page_order}
+        LIMIT %(limit)s
+    """
+
+    loggerManager.logger.info(f"Lite search query for country {country_code}: {base_query} params: {params}")
+    return base_query, params
+
+
+def refresh_doctor_search_projection_query(doctor_ids=None, country_code='IT'):
+    """
+    Upsert the rows of doctors.doctor_search_projection (migrations/0004_doctor_search_projection.sql) from the
+    doctors, clinics, specializations and enrichment state, and delete the rows of the doctors that no longer exist. One statement: the projection is never seen half refreshed.
+    :param doctor_ids: list of doctor ids to refresh (the whole table if None)
+    :param country_code: string, country code (DE, IT)
+    :return: tuple (SQL query string, params dict), the query returns the columns refreshed and removed
+    """
+    params = {'country_code': country_code}
+    doctor_where = ""
+    removed_condition = ""
+    if doctor_ids is not None:
+        params['doctor_ids'] = list(doctor_ids)
+        doctor_where = "WHERE d.doctor_id = ANY(%(doctor_ids)s::bigint[])"
+        removed_condition = "p.doctor_id = ANY(%(doctor_ids)s::bigint[]) AND "
+
+    query = f"""
+        WITH target AS (
+            SELECT d.doctor_id, d.full_name, d.given_name, d.surname, d.rate, d.has_slots, d.allow_questions
+            FROM doctors.doctors d
+            {doctor_where}
+        ),
+        -- Cliniche aggregate per dottore
+        doctor_clinics AS (
+            SELECT 
+                dcm.doctor_id,
+                (array_agg(c.city_name ORDER BY c.clinic_id))[1] as primary_city,
+                array_agg(DISTINCT UPPER(c.city_name)) FILTER (WHERE c.city_name IS NOT NULL) as city_names,
+                json_agg(
+                    jsonb_build_object(
+                        'clinic_id', c.clinic_id,
+                        'clinic_name', c.clinic_name,
+                        'street', c.street,
+                        'city_name', c.city_name,
+                        'post_code', c.post_code,
+                        'province', c.province,
+                        'latitude', c.latitude,
+                        'longitude', c.longitude,
+                        'calendar_active', c.calendar_active,
+                        'online_payment', c.online_payment
+                    )
+                    ORDER BY c.clinic_id
+                ) as clinics
+            FROM target t
+            JOIN doctors.doctors_clinics_map dcm ON dcm.doctor_id = t.doctor_id
+            JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
+            GROUP BY dcm.doctor_id
+        ),
+        -- Specializzazione principale (prima le popolari) e nomi di tutte le specializzazioni
+        doctor_specializations AS (
+            SELECT 
+                dsm.doctor_id,
+                (array_agg(s.specialization_name ORDER BY s.is_popular DESC, s.specialization_name))[1] 
+                    as primary_specialization,
+                array_agg(DISTINCT UPPER(s.specialization_name)) FILTER (WHERE s.specialization_name IS NOT NULL) 
+                    as specialization_names
+            FROM target t
+            JOIN doctors.doctors_specializations_map dsm ON dsm.doctor_id = t.doctor_id
+            JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
+            GROUP BY dsm.doctor_id
+        ),
+        removed AS (
+            DELETE FROM doctors.doctor_search_projection p
+            WHERE {removed_condition}NOT EXISTS (
+                SELECT 1 FROM doctors.doctors d WHERE d.doctor_id = p.doctor_id
+            )
+            RETURNING p.doctor_id
+        ),
+        refreshed AS (
+            INSERT INTO doctors.doctor_search_projection (
+                doctor_id, full_name, given_name, surname, rate, has_slots, allow_questions,
+                primary_city, primary_specialization, city_names, specialization_names, clinics,
+                enrichment_status, has_google_data, google_rating, google_reviews_count, refreshed_at
+            )
+            SELECT 
+                t.doctor_id,
+                t.full_name,
+                t.given_name,
+                t.surname,
+                t.rate,
+                t.has_slots,
+                t.allow_questions,
+                dc.primary_city,
+                ds.primary_specialization,
+                COALESCE(dc.city_names, '{{}}'),
+                COALESCE(ds.specialization_names, '{{}}'),
+                COALESCE(dc.clinics, '[]'::json),
+                COALESCE(es.enrichment_status, 'never_attempted'),
+                -- NULL senza dati Google
+                CASE WHEN es.google_places_count > 0 THEN es.google_place_id IS NOT NULL END,
+                es.google_rating,
+                es.google_reviews_count,
+                NOW()
+            FROM target t
+            LEFT JOIN doctor_clinics dc ON dc.doctor_id = t.doctor_id
+            LEFT JOIN doctor_specializations ds ON ds.doctor_id = t.doctor_id
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = t.doctor_id AND es.country_code = %(country_code)s)
+            ON CONFLICT (doctor_id) DO UPDATE SET
+                full_name = EXCLUDED.full_name,
+                given_name = EXCLUDED.given_name,
+                surname = EXCLUDED.surname,
+                rate = EXCLUDED.rate,
+                has_slots = EXCLUDED.has_slots,
+                allow_questions = EXCLUDED.allow_questions,
+                primary_city = EXCLUDED.primary_city,
+                primary_specialization = EXCLUDED.primary_specialization,
+                city_names = EXCLUDED.city_names,
+                specialization_names = EXCLUDED.specialization_names,
+                clinics = EXCLUDED.clinics,
+                enrichment_status = EXCLUDED.enrichment_status,
+                has_google_data = EXCLUDED.has_google_data,
+                google_rating = EXCLUDED.google_rating,
+                google_reviews_count = EXCLUDED.google_reviews_count,
+                refreshed_at = EXCLUDED.refreshed_at
+            RETURNING doctor_id
+        )
+        SELECT 
+            (SELECT COUNT(*) FROM refreshed) as refreshed,
+            (SELECT COUNT(*) FROM removed) as removed
+    """
+
+    loggerManager.logger.debug(f"Search projection refresh query for country {country_code}: "
+                               f"{len(params['doctor_ids']) if doctor_ids is not None else 'all'} doctors")
+    return query, params
+
+
+# to_char format of werkzeug.http.http_date, the format of the datetimes written by jsonify (json_provider)
+HTTP_DATE_FORMAT = 'Dy, DD Mon YYYY HH24:MI:SS "GMT"'
+
+
+def http_date_json(column):
+    """SQL of a timestamp column as jsonify writes it: HTTP date, naive timestamps are UTC"""
+    return f"to_char({column}, '{HTTP_DATE_FORMAT}')"
+
+
+def doctor_details_json(alias='d', es_alias='es'):
+    """
+    SQL json_build_object of the doctor details of an API item, the same object of
+    EnhancedMedicalWorker._build_doctor_details (keys sorted, numeric columns as strings like Decimal in jsonify)
+    :param alias: alias of the doctors row
+    :param es_alias: alias of the doctors.enrichment_state row
+    :return: string SQL expression
+    """
+    return f"""json_build_object(
+                    'allow_questions', {alias}.allow_questions,
+                    'branding', {alias}.branding,
+                    -- _build_doctor_details reads enriched_status, a column no query returns
+                    'can_enrich', true,
+                    'doctor_id', {alias}.doctor_id,
+                    'enriched_at', {http_date_json(f"{es_alias}.enriched_at")},
+                    'enriched_status', 'not_enriched'::text,
+                    'full_name', {alias}.full_name,
+                    'gender', {alias}.gender,
+                    'given_name', {alias}.given_name,
+                    'google_business_name', {es_alias}.google_business_name,
+                    'google_place_id', {es_alias}.google_place_id,
+                    'google_rating', {es_alias}.google_rating::text,
+                    'google_reviews_count', {es_alias}.google_reviews_count,
+                    'has_enrichment_attempts', {es_alias}.last_attempt_id IS NOT NULL,
+                    'has_google_places_data', {es_alias}.google_place_id IS NOT NULL,
+                    'has_slots', {alias}.has_slots,
+                    'last_attempt_status', {es_alias}.last_attempt_status,
+                    'last_enrichment_update', {http_date_json(f"{es_alias}.last_enrichment_update")},
+                    'rate', {alias}.rate::text,
+                    'salutation', {alias}.salutation,
+                    'surname', {alias}.surname,
+                    'url', {alias}.url
+                )"""
 
-    loggerManager.logger.info(f"Lite search query for country {country_code}: {base_query}")
-    return base_query
 
+def clinic_json(alias='c', doctor_id='d.doctor_id'):
+    """
+    SQL json_build_object of a clinic of an API item (EnhancedMedicalWorker._build_clinic), keys sorted.
+    Coordinates are strings, as jsonify writes the Decimal columns.
+    """
+    return f"""json_build_object(
+                    'calendar_active', {alias}.calendar_active,
+                    'city_name', {alias}.city_name,
+                    'clinic_id', {alias}.clinic_id,
+                    'clinic_name', {alias}.clinic_name,
+                    'doctor_id', {doctor_id},
+                    'latitude', {alias}.latitude::text,
+                    'longitude', {alias}.longitude::text,
+                    'online_payment', {alias}.online_payment,
+                    'post_code', {alias}.post_code,
+                    'province', {alias}.province,
+                    'responsibilities', '[]'::json,
+                    'street', {alias}.street
+                )"""
+
+
+def specialization_json(alias='s', doctor_id='d.doctor_id'):
+    """SQL json_build_object of a specialization of an API item (EnhancedMedicalWorker._build_specialization)"""
+    return f"""json_build_object(
+                    'count', 1,
+                    'doctor_id', {doctor_id},
+                    'is_popular', {alias}.is_popular,
+                    'name_plural', {alias}.name_plural,
+                    'specialization_name', {alias}.specialization_name
+                )"""
 
-def get_doctors_query(doctor_id=None, city=None, profession=None, country_code='IT'):
+
+def get_doctors_aggregated_query(doctor_id=None, city=None, profession=None, country_code='IT', json_items=False):
     """
-    Get doctors query for specific country database with services and enrichment status including attempts
+    Get doctors query with one row per doctor, ordered by rate: clinics and specializations are aggregated in SQL
+    as JSON arrays instead of being joined into a flat rowset
     :param doctor_id: int doctor id
     :param city: string city name
     :param profession: string, profession
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :param json_items: bool, one column item with the JSON text of the API item
+                       (_transform_aggregated_to_api_structure) instead of the doctor columns
+    :return: tuple (SQL query string, params dict)
     """
-    
+    params = {'country_code': country_code}
+
+    # Filters applied to the doctors before clinics and specializations are aggregated
+    doctor_filters = []
+    limit_clause = ""
+
     if doctor_id:
-        # Retrieve doctor's complete information by ID including services and enrichment status
-        query = f"""
-                SELECT 
-                    -- Doctor details
-                    d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
-                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url,
-                    -- Clinic details via mapping table
-                    c.clinic_id, c.clinic_name, c.street, c.city_name, c.post_code, c.province,
-                    c.latitude, c.longitude, c.calendar_active, c.online_payment, c.non_doctor,
-                    c.default_fee, c.fee,
-                    -- Specialization details via mapping table
-                    s.specialization_name, s.name_plural, s.is_popular, 1 as count,
-                    -- Service details
-                    so.service_id, so.option_name as service_name, so.description as service_description,
-                    csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                    -- Google Places enrichment status
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                        WHEN ea.id IS NOT NULL THEN 'attempted'
-                        ELSE 'never_attempted'
-                    END as enrichment_status,
-                    gpd.google_place_id,
-                    gpd.enriched_at,
-                    gpd.updated_at as last_enrichment_update,
-                    gpd.business_name as google_business_name,
-                    gpd.rating as google_rating,
-                    gpd.reviews_count as google_reviews_count,
-                    -- Enrichment attempts information
-                    ea.attempt_status as last_attempt_status,
-                    ea.attempted_at as last_attempt_date,
-                    ea.error_message as last_attempt_error,
-                    ea.search_query as last_search_query,
-                    ea.processing_time_ms as last_processing_time,
-                    ea.attempted_by as last_attempted_by,
-                    CASE 
-                        WHEN ea.id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_enrichment_attempts,
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_google_places_data
-                FROM doctors.doctors d
-                LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
-                LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-                LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
-                LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-                LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
-                LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-                LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-                LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
-                WHERE d.doctor_id = {doctor_id}
-                ORDER BY d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name
-                """
-
-    elif city and profession:
-        # Retrieve practitioners from the city with specific profession including services and enrichment status
-        profession = profession.upper()
-        city = city.upper()
-        query = f"""
-                SELECT 
-                    -- Doctor details
-                    d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
-                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url,
-                    -- Clinic details via mapping table
-                    c.clinic_id, c.clinic_name, c.street, c.city_name, c.post_code, c.province,
-                    c.latitude, c.longitude, c.calendar_active, c.online_payment, c.non_doctor,
-                    c.default_fee, c.fee,
-                    -- Specialization details via mapping table
-                    s.specialization_name, s.name_plural, s.is_popular, 1 as count,
-                    -- Service details
-                    so.service_id, so.option_name as service_name, so.description as service_description,
-                    csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                    -- Google Places enrichment status
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                        WHEN ea.id IS NOT NULL THEN 'attempted'
-                        ELSE 'never_attempted'
-                    END as enrichment_status,
-                    gpd.google_place_id,
-                    gpd.enriched_at,
-                    gpd.updated_at as last_enrichment_update,
-                    gpd.business_name as google_business_name,
-                    gpd.rating as google_rating,
-                    gpd.reviews_count as google_reviews_count,
-                    -- Enrichment attempts information
-                    ea.attempt_status as last_attempt_status,
-                    ea.attempted_at as last_attempt_date,
-                    ea.error_message as last_attempt_error,
-                    ea.search_query as last_search_query,
-                    ea.processing_time_ms as last_processing_time,
-                    ea.attempted_by as last_attempted_by,
-                    CASE 
-                        WHEN ea.id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_enrichment_attempts,
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_google_places_data
-                FROM doctors.doctors d
-                LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
-                LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-                LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
-                LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-                LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
-                LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-                LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-                LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
-                WHERE UPPER(c.city_name) = '{city}' AND UPPER(s.specialization_name) = '{profession}'
-                ORDER BY d.rate DESC, d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name
-                """
-
-    elif profession:
-        # Retrieve all practitioners matching the profession including services and enrichment status
-        profession = profession.upper()
-        query = f"""
+        params['doctor_id'] = doctor_id
+        doctor_filters.append("d.doctor_id = %(doctor_id)s")
+
+    else:
+        if city:
+            params['city'] = city.upper()
+            doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_clinics_map dcm_city
+                    JOIN doctors.clinics c_city ON dcm_city.clinic_id = c_city.clinic_id
+                    WHERE dcm_city.doctor_id = d.doctor_id
+                    AND UPPER(c_city.city_name) = %(city)s
+                )""")
+
+        if profession:
+            params['profession'] = profession.upper()
+            doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_specializations_map dsm_prof
+                    JOIN doctors.specializations s_prof ON dsm_prof.specialization_id = s_prof.specialization_id
+                    WHERE dsm_prof.doctor_id = d.doctor_id
+                    AND UPPER(s_prof.specialization_name) = %(profession)s
+                )""")
+
+        if not doctor_filters:
+            # Demo: only few practitioners
+            limit_clause = "LIMIT 50"
+
+    doctor_where = ("WHERE " + "\n                AND ".join(doctor_filters)) if doctor_filters else ""
+
+    if json_items:
+        # The whole item is built here, the API passes the text through (json_provider.raw_items_response)
+        clinic_object = clinic_json(doctor_id='dcm.doctor_id')
+        specialization_object = specialization_json(doctor_id='dsm.doctor_id')
+        select_columns = f"""
+                json_build_object(
+                    'clinics', COALESCE(dc.clinics, '[]'::json),
+                    'details', {doctor_details_json(alias='dp')},
+                    'specializations', COALESCE(ds.specializations, '[]'::json)
+                )::text as item"""
+    else:
+        clinic_object = """json_build_object(
+                            'clinic_id', c.clinic_id,
+                            'clinic_name', c.clinic_name,
+                            'street', c.street,
+                            'city_name', c.city_name,
+                            'post_code', c.post_code,
+                            'province', c.province,
+                            -- As strings, like the Decimal columns in jsonify
+                            'latitude', c.latitude::text,
+                            'longitude', c.longitude::text,
+                            'calendar_active', c.calendar_active,
+                            'online_payment', c.online_payment
+                        )"""
+        specialization_object = """json_build_object(
+                            'specialization_name', s.specialization_name,
+                            'name_plural', s.name_plural,
+                            'is_popular', s.is_popular
+                        )"""
+        select_columns = """
+                -- Doctor details
+                dp.doctor_id, dp.salutation, dp.given_name, dp.surname, dp.full_name, dp.gender, 
+                dp.rate, dp.branding, dp.has_slots, dp.allow_questions, dp.url,
+                -- Clinics and specializations
+                COALESCE(dc.clinics, '[]'::json) as clinics,
+                COALESCE(ds.specializations, '[]'::json) as specializations,
+                -- Google Places enrichment status (doctors.enrichment_state, no row if never attempted)
+                COALESCE(es.enrichment_status, 'never_attempted') as enrichment_status,
+                es.google_place_id,
+                es.enriched_at,
+                es.last_enrichment_update,
+                es.google_business_name,
+                es.google_rating,
+                es.google_reviews_count,
+                -- Enrichment attempts information (one attempt per doctor, country and source)
+                es.last_attempt_status,
+                es.last_attempt_date,
+                es.last_attempt_id IS NOT NULL as has_enrichment_attempts,
+                es.google_place_id IS NOT NULL as has_google_places_data"""
+
+    query = f"""
+            WITH doctor_page AS (
                 SELECT 
-                    -- Doctor details
                     d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
-                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url,
-                    -- Clinic details via mapping table
-                    c.clinic_id, c.clinic_name, c.street, c.city_name, c.post_code, c.province,
-                    c.latitude, c.longitude, c.calendar_active, c.online_payment, c.non_doctor,
-                    c.default_fee, c.fee,
-                    -- Specialization details via mapping table
-                    s.specialization_name, s.name_plural, s.is_popular, 1 as count,
-                    -- Service details
-                    so.service_id, so.option_name as service_name, so.description as service_description,
-                    csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                    -- Google Places enrichment status
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                        WHEN ea.id IS NOT NULL THEN 'attempted'
-                        ELSE 'never_attempted'
-                    END as enrichment_status,
-                    gpd.google_place_id,
-                    gpd.enriched_at,
-                    gpd.updated_at as last_enrichment_update,
-                    gpd.business_name as google_business_name,
-                    gpd.rating as google_rating,
-                    gpd.reviews_count as google_reviews_count,
-                    -- Enrichment attempts information
-                    ea.attempt_status as last_attempt_status,
-                    ea.attempted_at as last_attempt_date,
-                    ea.error_message as last_attempt_error,
-                    ea.search_query as last_search_query,
-                    ea.processing_time_ms as last_processing_time,
-                    ea.attempted_by as last_attempted_by,
-                    CASE 
-                        WHEN ea.id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_enrichment_attempts,
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_google_places_data
+                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url
                 FROM doctors.doctors d
-                LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
-                LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-                LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
-                LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-                LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
-                LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-                LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-                LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
-                WHERE UPPER(s.specialization_name) = '{profession}'
-                ORDER BY d.rate DESC, d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name
-                """
-
-    elif city:
-        # Retrieve all practitioners from the specified city including services and enrichment status
-        city = city.upper()
-        query = f"""
+                {doctor_where}
+                ORDER BY d.rate DESC, d.doctor_id
+                {limit_clause}
+            ),
+            -- Cliniche di ogni dottore come JSON array
+            doctor_clinics AS (
                 SELECT 
-                    -- Doctor details
-                    d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
-                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url,
-                    -- Clinic details via mapping table
-                    c.clinic_id, c.clinic_name, c.street, c.city_name, c.post_code, c.province,
-                    c.latitude, c.longitude, c.calendar_active, c.online_payment, c.non_doctor,
-                    c.default_fee, c.fee,
-                    -- Specialization details via mapping table
-                    s.specialization_name, s.name_plural, s.is_popular, 1 as count,
-                    -- Service details
-                    so.service_id, so.option_name as service_name, so.description as service_description,
-                    csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                    -- Google Places enrichment status
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                        WHEN ea.id IS NOT NULL THEN 'attempted'
-                        ELSE 'never_attempted'
-                    END as enrichment_status,
-                    gpd.google_place_id,
-                    gpd.enriched_at,
-                    gpd.updated_at as last_enrichment_update,
-                    gpd.business_name as google_business_name,
-                    gpd.rating as google_rating,
-                    gpd.reviews_count as google_reviews_count,
-                    -- Enrichment attempts information
-                    ea.attempt_status as last_attempt_status,
-                    ea.attempted_at as last_attempt_date,
-                    ea.error_message as last_attempt_error,
-                    ea.search_query as last_search_query,
-                    ea.processing_time_ms as last_processing_time,
-                    ea.attempted_by as last_attempted_by,
-                    CASE 
-                        WHEN ea.id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_enrichment_attempts,
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_google_places_data
-                FROM doctors.doctors d
-                LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
-                LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-                LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
-                LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-                LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
-                LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-                LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-                LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
-                WHERE UPPER(c.city_name) = '{city}'
-                ORDER BY d.rate DESC, d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name
-                """
-    else:
-        # Demo: Retrieve only few practitioners for demo including services and enrichment status
-        query = f"""
+                    dcm.doctor_id,
+                    json_agg(
+                        {clinic_object}
+                        ORDER BY c.clinic_id
+                    ) as clinics
+                FROM doctor_page dp
+                JOIN doctors.doctors_clinics_map dcm ON dcm.doctor_id = dp.doctor_id
+                JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
+                GROUP BY dcm.doctor_id
+            ),
+            -- Specializzazioni di ogni dottore come JSON array
+            doctor_specializations AS (
                 SELECT 
-                    -- Doctor details
-                    d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
-                    d.rate, d.branding, d.has_slots, d.allow_questions, d.url,
-                    -- Clinic details via mapping table
-                    c.clinic_id, c.clinic_name, c.street, c.city_name, c.post_code, c.province,
-                    c.latitude, c.longitude, c.calendar_active, c.online_payment, c.non_doctor,
-                    c.default_fee, c.fee,
-                    -- Specialization details via mapping table
-                    s.specialization_name, s.name_plural, s.is_popular, 1 as count,
-                    -- Service details
-                    so.service_id, so.option_name as service_name, so.description as service_description,
-                    csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                    -- Google Places enrichment status
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                        WHEN ea.id IS NOT NULL THEN 'attempted'
-                        ELSE 'never_attempted'
-                    END as enrichment_status,
-                    gpd.google_place_id,
-                    gpd.enriched_at,
-                    gpd.updated_at as last_enrichment_update,
-                    gpd.business_name as google_business_name,
-                    gpd.rating as google_rating,
-                    gpd.reviews_count as google_reviews_count,
-                    -- Enrichment attempts information
-                    ea.attempt_status as last_attempt_status,
-                    ea.attempted_at as last_attempt_date,
-                    ea.error_message as last_attempt_error,
-                    ea.search_query as last_search_query,
-                    ea.processing_time_ms as last_processing_time,
-                    ea.attempted_by as last_attempted_by,
-                    CASE 
-                        WHEN ea.id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_enrichment_attempts,
-                    CASE 
-                        WHEN gpd.google_place_id IS NOT NULL THEN true
-                        ELSE false
-                    END as has_google_places_data
-                FROM doctors.doctors d
-                LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
-                LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-                LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
-                LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-                LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
-                LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-                LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-                LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
-                ORDER BY d.rate DESC, d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name
-                LIMIT 50
-                """
-    
-    loggerManager.logger.info(f"Query for country {country_code}: {query}")
-    return query
+                    dsm.doctor_id,
+                    json_agg(
+                        {specialization_object}
+                        ORDER BY s.specialization_name
+                    ) as specializations
+                FROM doctor_page dp
+                JOIN doctors.doctors_specializations_map dsm ON dsm.doctor_id = dp.doctor_id
+                JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
+                GROUP BY dsm.doctor_id
+            )
+            SELECT {select_columns}
+            FROM doctor_page dp
+            LEFT JOIN doctor_clinics dc ON dc.doctor_id = dp.doctor_id
+            LEFT JOIN doctor_specializations ds ON ds.doctor_id = dp.doctor_id
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = dp.doctor_id AND es.country_code = %(country_code)s)
+            ORDER BY dp.rate DESC, dp.doctor_id
+            """
+
+    loggerManager.logger.info(f"Aggregated doctors query for country {country_code}: {query} params: {params}")
+    return query, params
 
 
 def search_doctors_advanced_query(search_term=None, city=None, profession=None, 
                                  min_rate=None, max_rate=None, has_slots=None, 
                                  allow_questions=None, limit=None, enriched_only=None, 
-                                 country_code='IT'):
+                                 country_code='IT', offset=None, cursor=None, order='rate', json_items=False):
     """
-    Advanced search for doctors with multiple filters including services and enrichment status with attempts
+    Advanced search for doctors with multiple filters including services and enrichment status with attempts.
+    Limit and offset count doctors, not joined rows: the page of doctors is selected in a CTE before the joins.
     :param search_term: string, search in doctor name
     :param city: string, city name
     :param profession: string, profession/specialization
@@ -511,13 +519,148 @@ def search_doctors_advanced_query(search_term=None, city=None, profession=None,
     :param max_rate: int, maximum rating
     :param has_slots: boolean, has available slots
     :param allow_questions: boolean, allows questions
-    :param limit: int, maximum number of results
+    :param limit: int, maximum number of doctors
     :param enriched_only: boolean, only doctors with Google Places data
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :param offset: int, number of doctors to skip
+    :param cursor: tuple (rate, doctor_id), return the doctors after it (keyset pagination)
+    :param order: 'rate' (rate DESC, doctor_id) or 'relevance' (name similarity first, only with a search_term)
+    :param json_items: bool, one row per doctor with the JSON text of the API item (item) and rate, doctor_id
+                       instead of the joined rows: the item of _transform_to_api_structure, built from the first
+                       clinic and the first specialization of the doctor (the first joined row)
+    :return: tuple (SQL query string, params dict)
     """
+    params = {'country_code': country_code}
+
+    # Filters on the doctors, used to cut the page
+    doctor_filters = []
+    # Filters on the joined rows, so that the first row of every doctor is still a matching clinic/specialization
+    clinic_conditions = []
+    specialization_conditions = []
+    relevance_column = ""
+    doctor_order = "d.rate DESC, d.doctor_id"
     
-    base_query = f"""
+    if search_term:
+        doctor_filters.append(name_search_condition(search_term, params))
+        if order == 'relevance':
+            relevance_column = f", {name_relevance_expression(search_term, params)} as relevance"
+            doctor_order = "relevance DESC, d.rate DESC, d.doctor_id"
+    
+    if city:
+        params['city'] = city.upper()
+        doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_clinics_map dcm_city
+                    JOIN doctors.clinics c_city ON dcm_city.clinic_id = c_city.clinic_id
+                    WHERE dcm_city.doctor_id = d.doctor_id
+                    AND UPPER(c_city.city_name) = %(city)s
+                )""")
+        clinic_conditions.append("UPPER(c.city_name) = %(city)s")
+    
+    if profession:
+        params['profession'] = profession.upper()
+        doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_specializations_map dsm_prof
+                    JOIN doctors.specializations s_prof ON dsm_prof.specialization_id = s_prof.specialization_id
+                    WHERE dsm_prof.doctor_id = d.doctor_id
+                    AND UPPER(s_prof.specialization_name) = %(profession)s
+                )""")
+        specialization_conditions.append("UPPER(s.specialization_name) = %(profession)s")
+    
+    if min_rate is not None:
+        params['min_rate'] = min_rate
+        doctor_filters.append("d.rate >= %(min_rate)s")
+    
+    if max_rate is not None:
+        params['max_rate'] = max_rate
+        doctor_filters.append("d.rate <= %(max_rate)s")
+    
+    if has_slots is not None:
+        params['has_slots'] = has_slots
+        doctor_filters.append("d.has_slots = %(has_slots)s")
+    
+    if allow_questions is not None:
+        params['allow_questions'] = allow_questions
+        doctor_filters.append("d.allow_questions = %(allow_questions)s")
+    
+    # NUOVO: Aggiungi filtro enriched_only
+    if enriched_only is not None:
+        if enriched_only:
+            doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.enrichment_state es_enr
+                    WHERE es_enr.doctor_id = d.doctor_id
+                    AND es_enr.country_code = %(country_code)s
+                    AND es_enr.google_place_id IS NOT NULL
+                )""")
+        else:
+            doctor_filters.append("""NOT EXISTS (
+                    SELECT 1
+                    FROM doctors.enrichment_state es_enr
+                    WHERE es_enr.doctor_id = d.doctor_id
+                    AND es_enr.country_code = %(country_code)s
+                    AND es_enr.google_place_id IS NOT NULL
+                )""")
+
+    if cursor:
+        doctor_filters.append(keyset_condition(cursor, params))
+
+    doctor_where = ("WHERE " + "\n                AND ".join(doctor_filters)) if doctor_filters else ""
+
+    # Add LIMIT and OFFSET only if specified, they are applied to the doctors
+    page_clause = ""
+    if limit is not None:
+        params['limit'] = limit
+        page_clause += "\n                LIMIT %(limit)s"
+    if offset:
+        params['offset'] = offset
+        page_clause += "\n                OFFSET %(offset)s"
+
+    doctor_page = f"""
+            WITH doctor_page AS (
+                SELECT d.*{relevance_column}
+                FROM doctors.doctors d
+                {doctor_where}
+                ORDER BY {doctor_order}{page_clause}
+            )"""
+
+    if json_items:
+        # First joined row of every doctor: lowest matching clinic_id, first matching specialization_name
+        clinic_condition = "".join(f"\n                    AND {condition}" for condition in clinic_conditions)
+        specialization_condition = "".join(f"\n                    AND {condition}" for condition in specialization_conditions)
+        query = f"""{doctor_page}
+            SELECT
+                json_build_object(
+                    'clinics', COALESCE(fc.clinics, '[]'::json),
+                    'details', {doctor_details_json()},
+                    'specializations', COALESCE(fs.specializations, '[]'::json)
+                )::text as item,
+                d.rate, d.doctor_id
+            FROM doctor_page d
+            LEFT JOIN LATERAL (
+                SELECT json_build_array({clinic_json()}) as clinics
+                FROM doctors.doctors_clinics_map dcm
+                JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
+                WHERE dcm.doctor_id = d.doctor_id{clinic_condition}
+                ORDER BY c.clinic_id
+                LIMIT 1
+            ) fc ON true
+            LEFT JOIN LATERAL (
+                SELECT json_build_array({specialization_json()}) as specializations
+                FROM doctors.doctors_specializations_map dsm
+                JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
+                WHERE dsm.doctor_id = d.doctor_id{specialization_condition}
+                ORDER BY s.specialization_name
+                LIMIT 1
+            ) fs ON true
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = d.doctor_id AND es.country_code = %(country_code)s)
+            ORDER BY {doctor_order}
+            """
+        loggerManager.logger.info(f"Advanced search items query for country {country_code}: {query} params: {params}")
+        return query, params
+
+    base_query = f"""{doctor_page}
             SELECT 
                 -- Doctor details
                 d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
@@ -531,101 +674,108 @@ def search_doctors_advanced_query(search_term=None, city=None, profession=None,
                 -- Service details
                 so.service_id, so.option_name as service_name, so.description as service_description,
                 csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                -- Google Places enrichment status
-                CASE 
-                    WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
-                    WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
-                    WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
-                    WHEN ea.id IS NOT NULL THEN 'attempted'
-                    ELSE 'never_attempted'
-                END as enrichment_status,
-                gpd.google_place_id,
-                gpd.enriched_at,
-                gpd.updated_at as last_enrichment_update,
-                gpd.business_name as google_business_name,
-                gpd.rating as google_rating,
-                gpd.reviews_count as google_reviews_count,
+                -- Google Places enrichment status (doctors.enrichment_state, no row if never attempted)
+                COALESCE(es.enrichment_status, 'never_attempted') as enrichment_status,
+                es.google_place_id,
+                es.enriched_at,
+                es.last_enrichment_update,
+                es.google_business_name,
+                es.google_rating,
+                es.google_reviews_count,
                 -- Enrichment attempts information
-                ea.attempt_status as last_attempt_status,
-                ea.attempted_at as last_attempt_date,
-                ea.error_message as last_attempt_error,
-                ea.search_query as last_search_query,
-                ea.processing_time_ms as last_processing_time,
-                ea.attempted_by as last_attempted_by,
-                CASE 
-                    WHEN ea.id IS NOT NULL THEN true
-                    ELSE false
-                END as has_enrichment_attempts,
-                CASE 
-                    WHEN gpd.google_place_id IS NOT NULL THEN true
-                    ELSE false
-                END as has_google_places_data
-            FROM doctors.doctors d
+                es.last_attempt_status,
+                es.last_attempt_date,
+                es.last_attempt_error,
+                es.last_search_query,
+                es.last_processing_time,
+                es.last_attempted_by,
+                es.last_attempt_id IS NOT NULL as has_enrichment_attempts,
+                es.google_place_id IS NOT NULL as has_google_places_data
+            FROM doctor_page d
             LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
             LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
             LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
             LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
             LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
             LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-            LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
-            LEFT JOIN doctors.enrichment_attempts ea ON (d.doctor_id = ea.doctor_id AND ea.country_code = '{country_code}' AND ea.enrichment_source = 'google_places')
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = d.doctor_id AND es.country_code = %(country_code)s)
             WHERE 1=1
             """
     
-    conditions = []
-    
-    if search_term:
-        search_term = search_term.replace("'", "''")  # Escape single quotes
-        conditions.append(f"(UPPER(d.full_name) LIKE UPPER('%{search_term}%') OR UPPER(d.given_name) LIKE UPPER('%{search_term}%') OR UPPER(d.surname) LIKE UPPER('%{search_term}%'))")
-    
-    if city:
-        city = city.upper().replace("'", "''")
-        conditions.append(f"UPPER(c.city_name) = '{city}'")
-    
-    if profession:
-        profession = profession.upper().replace("'", "''")
-        conditions.append(f"UPPER(s.specialization_name) = '{profession}'")
-    
-    if min_rate is not None:
-        conditions.append(f"d.rate >= {min_rate}")
-    
-    if max_rate is not None:
-        conditions.append(f"d.rate <= {max_rate}")
-    
-    if has_slots is not None:
-        conditions.append(f"d.has_slots = {has_slots}")
+    row_conditions = clinic_conditions + specialization_conditions
+    if row_conditions:
+        base_query += " AND " + " AND ".join(row_conditions)
     
-    if allow_questions is not None:
-        conditions.append(f"d.allow_questions = {allow_questions}")
+    base_query += f" ORDER BY {doctor_order}, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name"
     
-    # NUOVO: Aggiungi filtro enriched_only
-    if enriched_only is not None:
-        if enriched_only:
-            conditions.append("gpd.google_place_id IS NOT NULL")
-        else:
-            conditions.append("gpd.google_place_id IS NULL")
-    
-    if conditions:
-        base_query += " AND " + " AND ".join(conditions)
-    
-    base_query += " ORDER BY d.rate DESC, d.doctor_id, c.clinic_id, s.specialization_name, csom.is_default DESC, so.option_name"
-    
-    # Add LIMIT only if specified
-    if limit is not None:
-        base_query += f" LIMIT {limit}"
-    
-    loggerManager.logger.info(f"Advanced search query for country {country_code}: {base_query}")
-    return base_query
+    loggerManager.logger.info(f"Advanced search query for country {country_code}: {base_query} params: {params}")
+    return base_query, params
 
-def get_doctors_with_slots_query(city=None, profession=None, country_code='IT'):
+def get_doctors_with_slots_query(city=None, profession=None, country_code='IT', limit=None, cursor=None):
     """
     Get doctors with available slots including services and enrichment status
     :param city: string, city name (optional)
     :param profession: string, profession/specialization (optional)
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :param limit: int, maximum number of doctors (optional)
+    :param cursor: tuple (rate, doctor_id), return the doctors after it (keyset pagination)
+    :return: tuple (SQL query string, params dict)
     """
-    base_query = """
+    params = {'country_code': country_code}
+
+    # Filters on the doctors, used to cut the page. They must match the filters on the joined rows: every doctor
+    # of the page yields at least one row, otherwise the page comes back short and loses its next cursor
+    doctor_filters = []
+    # Filters on the joined rows
+    conditions = []
+    
+    if city:
+        params['city'] = city.upper()
+        # Slots and city on the same clinic, as the joined rows require
+        doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_clinics_map dcm_city
+                    JOIN doctors.clinics c_city ON dcm_city.clinic_id = c_city.clinic_id
+                    WHERE dcm_city.doctor_id = d.doctor_id
+                    AND UPPER(c_city.city_name) = %(city)s
+                    AND (d.has_slots = true OR c_city.has_slots = true)
+                )""")
+        conditions.append("UPPER(c.city_name) = %(city)s")
+    else:
+        doctor_filters.append("""(d.has_slots = true OR EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_clinics_map dcm_slots
+                    JOIN doctors.clinics c_slots ON dcm_slots.clinic_id = c_slots.clinic_id
+                    WHERE dcm_slots.doctor_id = d.doctor_id
+                    AND c_slots.has_slots = true
+                ))""")
+    
+    if profession:
+        params['profession'] = profession.upper()
+        doctor_filters.append("""EXISTS (
+                    SELECT 1
+                    FROM doctors.doctors_specializations_map dsm_prof
+                    JOIN doctors.specializations s_prof ON dsm_prof.specialization_id = s_prof.specialization_id
+                    WHERE dsm_prof.doctor_id = d.doctor_id
+                    AND UPPER(s_prof.specialization_name) = %(profession)s
+                )""")
+        conditions.append("UPPER(s.specialization_name) = %(profession)s")
+
+    if cursor:
+        doctor_filters.append(keyset_condition(cursor, params))
+
+    page_clause = ""
+    if limit is not None:
+        params['limit'] = limit
+        page_clause = "\n                LIMIT %(limit)s"
+
+    base_query = f"""
+            WITH doctor_page AS (
+                SELECT d.*
+                FROM doctors.doctors d
+                WHERE {" AND ".join(doctor_filters)}
+                ORDER BY d.rate DESC, d.doctor_id{page_clause}
+            )
             SELECT 
                 -- Doctor details
                 d.doctor_id, d.salutation, d.given_name, d.surname, d.full_name, d.gender, 
@@ -639,52 +789,42 @@ def get_doctors_with_slots_query(city=None, profession=None, country_code='IT'):
                 -- Service details
                 so.service_id, so.option_name as service_name, so.description as service_description,
                 csom.service_price, csom.service_price_decimal, csom.is_price_from, csom.is_default as is_default_service,
-                -- Google Places enrichment status
+                -- Google Places enrichment status (doctors.enrichment_state)
                 CASE 
-                    WHEN gpd.google_place_id IS NOT NULL THEN 'enriched'
+                    WHEN es.google_place_id IS NOT NULL THEN 'enriched'
                     ELSE 'not_enriched'
                 END as enriched_status,
-                gpd.google_place_id,
-                gpd.enriched_at,
-                gpd.updated_at as last_enrichment_update,
-                gpd.business_name as google_business_name,
-                gpd.rating as google_rating,
-                gpd.reviews_count as google_reviews_count
-            FROM doctors.doctors d
+                es.google_place_id,
+                es.enriched_at,
+                es.last_enrichment_update,
+                es.google_business_name,
+                es.google_rating,
+                es.google_reviews_count
+            FROM doctor_page d
             LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
             LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
             LEFT JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
             LEFT JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
             LEFT JOIN doctors.clinics_service_options_map csom ON (c.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
             LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
-            LEFT JOIN doctors.google_places_data gpd ON d.doctor_id = gpd.doctor_id
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = d.doctor_id AND es.country_code = %(country_code)s)
             WHERE (d.has_slots = true OR c.has_slots = true)
             """
     
-    conditions = []
-    
-    if city:
-        city = city.upper().replace("'", "''")
-        conditions.append(f"UPPER(c.city_name) = '{city}'")
-    
-    if profession:
-        profession = profession.upper().replace("'", "''")
-        conditions.append(f"UPPER(s.specialization_name) = '{profession}'")
-    
     if conditions:
         base_query += " AND " + " AND ".join(conditions)
     
-    base_query += " ORDER BY d.rate DESC, c.nearest_slot_date ASC NULLS LAST, csom.is_default DESC, so.option_name"
+    base_query += " ORDER BY d.rate DESC, d.doctor_id, c.nearest_slot_date ASC NULLS LAST, csom.is_default DESC, so.option_name"
     
-    loggerManager.logger.info(f"Doctors with slots query for country {country_code}: {base_query}")
-    return base_query
+    loggerManager.logger.info(f"Doctors with slots query for country {country_code}: {base_query} params: {params}")
+    return base_query, params
 
 # Keep all other existing functions unchanged...
 def get_specializations_query(country_code='IT'):
     """
     Get all specializations for a specific country
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     query = """
             SELECT 
@@ -701,14 +841,14 @@ def get_specializations_query(country_code='IT'):
             """
     
     loggerManager.logger.info(f"Specializations query for country {country_code}: {query}")
-    return query
+    return query, {}
 
 
 def get_cities_query(country_code='IT'):
     """
     Get all cities with doctors for a specific country
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     query = """
             SELECT 
@@ -725,7 +865,7 @@ def get_cities_query(country_code='IT'):
             """
     
     loggerManager.logger.info(f"Cities query for country {country_code}: {query}")
-    return query
+    return query, {}
 
 
 def get_doctor_opinions_query(doctor_id, country_code='IT'):
@@ -733,9 +873,9 @@ def get_doctor_opinions_query(doctor_id, country_code='IT'):
     Get opinions/reviews for a specific doctor
     :param doctor_id: int, doctor ID
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
-    query = f"""
+    query = """
             SELECT 
                 o.opinion_id,
                 o.doctor_id,
@@ -748,12 +888,12 @@ def get_doctor_opinions_query(doctor_id, country_code='IT'):
                 d.full_name as doctor_name
             FROM doctors.opinions o
             LEFT JOIN doctors.doctors d ON o.doctor_id = d.doctor_id
-            WHERE o.doctor_id = {doctor_id}
+            WHERE o.doctor_id = %(doctor_id)s
             ORDER BY o.created_at DESC
             """
     
     loggerManager.logger.info(f"Doctor opinions query for doctor {doctor_id} in country {country_code}: {query}")
-    return query
+    return query, {'doctor_id': doctor_id}
 
 
 def get_doctor_opinion_stats_query(doctor_id, country_code='IT'):
@@ -761,9 +901,9 @@ def get_doctor_opinion_stats_query(doctor_id, country_code='IT'):
     Get opinion statistics for a specific doctor
     :param doctor_id: int, doctor ID
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
-    query = f"""
+    query = """
             SELECT 
                 os.doctor_id,
                 os.positive,
@@ -778,11 +918,11 @@ def get_doctor_opinion_stats_query(doctor_id, country_code='IT'):
                 d.rate
             FROM doctors.opinions_stats os
             LEFT JOIN doctors.doctors d ON os.doctor_id = d.doctor_id
-            WHERE os.doctor_id = {doctor_id}
+            WHERE os.doctor_id = %(doctor_id)s
             """
     
     loggerManager.logger.info(f"Doctor opinion stats query for doctor {doctor_id} in country {country_code}: {query}")
-    return query
+    return query, {'doctor_id': doctor_id}
 
 
 def get_clinic_telephones_query(clinic_id, country_code='IT'):
@@ -790,9 +930,9 @@ def get_clinic_telephones_query(clinic_id, country_code='IT'):
     Get telephone numbers for a specific clinic
     :param clinic_id: int, clinic ID
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
-    query = f"""
+    query = """
             SELECT 
                 t.telephone_id,
                 t.clinic_id,
@@ -800,12 +940,12 @@ def get_clinic_telephones_query(clinic_id, country_code='IT'):
                 c.clinic_name
             FROM doctors.telephones t
             LEFT JOIN doctors.clinics c ON t.clinic_id = c.clinic_id
-            WHERE t.clinic_id = {clinic_id}
+            WHERE t.clinic_id = %(clinic_id)s
             ORDER BY t.telephone_id
             """
     
     loggerManager.logger.info(f"Clinic telephones query for clinic {clinic_id} in country {country_code}: {query}")
-    return query
+    return query, {'clinic_id': clinic_id}
 
 
 def get_clinic_services_query(clinic_id, country_code='IT'):
@@ -813,9 +953,9 @@ def get_clinic_services_query(clinic_id, country_code='IT'):
     Get services for a specific clinic
     :param clinic_id: int, clinic ID
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
-    query = f"""
+    query = """
             SELECT 
                 csom.id as mapping_id,
                 csom.clinic_id,
@@ -833,12 +973,12 @@ def get_clinic_services_query(clinic_id, country_code='IT'):
             LEFT JOIN doctors.service_options so ON csom.service_id = so.service_id
             LEFT JOIN doctors.clinics c ON csom.clinic_id = c.clinic_id
             LEFT JOIN doctors.doctors d ON csom.doctor_id = d.doctor_id
-            WHERE csom.clinic_id = {clinic_id}
+            WHERE csom.clinic_id = %(clinic_id)s
             ORDER BY csom.is_default DESC, so.option_name
             """
     
     loggerManager.logger.info(f"Clinic services query for clinic {clinic_id} in country {country_code}: {query}")
-    return query
+    return query, {'clinic_id': clinic_id}
 
 
 def get_popular_specializations_query(limit=10, country_code='IT'):
@@ -846,9 +986,9 @@ def get_popular_specializations_query(limit=10, country_code='IT'):
     Get most popular specializations
     :param limit: int, number of results to return
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
-    query = f"""
+    query = """
             SELECT 
                 s.specialization_id,
                 s.specialization_name,
@@ -861,21 +1001,28 @@ def get_popular_specializations_query(limit=10, country_code='IT'):
             WHERE s.is_popular = true
             GROUP BY s.specialization_id, s.specialization_name, s.name_plural, s.name_female, s.is_popular
             ORDER BY doctor_count DESC, s.specialization_name
-            LIMIT {limit}
+            LIMIT %(limit)s
             """
     
     loggerManager.logger.info(f"Popular specializations query for country {country_code}: {query}")
-    return query
+    return query, {'limit': limit}
 
 
-def get_top_rated_doctors_query(limit=20, min_rate=4, country_code='IT'):
+def get_top_rated_doctors_query(limit=20, min_rate=4, country_code='IT', cursor=None):
     """
     Get top rated doctors
     :param limit: int, number of results to return
     :param min_rate: int, minimum rating
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :param cursor: tuple (rate, doctor_id), return the doctors after it (keyset pagination)
+    :return: tuple (SQL query string, params dict)
     """
+    params = {'min_rate': min_rate, 'limit': limit}
+
+    cursor_condition = ""
+    if cursor:
+        cursor_condition = "AND " + keyset_condition(cursor, params)
+
     query = f"""
             SELECT DISTINCT
                 -- Doctor details
@@ -889,20 +1036,21 @@ def get_top_rated_doctors_query(limit=20, min_rate=4, country_code='IT'):
                 END as positive_percentage
             FROM doctors.doctors d
             LEFT JOIN doctors.opinions_stats os ON d.doctor_id = os.doctor_id
-            WHERE d.rate >= {min_rate}
-            ORDER BY d.rate DESC, positive_percentage DESC, os.total DESC
-            LIMIT {limit}
+            WHERE d.rate >= %(min_rate)s
+            {cursor_condition}
+            ORDER BY d.rate DESC, d.doctor_id
+            LIMIT %(limit)s
             """
     
     loggerManager.logger.info(f"Top rated doctors query for country {country_code}: {query}")
-    return query
+    return query, params
 
 
 def get_database_stats_query(country_code='IT'):
     """
     Get database statistics
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     query = """
             SELECT 
@@ -934,98 +1082,151 @@ def get_database_stats_query(country_code='IT'):
             """
     
     loggerManager.logger.info(f"Database stats query for country {country_code}: {query}")
-    return query
+    return query, {}
+
+
+def get_data_version_query(country_code='IT'):
+    """
+    Latest changes of the data of a country: the data version of the conditional responses (ETag, Last-Modified)
+    :param country_code: string, country code (DE, IT)
+    :return: tuple (SQL query string, params dict)
+    """
+    params = {'country_code': country_code}
+
+    query = """
+            SELECT 
+                (SELECT MAX(d.modified) FROM doctors.doctors d) as doctors_modified,
+                (SELECT MAX(gpd.updated_at) FROM doctors.google_places_data gpd
+                 WHERE gpd.country_code = %(country_code)s) as google_places_updated,
+                (SELECT MAX(ea.attempted_at) FROM doctors.enrichment_attempts ea
+                 WHERE ea.country_code = %(country_code)s) as enrichment_attempted
+            """
+
+    loggerManager.logger.debug(f"Data version query for country {country_code}")
+    return query, params
 
 
 
 # Aggiungi queste funzioni alla fine di api/lib/sql_queries.py
 
+# Colonne scritte da insert_google_place_data_query e insert_google_places_bulk_query
+GOOGLE_PLACE_COLUMNS = [
+    'google_place_id',
+    'doctor_id',
+    'business_name',
+    'business_status',
+    'rating',
+    'reviews_count',
+    'phone',
+    'email',
+    'website',
+    'google_maps_url',
+    'formatted_address',
+    'latitude',
+    'longitude',
+    'opening_hours',
+    'photos',
+    'types',
+    'reviews',
+    'original_doctor_name',
+    'original_doctor_surname',
+    'country_code',
+    'enriched_at',
+]
+
+# Colonne aggiornate quando il google_place_id è già salvato, le altre restano quelle del primo salvataggio
+GOOGLE_PLACE_UPDATED_COLUMNS = [
+    'rating',
+    'reviews_count',
+    'reviews',
+    'phone',
+    'email',
+    'website',
+]
+
+GOOGLE_PLACE_UPSERT = """
+            ON CONFLICT (google_place_id) 
+            DO UPDATE SET 
+                updated_at = NOW(),""" + ",".join(f"""
+                {column} = EXCLUDED.{column}""" for column in GOOGLE_PLACE_UPDATED_COLUMNS)
+
+
+def google_place_params(place_data, country_code='IT'):
+    """
+    Values of the columns of a Google Place, from the payload of the Google Places API
+    :param place_data: dict, Google Places API data
+    :param country_code: string, country code (DE, IT)
+    :return: dict {column: value} for GOOGLE_PLACE_COLUMNS
+    """
+    return {
+        'google_place_id': place_data.get('google_place_id'),
+        'doctor_id': place_data.get('doctor_id'),
+        'business_name': place_data.get('business_name'),
+        'business_status': place_data.get('business_status'),
+        'rating': place_data.get('rating') or None,
+        'reviews_count': place_data.get('reviews_count', 0),
+        'phone': place_data.get('phone'),
+        'email': place_data.get('email'),
+        'website': place_data.get('website'),
+        'google_maps_url': place_data.get('google_maps_url'),
+        'formatted_address': place_data.get('formatted_address'),
+        'latitude': place_data.get('location', {}).get('lat') or None,
+        'longitude': place_data.get('location', {}).get('lng') or None,
+        'opening_hours': json_param(place_data.get('opening_hours')),
+        'photos': json_param(place_data.get('photos')),
+        'types': json_param(place_data.get('types')),
+        'reviews': json_param(place_data.get('reviews')),
+        'original_doctor_name': place_data.get('original_doctor', {}).get('name'),
+        'original_doctor_surname': place_data.get('original_doctor', {}).get('surname'),
+        'country_code': country_code,
+        'enriched_at': place_data.get('enriched_at')
+    }
+
+
 def insert_google_place_data_query(place_data, country_code='IT'):
     """
     Insert Google Places data into google_places_data table
     :param place_data: dict, Google Places API data (must include doctor_id)
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     
     # Validazione doctor_id obbligatorio
     if not place_data.get('doctor_id'):
         raise ValueError("doctor_id is required for Google Places data")
     
-    # Escape single quotes for SQL safety
-    def escape_sql(value):
-        if value is None:
-            return 'NULL'
-        if isinstance(value, str):
-            escaped = value.replace("'", "''")
-            return f"'{escaped}'"
-        if isinstance(value, (dict, list)):
-            import json
-            json_str = json.dumps(value)
-            escaped = json_str.replace("'", "''")
-            return f"'{escaped}'"
-        return str(value)
+    params = google_place_params(place_data, country_code=country_code)
     
     query = f"""
             INSERT INTO doctors.google_places_data (
-                google_place_id,
-                doctor_id,
-                business_name,
-                business_status,
-                rating,
-                reviews_count,
-                phone,
-                email,
-                website,
-                google_maps_url,
-                formatted_address,
-                latitude,
-                longitude,
-                opening_hours,
-                photos,
-                types,
-                reviews,
-                original_doctor_name,
-                original_doctor_surname,
-                country_code,
-                enriched_at
+                {", ".join(GOOGLE_PLACE_COLUMNS)}
             ) VALUES (
-                {escape_sql(place_data.get('google_place_id'))},
-                {place_data.get('doctor_id')},
-                {escape_sql(place_data.get('business_name'))},
-                {escape_sql(place_data.get('business_status'))},
-                {place_data.get('rating') or 'NULL'},
-                {place_data.get('reviews_count', 0)},
-                {escape_sql(place_data.get('phone'))},
-                {escape_sql(place_data.get('email'))},
-                {escape_sql(place_data.get('website'))},
-                {escape_sql(place_data.get('google_maps_url'))},
-                {escape_sql(place_data.get('formatted_address'))},
-                {place_data.get('location', {}).get('lat') or 'NULL'},
-                {place_data.get('location', {}).get('lng') or 'NULL'},
-                {escape_sql(place_data.get('opening_hours'))},
-                {escape_sql(place_data.get('photos'))},
-                {escape_sql(place_data.get('types'))},
-                {escape_sql(place_data.get('reviews'))},
-                {escape_sql(place_data.get('original_doctor', {}).get('name'))},
-                {escape_sql(place_data.get('original_doctor', {}).get('surname'))},
-                {escape_sql(country_code)},
-                {escape_sql(place_data.get('enriched_at'))}
-            )
-            ON CONFLICT (google_place_id) 
-            DO UPDATE SET 
-                updated_at = NOW(),
-                rating = EXCLUDED.rating,
-                reviews_count = EXCLUDED.reviews_count,
-                reviews = EXCLUDED.reviews,
-                phone = EXCLUDED.phone,
-                email = EXCLUDED.email,
-                website = EXCLUDED.website
+                {", ".join(f"%({column})s" for column in GOOGLE_PLACE_COLUMNS)}
+            ){GOOGLE_PLACE_UPSERT}
             RETURNING id, google_place_id, doctor_id;
             """
     
     loggerManager.logger.info(f"Insert Google Place query for doctor_id: {place_data.get('doctor_id')}, country: {country_code}")
-    return query
+    return query, params
+
+
+def insert_google_places_bulk_query(country_code='IT'):
+    """
+    Multi-row insert of Google Places data, for psycopg2.extras.execute_values: the rows of one statement must not
+    repeat a google_place_id, ON CONFLICT cannot update the same row twice
+    :param country_code: string, country code (DE, IT)
+    :return: tuple (SQL query string with one VALUES %s, row template for the dicts of google_place_params)
+    """
+    query = f"""
+            INSERT INTO doctors.google_places_data (
+                {", ".join(GOOGLE_PLACE_COLUMNS)}
+            ) VALUES %s{GOOGLE_PLACE_UPSERT}
+            RETURNING id, google_place_id, doctor_id
+            """
+    template = "(" + ", ".join(f"%({column})s" for column in GOOGLE_PLACE_COLUMNS) + ")"
+
+    loggerManager.logger.debug(f"Bulk insert Google Places query for country {country_code}")
+    return query, template
 
 
 def get_google_places_data_query(google_place_id=None, doctor_id=None, country_code='IT', limit=None):
@@ -1035,7 +1236,7 @@ def get_google_places_data_query(google_place_id=None, doctor_id=None, country_c
     :param doctor_id: int, specific doctor ID
     :param country_code: string, country code (DE, IT)
     :param limit: int, limit results
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     
     base_query = """
@@ -1070,16 +1271,19 @@ def get_google_places_data_query(google_place_id=None, doctor_id=None, country_c
                 d.rate as doctor_rate
             FROM doctors.google_places_data gpd
             INNER JOIN doctors.doctors d ON gpd.doctor_id = d.doctor_id
-            WHERE gpd.country_code = '{}'
-            """.format(country_code)
+            WHERE gpd.country_code = %(country_code)s
+            """
+    params = {'country_code': country_code}
     
     conditions = []
     
     if google_place_id:
-        conditions.append(f"gpd.google_place_id = '{google_place_id}'")
+        params['google_place_id'] = google_place_id
+        conditions.append("gpd.google_place_id = %(google_place_id)s")
     
     if doctor_id:
-        conditions.append(f"gpd.doctor_id = {doctor_id}")
+        params['doctor_id'] = doctor_id
+        conditions.append("gpd.doctor_id = %(doctor_id)s")
     
     if conditions:
         base_query += " AND " + " AND ".join(conditions)
@@ -1087,10 +1291,11 @@ def get_google_places_data_query(google_place_id=None, doctor_id=None, country_c
     base_query += " ORDER BY gpd.created_at DESC"
     
     if limit:
-        base_query += f" LIMIT {limit}"
+        params['limit'] = limit
+        base_query += " LIMIT %(limit)s"
     
     loggerManager.logger.info(f"Get Google Places query for country {country_code}, doctor_id: {doctor_id}")
-    return base_query
+    return base_query, params
 
 
 # STEP 2: Aggiungi queste funzioni alla fine del file api/lib/sql_queries.py
@@ -1098,82 +1303,102 @@ def get_google_places_data_query(google_place_id=None, doctor_id=None, country_c
 # CORREGGI la funzione insert_enrichment_attempt_query in api/lib/sql_queries.py
 # Il problema è che escape_sql non viene chiamato correttamente per attempted_by
 
+# Colonne scritte da insert_enrichment_attempt_query e insert_enrichment_attempts_bulk_query
+ENRICHMENT_ATTEMPT_COLUMNS = [
+    'doctor_id',
+    'country_code',
+    'attempt_status',
+    'enrichment_source',
+    'search_query',
+    'doctor_name',
+    'doctor_surname',
+    'clinic_name',
+    'clinic_address',
+    'google_place_id',
+    'places_found',
+    'error_message',
+    'attempted_by',
+    'processing_time_ms',
+]
+
+ENRICHMENT_ATTEMPT_UPSERT = """
+            ON CONFLICT (doctor_id, country_code, enrichment_source) 
+            DO UPDATE SET 
+                attempt_status = EXCLUDED.attempt_status,
+                search_query = EXCLUDED.search_query,
+                google_place_id = EXCLUDED.google_place_id,
+                places_found = EXCLUDED.places_found,
+                error_message = EXCLUDED.error_message,
+                attempted_by = EXCLUDED.attempted_by,
+                attempted_at = NOW(),
+                processing_time_ms = EXCLUDED.processing_time_ms"""
+
+
+def enrichment_attempt_params(attempt_data, country_code='IT'):
+    """
+    Values of the columns of an enrichment attempt, with the defaults of the API
+    :param attempt_data: dict with attempt information
+    :param country_code: string, country code (DE, IT)
+    :return: dict {column: value} for ENRICHMENT_ATTEMPT_COLUMNS
+    """
+    return {
+        'doctor_id': attempt_data.get('doctor_id'),
+        'country_code': country_code,
+        'attempt_status': attempt_data.get('attempt_status', 'attempted'),
+        'enrichment_source': attempt_data.get('enrichment_source', 'google_places'),
+        'search_query': attempt_data.get('search_query'),
+        'doctor_name': attempt_data.get('doctor_name'),
+        'doctor_surname': attempt_data.get('doctor_surname'),
+        'clinic_name': attempt_data.get('clinic_name'),
+        'clinic_address': attempt_data.get('clinic_address'),
+        'google_place_id': attempt_data.get('google_place_id'),
+        'places_found': attempt_data.get('places_found', 0),
+        'error_message': attempt_data.get('error_message'),
+        'attempted_by': json_param(attempt_data.get('attempted_by')),
+        'processing_time_ms': attempt_data.get('processing_time_ms') or None
+    }
+
+
 def insert_enrichment_attempt_query(attempt_data, country_code='IT'):
     """
     Insert enrichment attempt record
     :param attempt_data: dict with attempt information
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     
-    # Escape single quotes for SQL safety
-    def escape_sql(value):
-        if value is None:
-            return 'NULL'
-        if isinstance(value, str):
-            escaped = value.replace("'", "''")
-            return f"'{escaped}'"
-        if isinstance(value, (dict, list)):
-            import json
-            json_str = json.dumps(value)
-            escaped = json_str.replace("'", "''")
-            return f"'{escaped}'"
-        return str(value)
-    
-    # CORREZIONE: Usa escape_sql anche per attempted_by
-    attempted_by = attempt_data.get('attempted_by')
-    if attempted_by is not None:
-        attempted_by_sql = escape_sql(attempted_by)  # <-- QUESTO ERA IL PROBLEMA
-    else:
-        attempted_by_sql = 'NULL'
+    params = enrichment_attempt_params(attempt_data, country_code=country_code)
 
     query = f"""
             INSERT INTO doctors.enrichment_attempts (
-                doctor_id,
-                country_code,
-                attempt_status,
-                enrichment_source,
-                search_query,
-                doctor_name,
-                doctor_surname,
-                clinic_name,
-                clinic_address,
-                google_place_id,
-                places_found,
-                error_message,
-                attempted_by,
-                processing_time_ms
+                {", ".join(ENRICHMENT_ATTEMPT_COLUMNS)}
             ) VALUES (
-                {attempt_data.get('doctor_id')},
-                {escape_sql(country_code)},
-                {escape_sql(attempt_data.get('attempt_status', 'attempted'))},
-                {escape_sql(attempt_data.get('enrichment_source', 'google_places'))},
-                {escape_sql(attempt_data.get('search_query'))},
-                {escape_sql(attempt_data.get('doctor_name'))},
-                {escape_sql(attempt_data.get('doctor_surname'))},
-                {escape_sql(attempt_data.get('clinic_name'))},
-                {escape_sql(attempt_data.get('clinic_address'))},
-                {escape_sql(attempt_data.get('google_place_id'))},
-                {attempt_data.get('places_found', 0)},
-                {escape_sql(attempt_data.get('error_message'))},
-                {attempted_by_sql},
-                {attempt_data.get('processing_time_ms') or 'NULL'}
-            )
-            ON CONFLICT (doctor_id, country_code, enrichment_source) 
-            DO UPDATE SET 
-                attempt_status = EXCLUDED.attempt_status,
-                search_query = EXCLUDED.search_query,
-                google_place_id = EXCLUDED.google_place_id,
-                places_found = EXCLUDED.places_found,
-                error_message = EXCLUDED.error_message,
-                attempted_by = EXCLUDED.attempted_by,
-                attempted_at = NOW(),
-                processing_time_ms = EXCLUDED.processing_time_ms
+                {", ".join(f"%({column})s" for column in ENRICHMENT_ATTEMPT_COLUMNS)}
+            ){ENRICHMENT_ATTEMPT_UPSERT}
             RETURNING id, doctor_id, attempt_status;
             """
     
     loggerManager.logger.info(f"Insert enrichment attempt for doctor_id: {attempt_data.get('doctor_id')}, country: {country_code}")
-    return query
+    return query, params
+
+
+def insert_enrichment_attempts_bulk_query(country_code='IT'):
+    """
+    Multi-row insert of enrichment attempts, for psycopg2.extras.execute_values: the rows of one statement must not
+    repeat a (doctor_id, enrichment_source), ON CONFLICT cannot update the same row twice
+    :param country_code: string, country code (DE, IT)
+    :return: tuple (SQL query string with one VALUES %s, row template for the dicts of enrichment_attempt_params)
+    """
+    query = f"""
+            INSERT INTO doctors.enrichment_attempts (
+                {", ".join(ENRICHMENT_ATTEMPT_COLUMNS)}
+            ) VALUES %s{ENRICHMENT_ATTEMPT_UPSERT}
+            RETURNING id, doctor_id, attempt_status, enrichment_source
+            """
+    template = "(" + ", ".join(f"%({column})s" for column in ENRICHMENT_ATTEMPT_COLUMNS) + ")"
+
+    loggerManager.logger.debug(f"Bulk insert enrichment attempts query for country {country_code}")
+    return query, template
 
 def get_enrichment_attempts_query(doctor_id=None, country_code='IT', status=None, limit=None):
     """
@@ -1182,7 +1407,7 @@ def get_enrichment_attempts_query(doctor_id=None, country_code='IT', status=None
     :param country_code: string, country code (DE, IT)
     :param status: string, attempt status filter (optional)
     :param limit: int, limit results (optional)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     
     base_query = """
@@ -1213,16 +1438,19 @@ def get_enrichment_attempts_query(doctor_id=None, country_code='IT', status=None
             FROM doctors.enrichment_attempts ea
             INNER JOIN doctors.doctors d ON ea.doctor_id = d.doctor_id
             LEFT JOIN doctors.google_places_data gpd ON (ea.doctor_id = gpd.doctor_id AND ea.country_code = gpd.country_code)
-            WHERE ea.country_code = '{}'
-            """.format(country_code)
+            WHERE ea.country_code = %(country_code)s
+            """
+    params = {'country_code': country_code}
     
     conditions = []
     
     if doctor_id:
-        conditions.append(f"ea.doctor_id = {doctor_id}")
+        params['doctor_id'] = doctor_id
+        conditions.append("ea.doctor_id = %(doctor_id)s")
     
     if status:
-        conditions.append(f"ea.attempt_status = '{status}'")
+        params['status'] = status
+        conditions.append("ea.attempt_status = %(status)s")
     
     if conditions:
         base_query += " AND " + " AND ".join(conditions)
@@ -1230,10 +1458,147 @@ def get_enrichment_attempts_query(doctor_id=None, country_code='IT', status=None
     base_query += " ORDER BY ea.attempted_at DESC"
     
     if limit:
-        base_query += f" LIMIT {limit}"
+        params['limit'] = limit
+        base_query += " LIMIT %(limit)s"
     
     loggerManager.logger.info(f"Get enrichment attempts query for country {country_code}, doctor_id: {doctor_id}")
-    return base_query
+    return base_query, params
+
+
+def refresh_enrichment_state_query(doctor_ids=None, country_code='IT'):
+    """
+    Upsert the rows of doctors.enrichment_state (migrations/0005_enrichment_state.sql) from the Google Places data
+    and the enrichment attempts of a country, and delete the rows of the doctors left without both.
+    The status follows the Google Places source: enriched with a saved place or a successful attempt,
+    attempted_failed after a failed attempt, attempted after any other attempt.
+    :param doctor_ids: list of doctor ids to refresh (every doctor of the country if None)
+    :param country_code: string, country code (DE, IT)
+    :return: tuple (SQL query string, params dict), the query returns the columns refreshed and removed
+    """
+    params = {'country_code': country_code}
+    if doctor_ids is not None:
+        params['doctor_ids'] = list(doctor_ids)
+        target = "SELECT DISTINCT unnest(%(doctor_ids)s::bigint[]) as doctor_id"
+        removed_condition = "AND es.doctor_id = ANY(%(doctor_ids)s::bigint[])"
+    else:
+        target = """SELECT gpd.doctor_id FROM doctors.google_places_data gpd WHERE gpd.country_code = %(country_code)s
+            UNION
+            SELECT ea.doctor_id FROM doctors.enrichment_attempts ea WHERE ea.country_code = %(country_code)s"""
+        removed_condition = ""
+
+    query = f"""
+        WITH target AS (
+            {target}
+        ),
+        -- Dati Google Places piu' recenti di ogni dottore e quanti sono
+        doctor_google AS (
+            SELECT DISTINCT ON (gpd.doctor_id)
+                gpd.doctor_id, gpd.google_place_id, gpd.enriched_at, gpd.updated_at,
+                gpd.business_name, gpd.rating, gpd.reviews_count,
+                COUNT(*) OVER (PARTITION BY gpd.doctor_id) as google_places_count
+            FROM target t
+            JOIN doctors.google_places_data gpd ON (gpd.doctor_id = t.doctor_id AND gpd.country_code = %(country_code)s)
+            ORDER BY gpd.doctor_id, gpd.updated_at DESC NULLS LAST, gpd.id DESC
+        ),
+        -- Tentativi di tutte le fonti
+        doctor_attempts AS (
+            SELECT ea.doctor_id, COUNT(*) as attempts_count
+            FROM target t
+            JOIN doctors.enrichment_attempts ea ON (ea.doctor_id = t.doctor_id AND ea.country_code = %(country_code)s)
+            GROUP BY ea.doctor_id
+        ),
+        state AS (
+            SELECT 
+                t.doctor_id,
+                CASE 
+                    WHEN dg.google_place_id IS NOT NULL THEN 'enriched'
+                    WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
+                    WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
+                    WHEN ea.id IS NOT NULL THEN 'attempted'
+                    ELSE 'never_attempted'
+                END as enrichment_status,
+                dg.google_place_id,
+                dg.enriched_at,
+                dg.updated_at as last_enrichment_update,
+                dg.business_name as google_business_name,
+                dg.rating as google_rating,
+                dg.reviews_count as google_reviews_count,
+                COALESCE(dg.google_places_count, 0) as google_places_count,
+                -- Un solo tentativo per dottore, paese e fonte
+                ea.id as last_attempt_id,
+                ea.attempt_status as last_attempt_status,
+                ea.attempted_at as last_attempt_date,
+                ea.error_message as last_attempt_error,
+                ea.search_query as last_search_query,
+                ea.processing_time_ms as last_processing_time,
+                ea.attempted_by as last_attempted_by,
+                ea.places_found as last_places_found,
+                ea.google_place_id as last_attempt_place_id,
+                COALESCE(da.attempts_count, 0) as attempts_count
+            FROM target t
+            LEFT JOIN doctor_google dg ON dg.doctor_id = t.doctor_id
+            LEFT JOIN doctor_attempts da ON da.doctor_id = t.doctor_id
+            LEFT JOIN doctors.enrichment_attempts ea ON (
+                t.doctor_id = ea.doctor_id 
+                AND ea.country_code = %(country_code)s 
+                AND ea.enrichment_source = 'google_places'
+            )
+            WHERE dg.doctor_id IS NOT NULL OR da.doctor_id IS NOT NULL
+        ),
+        removed AS (
+            DELETE FROM doctors.enrichment_state es
+            WHERE es.country_code = %(country_code)s
+            {removed_condition}
+            AND NOT EXISTS (SELECT 1 FROM state s WHERE s.doctor_id = es.doctor_id)
+            RETURNING es.doctor_id
+        ),
+        refreshed AS (
+            INSERT INTO doctors.enrichment_state (
+                doctor_id, country_code, enrichment_status,
+                google_place_id, enriched_at, last_enrichment_update, google_business_name,
+                google_rating, google_reviews_count, google_places_count,
+                last_attempt_id, last_attempt_status, last_attempt_date, last_attempt_error, last_search_query,
+                last_processing_time, last_attempted_by, last_places_found, last_attempt_place_id,
+                attempts_count, updated_at
+            )
+            SELECT 
+                s.doctor_id, %(country_code)s, s.enrichment_status,
+                s.google_place_id, s.enriched_at, s.last_enrichment_update, s.google_business_name,
+                s.google_rating, s.google_reviews_count, s.google_places_count,
+                s.last_attempt_id, s.last_attempt_status, s.last_attempt_date, s.last_attempt_error, s.last_search_query,
+                s.last_processing_time, s.last_attempted_by, s.last_places_found, s.last_attempt_place_id,
+                s.attempts_count, NOW()
+            FROM state s
+            ON CONFLICT (doctor_id, country_code) DO UPDATE SET
+                enrichment_status = EXCLUDED.enrichment_status,
+                google_place_id = EXCLUDED.google_place_id,
+                enriched_at = EXCLUDED.enriched_at,
+                last_enrichment_update = EXCLUDED.last_enrichment_update,
+                google_business_name = EXCLUDED.google_business_name,
+                google_rating = EXCLUDED.google_rating,
+                google_reviews_count = EXCLUDED.google_reviews_count,
+                google_places_count = EXCLUDED.google_places_count,
+                last_attempt_id = EXCLUDED.last_attempt_id,
+                last_attempt_status = EXCLUDED.last_attempt_status,
+                last_attempt_date = EXCLUDED.last_attempt_date,
+                last_attempt_error = EXCLUDED.last_attempt_error,
+                last_search_query = EXCLUDED.last_search_query,
+                last_processing_time = EXCLUDED.last_processing_time,
+                last_attempted_by = EXCLUDED.last_attempted_by,
+                last_places_found = EXCLUDED.last_places_found,
+                last_attempt_place_id = EXCLUDED.last_attempt_place_id,
+                attempts_count = EXCLUDED.attempts_count,
+                updated_at = EXCLUDED.updated_at
+            RETURNING doctor_id
+        )
+        SELECT 
+            (SELECT COUNT(*) FROM refreshed) as refreshed,
+            (SELECT COUNT(*) FROM removed) as removed
+    """
+
+    loggerManager.logger.debug(f"Enrichment state refresh query for country {country_code}: "
+                               f"{len(params['doctor_ids']) if doctor_ids is not None else 'all'} doctors")
+    return query, params
 
 
 def check_doctor_enrichment_status_query(doctor_ids, country_code='IT'):
@@ -1241,324 +1606,524 @@ def check_doctor_enrichment_status_query(doctor_ids, country_code='IT'):
     Check enrichment status for multiple doctors
     :param doctor_ids: list of doctor IDs
     :param country_code: string, country code (DE, IT)
-    :return: SQL query string
+    :return: tuple (SQL query string, params dict)
     """
     
     if not doctor_ids:
-        return None
+        return None, None
     
-    doctor_ids_str = ','.join(map(str, doctor_ids))
+    params = {'doctor_ids': list(doctor_ids), 'country_code': country_code}
     
-    query = f"""
+    query = """
             SELECT 
                 d.doctor_id,
                 d.full_name,
-                ea.attempt_status,
-                ea.attempted_at,
-                ea.enrichment_source,
-                ea.places_found,
-                ea.google_place_id,
+                es.last_attempt_status as attempt_status,
+                es.last_attempt_date as attempted_at,
+                CASE WHEN es.last_attempt_id IS NOT NULL THEN 'google_places' END as enrichment_source,
+                es.last_places_found as places_found,
+                es.last_attempt_place_id as google_place_id,
                 CASE 
-                    WHEN ea.id IS NULL THEN 'never_attempted'
-                    WHEN ea.attempt_status = 'success' THEN 'enriched'
-                    WHEN ea.attempt_status IN ('failed', 'no_results', 'error') THEN 'attempted_failed'
+                    WHEN es.last_attempt_id IS NULL THEN 'never_attempted'
+                    WHEN es.last_attempt_status = 'success' THEN 'enriched'
+                    WHEN es.last_attempt_status IN ('failed', 'no_results', 'error') THEN 'attempted_failed'
                     ELSE 'attempted_unknown'
                 END as enrichment_status,
-                CASE 
-                    WHEN gpd.id IS NOT NULL THEN true 
-                    ELSE false 
-                END as has_saved_data
+                COALESCE(es.google_places_count > 0, false) as has_saved_data
             FROM doctors.doctors d
-            LEFT JOIN doctors.enrichment_attempts ea ON (
-                d.doctor_id = ea.doctor_id 
-                AND ea.country_code = '{country_code}'
-                AND ea.enrichment_source = 'google_places'
-            )
-            LEFT JOIN doctors.google_places_data gpd ON (
-                d.doctor_id = gpd.doctor_id 
-                AND gpd.country_code = '{country_code}'
-            )
-            WHERE d.doctor_id IN ({doctor_ids_str})
+            LEFT JOIN doctors.enrichment_state es ON (es.doctor_id = d.doctor_id AND es.country_code = %(country_code)s)
+            WHERE d.doctor_id = ANY(%(doctor_ids)s)
             ORDER BY d.doctor_id
             """
     
     loggerManager.logger.info(f"Check enrichment status for {len(doctor_ids)} doctors in country {country_code}")
-    return query
+    return query, params
 
 
-def get_unenriched_doctors_query(country_code='IT', limit=None, exclude_failed=False):
+def get_unenriched_doctors_query(country_code='IT', limit=None, exclude_failed=False, cursor=None):
     """
     Get doctors that have never been enriched or need re-enrichment
     :param country_code: string, country code (DE, IT)
-    :param limit: int, limit results (optional)
+    :param limit: int, limit doctors (optional)
     :param exclude_failed: bool, exclude doctors with failed attempts
-    :return: SQL query string
+    :param cursor: tuple (rate, doctor_id), return the doctors after it (keyset pagination)
+    :return: tuple (SQL query string, params dict)
     """
     
+    params = {'country_code': country_code}
+
     exclude_condition = ""
     if exclude_failed:
-        exclude_condition = "AND ea.attempt_status NOT IN ('no_results', 'failed')"
+        exclude_condition = "AND es.last_attempt_status NOT IN ('no_results', 'failed')"
+
+    cursor_condition = ""
+    if cursor:
+        cursor_condition = "AND " + keyset_condition(cursor, params)
+
+    page_clause = ""
+    if limit:
+        params['limit'] = limit
+        page_clause = "\n                LIMIT %(limit)s"
     
     base_query = f"""
+            WITH doctor_page AS (
+                -- Una riga per dottore: stato di arricchimento da doctors.enrichment_state
+                SELECT 
+                    d.doctor_id,
+                    d.full_name,
+                    d.given_name,
+                    d.surname,
+                    d.rate,
+                    es.last_attempt_id as attempt_id,
+                    es.last_attempt_status as attempt_status,
+                    es.last_attempt_date as attempted_at
+                FROM doctors.doctors d
+                LEFT JOIN doctors.enrichment_state es ON (
+                    es.doctor_id = d.doctor_id 
+                    AND es.country_code = %(country_code)s
+                )
+                WHERE (
+                    es.last_attempt_id IS NULL  -- Mai tentato
+                    OR es.last_attempt_status IN ('failed', 'error')  -- Fallito, può ritentare
+                    {exclude_condition}
+                )
+                AND COALESCE(es.google_places_count, 0) = 0
+                {cursor_condition}
+                ORDER BY d.rate DESC, d.doctor_id{page_clause}
+            )
             SELECT 
-                d.doctor_id,
-                d.full_name,
-                d.given_name,
-                d.surname,
+                dp.doctor_id,
+                dp.full_name,
+                dp.given_name,
+                dp.surname,
+                dp.rate,
                 c.clinic_name,
                 c.street,
                 c.city_name,
                 c.post_code,
                 CASE 
-                    WHEN ea.id IS NULL THEN 'never_attempted'
-                    ELSE ea.attempt_status
+                    WHEN dp.attempt_id IS NULL THEN 'never_attempted'
+                    ELSE dp.attempt_status
                 END as enrichment_status,
-                ea.attempted_at
-            FROM doctors.doctors d
-            LEFT JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
+                dp.attempted_at
+            FROM doctor_page dp
+            LEFT JOIN doctors.doctors_clinics_map dcm ON dp.doctor_id = dcm.doctor_id
             LEFT JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-            LEFT JOIN doctors.enrichment_attempts ea ON (
-                d.doctor_id = ea.doctor_id 
-                AND ea.country_code = '{country_code}'
-                AND ea.enrichment_source = 'google_places'
-            )
-            WHERE (
-                ea.id IS NULL  -- Mai tentato
-                OR ea.attempt_status IN ('failed', 'error')  -- Fallito, può ritentare
-                {exclude_condition}
-            )
-            AND NOT EXISTS (
-                SELECT 1 FROM doctors.google_places_data gpd 
-                WHERE gpd.doctor_id = d.doctor_id 
-                AND gpd.country_code = '{country_code}'
-            )
+            ORDER BY dp.rate DESC, dp.doctor_id, c.clinic_id
             """
     
-    base_query += " ORDER BY d.doctor_id"
-    
-    if limit:
-        base_query += f" LIMIT {limit}"
-    
     loggerManager.logger.info(f"Get unenriched doctors query for country {country_code}")
-    return base_query
+    return base_query, params
 
-
-def get_complete_doctor_profile_query(doctor_id, country_code='IT'):
-    """
-    Ottieni TUTTI i dati disponibili per un dottore specifico con query separate e semplici
-    :param doctor_id: int, ID del dottore
-    :param country_code: string, codice paese (DE, IT)
-    :return: dict con tutte le query necessarie
-    """
-    
-    queries = {
-        # 1. Dati base del dottore
-        'doctor_base': f"""
-            SELECT 
-                d.id as internal_id,
-                d.doctor_id,
-                d.salutation,
-                d.given_name,
-                d.surname,
-                d.full_name,
-                d.gender,
-                d.rate,
-                d.branding,
-                d.has_slots as doctor_has_slots,
-                d.allow_questions,
-                d.url as doctor_url,
-                d.import_date,
-                d.created as doctor_created,
-                d.modified as doctor_modified
+# Sezioni del profilo completo: colonne, sorgente (FROM e JOIN), colonna del dottore, filtri aggiuntivi e
+# ordinamento di ogni sezione. Sono condivise da get_complete_doctor_profile_query (una query per sezione),
+# get_complete_doctor_profile_single_query (tutte le sezioni in un solo statement) e
+# get_complete_doctors_profiles_query (una query per sezione per molti dottori).
+COMPLETE_PROFILE_SECTIONS = {
+    # 1. Dati base del dottore
+    'doctor_base': {
+        'columns': [
+            "d.id as internal_id",
+            "d.doctor_id",
+            "d.salutation",
+            "d.given_name",
+            "d.surname",
+            "d.full_name",
+            "d.gender",
+            "d.rate",
+            "d.branding",
+            "d.has_slots as doctor_has_slots",
+            "d.allow_questions",
+            "d.url as doctor_url",
+            "d.import_date",
+            "d.created as doctor_created",
+            "d.modified as doctor_modified",
+        ],
+        'source': """
             FROM doctors.doctors d
-            WHERE d.doctor_id = {doctor_id}
         """,
-        
-        # 2. Tutte le cliniche del dottore
-        'clinics': f"""
-            SELECT 
-                c.id as clinic_internal_id,
-                c.clinic_id,
-                c.clinic_name,
-                c.province,
-                c.street,
-                c.district_name,
-                c.post_code,
-                c.city_name,
-                c.facility_id,
-                c.latitude,
-                c.longitude,
-                c.calendar_active,
-                c.calendar_guid,
-                c.has_slots as clinic_has_slots,
-                c.nearest_slot_date,
-                c.online_payment,
-                c.fee,
-                c.default_fee,
-                c.non_doctor,
-                c.is_commercial_from_deal,
-                c.is_commercial_from_saas,
-                c.booking_extra_fields,
-                c.created as clinic_created,
-                c.modified as clinic_modified,
-                dcm.created as mapping_created
+        'doctor_column': "d.doctor_id",
+        'order_by': None,
+    },
+
+    # 2. Tutte le cliniche del dottore
+    'clinics': {
+        'columns': [
+            "c.id as clinic_internal_id",
+            "c.clinic_id",
+            "c.clinic_name",
+            "c.province",
+            "c.street",
+            "c.district_name",
+            "c.post_code",
+            "c.city_name",
+            "c.facility_id",
+            "c.latitude",
+            "c.longitude",
+            "c.calendar_active",
+            "c.calendar_guid",
+            "c.has_slots as clinic_has_slots",
+            "c.nearest_slot_date",
+            "c.online_payment",
+            "c.fee",
+            "c.default_fee",
+            "c.non_doctor",
+            "c.is_commercial_from_deal",
+            "c.is_commercial_from_saas",
+            "c.booking_extra_fields",
+            "c.created as clinic_created",
+            "c.modified as clinic_modified",
+            "dcm.created as mapping_created",
+        ],
+        'source': """
             FROM doctors.doctors d
             JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
             JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
-            WHERE d.doctor_id = {doctor_id}
-            ORDER BY c.clinic_id
         """,
-        
-        # 3. Tutte le specializzazioni del dottore
-        'specializations': f"""
-            SELECT 
-                s.id as spec_internal_id,
-                s.specialization_id,
-                s.specialization_name,
-                s.name_plural,
-                s.name_female,
-                s.is_popular,
-                s.created as spec_created,
-                s.modified as spec_modified,
-                dsm.created as spec_mapping_created
+        'doctor_column': "d.doctor_id",
+        'order_by': "c.clinic_id",
+    },
+
+    # 3. Tutte le specializzazioni del dottore
+    'specializations': {
+        'columns': [
+            "s.id as spec_internal_id",
+            "s.specialization_id",
+            "s.specialization_name",
+            "s.name_plural",
+            "s.name_female",
+            "s.is_popular",
+            "s.created as spec_created",
+            "s.modified as spec_modified",
+            "dsm.created as spec_mapping_created",
+        ],
+        'source': """
             FROM doctors.doctors d
             JOIN doctors.doctors_specializations_map dsm ON d.doctor_id = dsm.doctor_id
             JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
-            WHERE d.doctor_id = {doctor_id}
-            ORDER BY s.is_popular DESC, s.specialization_name
         """,
-        
-        # 4. Tutti i servizi del dottore (per clinica)
-        'services': f"""
-            SELECT 
-                csom.id as service_mapping_id,
-                csom.clinic_id,
-                csom.service_price,
-                csom.service_price_decimal,
-                csom.is_price_from,
-                csom.is_default as is_default_service,
-                csom.import_date as service_import_date,
-                csom.created as service_mapping_created,
-                csom.modified as service_mapping_modified,
-                so.id as service_internal_id,
-                so.service_id,
-                so.option_name as service_name,
-                so.description as service_description,
-                so.created as service_created,
-                so.modified as service_modified
+        'doctor_column': "d.doctor_id",
+        'order_by': "s.is_popular DESC, s.specialization_name",
+    },
+
+    # 4. Tutti i servizi del dottore (per clinica)
+    'services': {
+        'columns': [
+            "csom.id as service_mapping_id",
+            "csom.clinic_id",
+            "csom.service_price",
+            "csom.service_price_decimal",
+            "csom.is_price_from",
+            "csom.is_default as is_default_service",
+            "csom.import_date as service_import_date",
+            "csom.created as service_mapping_created",
+            "csom.modified as service_mapping_modified",
+            "so.id as service_internal_id",
+            "so.service_id",
+            "so.option_name as service_name",
+            "so.description as service_description",
+            "so.created as service_created",
+            "so.modified as service_modified",
+        ],
+        'source': """
             FROM doctors.doctors d
             JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
             JOIN doctors.clinics_service_options_map csom ON (dcm.clinic_id = csom.clinic_id AND d.doctor_id = csom.doctor_id)
             JOIN doctors.service_options so ON csom.service_id = so.service_id
-            WHERE d.doctor_id = {doctor_id}
-            ORDER BY csom.clinic_id, csom.is_default DESC, so.option_name
         """,
-        
-        # 5. Tutte le opinioni/recensioni del dottore
-        'opinions': f"""
-            SELECT 
-                o.id as opinion_internal_id,
-                o.opinion_id,
-                o.rate as opinion_rate,
-                o.is_anonymous,
-                o.photo_url,
-                o.client_message,
-                o.doctor_response,
-                o.created_at as opinion_created_at,
-                o.created as opinion_created,
-                o.modified as opinion_modified
+        'doctor_column': "d.doctor_id",
+        'order_by': "csom.clinic_id, csom.is_default DESC, so.option_name",
+    },
+
+    # 5. Tutte le opinioni/recensioni del dottore
+    'opinions': {
+        'columns': [
+            "o.id as opinion_internal_id",
+            "o.opinion_id",
+            "o.rate as opinion_rate",
+            "o.is_anonymous",
+            "o.photo_url",
+            "o.client_message",
+            "o.doctor_response",
+            "o.created_at as opinion_created_at",
+            "o.created as opinion_created",
+            "o.modified as opinion_modified",
+        ],
+        'source': """
             FROM doctors.opinions o
-            WHERE o.doctor_id = {doctor_id}
-            ORDER BY o.created DESC
         """,
-        
-        # 6. Statistiche delle opinioni
-        'opinion_stats': f"""
-            SELECT 
-                os.id as stats_internal_id,
-                os.positive,
-                os.neutral,
-                os.negative,
-                os.total,
-                CASE 
-                    WHEN os.total > 0 THEN ROUND((os.positive::DECIMAL / os.total * 100), 2)
-                    ELSE 0 
-                END as positive_percentage,
-                os.created as stats_created,
-                os.modified as stats_modified
+        'doctor_column': "o.doctor_id",
+        'order_by': "o.created DESC",
+    },
+
+    # 6. Statistiche delle opinioni
+    'opinion_stats': {
+        'columns': [
+            "os.id as stats_internal_id",
+            "os.positive",
+            "os.neutral",
+            "os.negative",
+            "os.total",
+            "CASE WHEN os.total > 0 THEN ROUND((os.positive::DECIMAL / os.total * 100), 2) ELSE 0 END as positive_percentage",
+            "os.created as stats_created",
+            "os.modified as stats_modified",
+        ],
+        'source': """
             FROM doctors.opinions_stats os
-            WHERE os.doctor_id = {doctor_id}
         """,
-        
-        # 7. Dati Google Places (se disponibili)
-        'google_places': f"""
-            SELECT 
-                gpd.id as google_internal_id,
-                gpd.google_place_id,
-                gpd.business_name,
-                gpd.business_status,
-                gpd.rating as google_rating,
-                gpd.reviews_count as google_reviews_count,
-                gpd.phone as google_phone,
-                gpd.email as google_email,
-                gpd.website as google_website,
-                gpd.google_maps_url,
-                gpd.formatted_address as google_address,
-                gpd.latitude as google_latitude,
-                gpd.longitude as google_longitude,
-                gpd.opening_hours,
-                gpd.photos,
-                gpd.types,
-                gpd.reviews as google_reviews,
-                gpd.original_doctor_name,
-                gpd.original_doctor_surname,
-                gpd.enriched_at,
-                gpd.created_at as google_created,
-                gpd.updated_at as google_updated
+        'doctor_column': "os.doctor_id",
+        'order_by': None,
+    },
+
+    # 7. Dati Google Places (se disponibili)
+    'google_places': {
+        'columns': [
+            "gpd.id as google_internal_id",
+            "gpd.google_place_id",
+            "gpd.business_name",
+            "gpd.business_status",
+            "gpd.rating as google_rating",
+            "gpd.reviews_count as google_reviews_count",
+            "gpd.phone as google_phone",
+            "gpd.email as google_email",
+            "gpd.website as google_website",
+            "gpd.google_maps_url",
+            "gpd.formatted_address as google_address",
+            "gpd.latitude as google_latitude",
+            "gpd.longitude as google_longitude",
+            "gpd.opening_hours",
+            "gpd.photos",
+            "gpd.types",
+            "gpd.reviews as google_reviews",
+            "gpd.original_doctor_name",
+            "gpd.original_doctor_surname",
+            "gpd.enriched_at",
+            "gpd.created_at as google_created",
+            "gpd.updated_at as google_updated",
+        ],
+        'source': """
             FROM doctors.google_places_data gpd
-            WHERE gpd.doctor_id = {doctor_id} AND gpd.country_code = '{country_code}'
-            ORDER BY gpd.created_at DESC
         """,
-        
-        # 8. Storico tentativi di arricchimento
-        'enrichment_attempts': f"""
-            SELECT 
-                ea.id as attempt_internal_id,
-                ea.attempt_status,
-                ea.enrichment_source,
-                ea.search_query,
-                ea.doctor_name as attempted_doctor_name,
-                ea.doctor_surname as attempted_doctor_surname,
-                ea.clinic_name as attempted_clinic_name,
-                ea.clinic_address as attempted_clinic_address,
-                ea.google_place_id as attempted_google_place_id,
-                ea.places_found,
-                ea.error_message,
-                ea.attempted_by,
-                ea.attempted_at,
-                ea.processing_time_ms
+        'doctor_column': "gpd.doctor_id",
+        'filters': ["gpd.country_code = %(country_code)s"],
+        'order_by': "gpd.created_at DESC",
+    },
+
+    # 8. Storico tentativi di arricchimento
+    'enrichment_attempts': {
+        'columns': [
+            "ea.id as attempt_internal_id",
+            "ea.attempt_status",
+            "ea.enrichment_source",
+            "ea.search_query",
+            "ea.doctor_name as attempted_doctor_name",
+            "ea.doctor_surname as attempted_doctor_surname",
+            "ea.clinic_name as attempted_clinic_name",
+            "ea.clinic_address as attempted_clinic_address",
+            "ea.google_place_id as attempted_google_place_id",
+            "ea.places_found",
+            "ea.error_message",
+            "ea.attempted_by",
+            "ea.attempted_at",
+            "ea.processing_time_ms",
+        ],
+        'source': """
             FROM doctors.enrichment_attempts ea
-            WHERE ea.doctor_id = {doctor_id} AND ea.country_code = '{country_code}'
-            ORDER BY ea.attempted_at DESC
         """,
-        
-        # 9. Numeri di telefono per tutte le cliniche
-        'phone_numbers': f"""
-            SELECT 
-                t.telephone_id,
-                t.clinic_id,
-                t.phone_number,
-                t.created as phone_created,
-                t.modified as phone_modified,
-                c.clinic_name
+        'doctor_column': "ea.doctor_id",
+        'filters': ["ea.country_code = %(country_code)s"],
+        'order_by': "ea.attempted_at DESC",
+    },
+
+    # 9. Numeri di telefono per tutte le cliniche
+    'phone_numbers': {
+        'columns': [
+            "t.telephone_id",
+            "t.clinic_id",
+            "t.phone_number",
+            "t.created as phone_created",
+            "t.modified as phone_modified",
+            "c.clinic_name",
+        ],
+        'source': """
             FROM doctors.doctors d
             JOIN doctors.doctors_clinics_map dcm ON d.doctor_id = dcm.doctor_id
             JOIN doctors.telephones t ON dcm.clinic_id = t.clinic_id
             JOIN doctors.clinics c ON t.clinic_id = c.clinic_id
-            WHERE d.doctor_id = {doctor_id}
-            ORDER BY t.clinic_id, t.telephone_id
+        """,
+        'doctor_column': "d.doctor_id",
+        'order_by': "t.clinic_id, t.telephone_id",
+    },
+
+    # 10. Stato di arricchimento (una riga, nessuna se mai tentato)
+    'enrichment_state': {
+        'columns': [
+            "es.enrichment_status",
+            "es.google_places_count",
+            "es.attempts_count",
+            "es.updated_at as enrichment_state_updated",
+        ],
+        'source': """
+            FROM doctors.enrichment_state es
+        """,
+        'doctor_column': "es.doctor_id",
+        'filters': ["es.country_code = %(country_code)s"],
+        'order_by': None,
+    },
+}
+
+
+def profile_column_alias(column):
+    """
+    Nome della colonna restituita da un'espressione di COMPLETE_PROFILE_SECTIONS
+    :param column: string, es. "d.has_slots as doctor_has_slots" oppure "d.doctor_id"
+    :return: string, es. "doctor_has_slots" oppure "doctor_id"
+    """
+    if ' as ' in column:
+        return column.rsplit(' as ', 1)[1].strip()
+    return column.split('.')[-1].strip()
+
+
+def complete_profile_section_columns(section_name):
+    """
+    :param section_name: string, nome della sezione in COMPLETE_PROFILE_SECTIONS
+    :return: list con i nomi delle colonne della sezione, nell'ordine della SELECT
+    """
+    return [profile_column_alias(column) for column in COMPLETE_PROFILE_SECTIONS[section_name]['columns']]
+
+
+def profile_section_source(section, doctor_condition):
+    """
+    FROM, JOIN e WHERE di una sezione di COMPLETE_PROFILE_SECTIONS
+    :param section: dict, sezione di COMPLETE_PROFILE_SECTIONS
+    :param doctor_condition: string, condizione sulla colonna del dottore, es. "= %(doctor_id)s"
+    :return: string
+    """
+    conditions = [f"{section['doctor_column']} {doctor_condition}"] + section.get('filters', [])
+    return section['source'].strip() + "\n            WHERE " + " AND ".join(conditions)
+
+
+def get_complete_doctor_profile_query(doctor_id, country_code='IT'):
+    """
+    Ottieni TUTTI i dati disponibili per un dottore specifico con query separate e semplici
+    :param doctor_id: int, ID del dottore
+    :param country_code: string, codice paese (DE, IT)
+    :return: dict con tutte le query necessarie, ogni valore è una tupla (query SQL, parametri)
+    """
+    params = {'doctor_id': doctor_id, 'country_code': country_code}
+
+    queries = {}
+    for section_name, section in COMPLETE_PROFILE_SECTIONS.items():
+        columns = ",\n                ".join(section['columns'])
+        order_clause = f"ORDER BY {section['order_by']}" if section['order_by'] else ""
+        queries[section_name] = f"""
+            SELECT 
+                {columns}
+            {profile_section_source(section, "= %(doctor_id)s")}
+            {order_clause}
         """
-    }
-    
+
     loggerManager.logger.info(f"Complete doctor profile queries for doctor_id: {doctor_id}, country: {country_code}")
-    return queries
+    return {section_name: (query, params) for section_name, query in queries.items()}
+
+
+def get_complete_doctor_profile_single_query(doctor_id, country_code='IT'):
+    """
+    Ottieni TUTTI i dati di un dottore con un solo statement (un solo round trip al database).
+    Ogni sezione di COMPLETE_PROFILE_SECTIONS è una subquery e le subquery sono unite con FULL JOIN ON false:
+    ogni riga appartiene a una sola sezione (profile_section, section_row) e contiene le colonne della sezione
+    come "<sezione>__<colonna>", mentre le colonne delle altre sezioni sono NULL. A differenza di un UNION ALL
+    o di un profilo costruito con json_agg, ogni colonna mantiene il tipo del database (numeric, timestamp, json).
+    Usa split_complete_profile_rows per ottenere lo stesso dict di sezioni delle query separate.
+    :param doctor_id: int, ID del dottore
+    :param country_code: string, codice paese (DE, IT)
+    :return: tuple (query SQL, parametri)
+    """
+    params = {'doctor_id': doctor_id, 'country_code': country_code}
+
+    subqueries = []
+    slots = []
+    for section_index, (section_name, section) in enumerate(COMPLETE_PROFILE_SECTIONS.items()):
+        row_window = f"ORDER BY {section['order_by']}" if section['order_by'] else ""
+        columns = ",\n                    ".join(
+            f"{column.rsplit(' as ', 1)[0] if ' as ' in column else column} as {section_name}__{profile_column_alias(column)}"
+            for column in section['columns']
+        )
+        subqueries.append(f"""(
+                SELECT 
+                    {section_index} as section_index,
+                    '{section_name}'::text as profile_section,
+                    row_number() OVER ({row_window}) as section_row,
+                    {columns}
+                {profile_section_source(section, "= %(doctor_id)s")}
+            ) {section_name}""")
+        slots.extend(f"{section_name}.{section_name}__{column}" for column in complete_profile_section_columns(section_name))
+
+    def coalesce(column):
+        return "COALESCE(" + ", ".join(f"{section_name}.{column}" for section_name in COMPLETE_PROFILE_SECTIONS) + ")"
+
+    sections = "\n            FULL JOIN ".join(
+        subquery if index == 0 else f"{subquery} ON false" for index, subquery in enumerate(subqueries)
+    )
+    slot_columns = ",\n                ".join(slots)
+    query = f"""
+            SELECT 
+                {coalesce('section_index')} as section_index,
+                {coalesce('profile_section')} as profile_section,
+                {coalesce('section_row')} as section_row,
+                {slot_columns}
+            FROM {sections}
+            ORDER BY 1, 3
+        """
+
+    loggerManager.logger.info(f"Complete doctor profile single query for doctor_id: {doctor_id}, country: {country_code}")
+    return query, params
+
+
+def get_complete_doctors_profiles_query(doctor_ids, country_code='IT'):
+    """
+    Ottieni TUTTI i dati di più dottori con una query per sezione (doctor_id = ANY(...)) invece di una
+    per sezione e per dottore. Ogni riga riporta il dottore a cui appartiene in profile_doctor_id,
+    gli altri campi sono quelli di get_complete_doctor_profile_query.
+    :param doctor_ids: list di ID dei dottori
+    :param country_code: string, codice paese (DE, IT)
+    :return: dict {sezione: (query SQL, parametri)}, None se la lista è vuota
+    """
+    if not doctor_ids:
+        return None
+
+    params = {'doctor_ids': list(doctor_ids), 'country_code': country_code}
+
+    queries = {}
+    for section_name, section in COMPLETE_PROFILE_SECTIONS.items():
+        columns = ",\n                ".join(section['columns'])
+        order_by = "profile_doctor_id" + (f", {section['order_by']}" if section['order_by'] else "")
+        queries[section_name] = f"""
+            SELECT 
+                {section['doctor_column']} as profile_doctor_id,
+                {columns}
+            {profile_section_source(section, "= ANY(%(doctor_ids)s)")}
+            ORDER BY {order_by}
+        """
+
+    loggerManager.logger.info(f"Complete doctors profiles queries for {len(doctor_ids)} doctors, country: {country_code}")
+    return {section_name: (query, params) for section_name, query in queries.items()}
+
+
+def split_complete_profile_rows(rows):
+    """
+    Ricostruisci le sezioni del profilo completo dalle righe di get_complete_doctor_profile_single_query
+    :param rows: list di dict (una riga per record di ogni sezione)
+    :return: dict {sezione: list di record} con le stesse chiavi delle query separate
+    """
+    section_columns = {
+        section_name: [(column, f"{section_name}__{column}") for column in complete_profile_section_columns(section_name)]
+        for section_name in COMPLETE_PROFILE_SECTIONS
+    }
+    sections = {section_name: [] for section_name in COMPLETE_PROFILE_SECTIONS}
+
+    for row in rows:
+        section_name = row['profile_section']
+        sections[section_name].append({column: row[slot] for column, slot in section_columns[section_name]})
+
+    return sections
@@ -12,6 +12,8 @@ import os
 from flask import current_app, g
 from api.lib import error_handlers, loggerManager
 from datetime import datetime
+from decimal import Decimal
+import base64
 import json
 import jwt
 
@@ -99,3 +101,69 @@ def process_request(request):
     if not bool(request_data):
         request_data = request.args
     return request_data
+
+
+def encode_cursor(rate, doctor_id):
+    """
+    Opaque cursor token for the (rate DESC, doctor_id) order: base64url of the last doctor returned
+    :param rate: rate of the last doctor of the page (None allowed)
+    :param doctor_id: doctor id of the last doctor of the page
+    :return: string token
+    """
+    payload = json.dumps([None if rate is None else str(rate), doctor_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a token created by encode_cursor
+    :param cursor: string token, None or empty for the first page
+    :return: tuple (rate, doctor_id) or None
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rate, doctor_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if rate is not None:
+            rate = Decimal(rate)
+            if not rate.is_finite():
+                raise ValueError(f'invalid rate {rate}')
+        if isinstance(doctor_id, bool) or not isinstance(doctor_id, int):
+            raise ValueError(f'invalid doctor_id {doctor_id}')
+    except Exception as e:
+        access_error = f'Invalid input, {cursor} is not a valid cursor'
+        loggerManager.logger.warning(f'{access_error}: {e}')
+        raise error_handlers.InvalidAPIUsage(message=access_error, status_code=400)
+    return rate, doctor_id
+
+
+def row_cursor_key(row):
+    """(rate, doctor_id) of a database row"""
+    return row['rate'], row['doctor_id']
+
+
+def paginate(items, limit, key=row_cursor_key):
+    """
+    Cut a page fetched with limit + 1 doctors and build the cursor of the next page.
+    Rows of the same doctor must be contiguous, as they are with the (rate DESC, doctor_id) order.
+    :param items: list of rows or items, limit + 1 doctors at most
+    :param limit: int, doctors per page (None: no pagination)
+    :param key: function returning (rate, doctor_id) of an item, database rows by default
+    :return: tuple (items of the page, next cursor or None)
+    """
+    if limit is None:
+        return items, None
+    if limit <= 0:
+        return [], None
+
+    doctors_seen = 0
+    last_key = None
+    for index, item in enumerate(items):
+        current_key = key(item)
+        if current_key != last_key:
+            if doctors_seen == limit:
+                return items[:index], encode_cursor(*last_key)
+            doctors_seen += 1
+            last_key = current_key
+    return items, None
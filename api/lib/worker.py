@@ -10,8 +10,10 @@
 @Description:   Worker esteso per MedInsights API con supporto completo e servizi
 """
 
-from flask import g
-from api.lib import filter, database_manager, sql_queries, loggerManager
+import psycopg2
+import psycopg2.extras
+from flask import g, current_app
+from api.lib import filter, database_manager, sql_queries, cache_manager, loggerManager
 from collections import defaultdict
 from datetime import datetime
 
@@ -25,6 +27,67 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         self.country_code = country_code.upper()
         self.result_data = None
         self.operation_successful = False
+    def _build_doctor_details(self, record):
+        """
+        Estrae i dettagli del dottore (incluso lo stato enrichment Google Places) da un record del database
+        """
+        return {
+            'doctor_id': record['doctor_id'],
+            'salutation': record.get('salutation'),
+            'given_name': record.get('given_name'),
+            'surname': record.get('surname'),
+            'full_name': record.get('full_name'),
+            'gender': record.get('gender'),
+            'rate': record.get('rate', 0),
+            'branding': record.get('branding'),
+            'has_slots': record.get('has_slots', False),
+            'allow_questions': record.get('allow_questions', False),
+            'url': record.get('url'),
+            # Informazioni enrichment Google Places
+            'enriched_status': record.get('enriched_status', 'not_enriched'),
+            'google_place_id': record.get('google_place_id'),
+            'enriched_at': record.get('enriched_at'),
+            'last_enrichment_update': record.get('last_enrichment_update'),
+            'google_business_name': record.get('google_business_name'),
+            'google_rating': record.get('google_rating'),
+            'google_reviews_count': record.get('google_reviews_count'),
+            'can_enrich': record.get('enriched_status', 'not_enriched') == 'not_enriched',
+            "has_enrichment_attempts": record.get('has_enrichment_attempts'),
+            "last_attempt_status": record.get('last_attempt_status'),
+            "has_google_places_data": record.get('has_google_places_data'),
+        }
+
+    def _build_clinic(self, clinic_data, doctor_id):
+        """
+        Costruisce una clinica nella struttura API da un oggetto JSON o da un record piatto
+        """
+        return {
+            'clinic_id': clinic_data.get('clinic_id'),
+            'clinic_name': clinic_data.get('clinic_name'),
+            'street': clinic_data.get('street'),
+            'city_name': clinic_data.get('city_name'),
+            'post_code': clinic_data.get('post_code'),
+            'province': clinic_data.get('province'),
+            'latitude': clinic_data.get('latitude'),
+            'longitude': clinic_data.get('longitude'),
+            'calendar_active': clinic_data.get('calendar_active', False),
+            'online_payment': clinic_data.get('online_payment', False),
+            'doctor_id': doctor_id,
+            'responsibilities': []  # Popolato dopo con i servizi se disponibili
+        }
+
+    def _build_specialization(self, specialization_name, spec_data, doctor_id, count=1):
+        """
+        Costruisce una specializzazione nella struttura API
+        """
+        return {
+            'doctor_id': doctor_id,
+            'specialization_name': specialization_name,
+            'name_plural': spec_data.get('name_plural'),
+            'is_popular': spec_data.get('is_popular', False),
+            'count': count
+        }
+
     def _transform_to_api_structure(self, raw_data):
         """
         Trasforma i dati grezzi del database nella struttura API originale
@@ -33,10 +96,6 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         if not raw_data:
             return []
 
-        # Gestisci record singolo
-        if isinstance(raw_data, dict):
-            raw_data = [raw_data]
-
         # Usa un set per tracciare doctor_id già processati
         processed_doctors = set()
         items = []
@@ -51,31 +110,7 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             processed_doctors.add(doctor_id)
 
             # Estrai dettagli dottore
-            doctor_details = {
-                'doctor_id': record['doctor_id'],
-                'salutation': record.get('salutation'),
-                'given_name': record.get('given_name'),
-                'surname': record.get('surname'),
-                'full_name': record.get('full_name'),
-                'gender': record.get('gender'),
-                'rate': record.get('rate', 0),
-                'branding': record.get('branding'),
-                'has_slots': record.get('has_slots', False),
-                'allow_questions': record.get('allow_questions', False),
-                'url': record.get('url'),
-                # Informazioni enrichment Google Places
-                'enriched_status': record.get('enriched_status', 'not_enriched'),
-                'google_place_id': record.get('google_place_id'),
-                'enriched_at': record.get('enriched_at'),
-                'last_enrichment_update': record.get('last_enrichment_update'),
-                'google_business_name': record.get('google_business_name'),
-                'google_rating': record.get('google_rating'),
-                'google_reviews_count': record.get('google_reviews_count'),
-                'can_enrich': record.get('enriched_status', 'not_enriched') == 'not_enriched',
-                "has_enrichment_attempts": record.get('has_enrichment_attempts'),
-                "last_attempt_status": record.get('last_attempt_status'),
-                "has_google_places_data": record.get('has_google_places_data'),
-            }
+            doctor_details = self._build_doctor_details(record)
 
             # Gestisci cliniche (da JSON array o record singolo)
             clinics = []
@@ -83,59 +118,22 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
                 # Se clinics è già un array JSON (dalla query lite)
                 if isinstance(record['clinics'], list):
                     for clinic_data in record['clinics']:
-                        clinic = {
-                            'clinic_id': clinic_data.get('clinic_id'),
-                            'clinic_name': clinic_data.get('clinic_name'),
-                            'street': clinic_data.get('street'),
-                            'city_name': clinic_data.get('city_name'),
-                            'post_code': clinic_data.get('post_code'),
-                            'province': clinic_data.get('province'),
-                            'latitude': clinic_data.get('latitude'),
-                            'longitude': clinic_data.get('longitude'),
-                            'calendar_active': clinic_data.get('calendar_active', False),
-                            'online_payment': clinic_data.get('online_payment', False),
-                            'doctor_id': doctor_id,
-                            'responsibilities': []  # Popolato dopo con i servizi se disponibili
-                        }
-                        clinics.append(clinic)
+                        clinics.append(self._build_clinic(clinic_data, doctor_id))
             elif record.get('clinic_id'):
                 # Fallback per record singolo
-                clinic = {
-                    'clinic_id': record.get('clinic_id'),
-                    'clinic_name': record.get('clinic_name'),
-                    'street': record.get('street'),
-                    'city_name': record.get('city_name'),
-                    'post_code': record.get('post_code'),
-                    'province': record.get('province'),
-                    'latitude': record.get('latitude'),
-                    'longitude': record.get('longitude'),
-                    'calendar_active': record.get('calendar_active', False),
-                    'online_payment': record.get('online_payment', False),
-                    'doctor_id': doctor_id,
-                    'responsibilities': []
-                }
-                clinics.append(clinic)
+                clinics.append(self._build_clinic(record, doctor_id))
 
             # Gestisci specializzazioni
             specializations = []
             if record.get('primary_specialization'):
-                spec = {
-                    'doctor_id': doctor_id,
-                    'specialization_name': record['primary_specialization'],
-                    'name_plural': record.get('name_plural'),
-                    'is_popular': record.get('is_popular', False),
-                    'count': 1
-                }
-                specializations.append(spec)
+                specializations.append(
+                    self._build_specialization(record['primary_specialization'], record, doctor_id)
+                )
             elif record.get('specialization_name'):
-                spec = {
-                    'doctor_id': doctor_id,
-                    'specialization_name': record['specialization_name'],
-                    'name_plural': record.get('name_plural'),
-                    'is_popular': record.get('is_popular', False),
-                    'count': record.get('count', 1)
-                }
-                specializations.append(spec)
+                specializations.append(
+                    self._build_specialization(record['specialization_name'], record, doctor_id,
+                                               count=record.get('count', 1))
+                )
 
             # Costruisci item finale
             item = {
@@ -148,6 +146,35 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return items
 
+    def _transform_aggregated_to_api_structure(self, raw_data):
+        """
+        Trasforma i dati aggregati del database (una riga per dottore, cliniche e specializzazioni
+        come JSON array) nella struttura API originale
+        """
+        if not raw_data:
+            return []
+
+        items = []
+        for record in raw_data:
+            doctor_id = record['doctor_id']
+
+            clinics = [
+                self._build_clinic(clinic_data, doctor_id)
+                for clinic_data in record.get('clinics') or []
+            ]
+            specializations = [
+                self._build_specialization(spec_data.get('specialization_name'), spec_data, doctor_id)
+                for spec_data in record.get('specializations') or []
+            ]
+
+            items.append({
+                'details': self._build_doctor_details(record),
+                'clinics': clinics,
+                'specializations': specializations
+            })
+
+        return items
+
     
     def get_specializations(self):
         """
@@ -157,14 +184,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting specializations for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_specializations_query(country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_specializations_query(country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -185,14 +209,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting cities for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_cities_query(country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_cities_query(country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -214,14 +235,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting opinions for doctor {doctor_id} in country: {self.country_code}")
         
         try:
-            query = sql_queries.get_doctor_opinions_query(doctor_id, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_doctor_opinions_query(doctor_id, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -243,11 +261,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting opinion stats for doctor {doctor_id} in country: {self.country_code}")
         
         try:
-            query = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                self.result_data = self.query_result if isinstance(self.query_result, dict) else self.query_result[0]
+                self.result_data = self.query_result.first()
                 self.operation_successful = True
             else:
                 self.result_data = {}
@@ -269,14 +287,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting telephones for clinic {clinic_id} in country: {self.country_code}")
         
         try:
-            query = sql_queries.get_clinic_telephones_query(clinic_id, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_clinic_telephones_query(clinic_id, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -298,14 +313,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting services for clinic {clinic_id} in country: {self.country_code}")
         
         try:
-            query = sql_queries.get_clinic_services_query(clinic_id, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_clinic_services_query(clinic_id, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -335,6 +347,7 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             has_slots = self.request_data.get('has_slots')
             allow_questions = self.request_data.get('allow_questions')
             limit = self.request_data.get('limit')
+            offset = self.request_data.get('offset')
             
             # Converti stringhe boolean
             if has_slots is not None:
@@ -342,7 +355,7 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             if allow_questions is not None:
                 allow_questions = str(allow_questions).lower() in ['true', '1', 'yes']
             
-            query = sql_queries.search_doctors_advanced_query(
+            query, params = sql_queries.search_doctors_advanced_query(
                 search_term=search_term,
                 city=city,
                 profession=profession,
@@ -350,11 +363,12 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
                 max_rate=max_rate,
                 has_slots=has_slots,
                 allow_questions=allow_questions,
-                limit=limit,
-                country_code=self.country_code
+                limit=int(limit) if limit is not None else None,
+                country_code=self.country_code,
+                offset=int(offset) if offset is not None else None
             )
             
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             raw_data = self.query_result
             
             if raw_data:
@@ -381,14 +395,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting popular specializations for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_popular_specializations_query(limit=limit, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_popular_specializations_query(limit=limit, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -411,14 +422,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting top rated doctors for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_top_rated_doctors_query(limit=limit, min_rate=min_rate, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_top_rated_doctors_query(limit=limit, min_rate=min_rate, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -442,13 +450,13 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             city = self.request_data.get('city')
             profession = self.request_data.get('profession')
             
-            query = sql_queries.get_doctors_with_slots_query(
+            query, params = sql_queries.get_doctors_with_slots_query(
                 city=city,
                 profession=profession,
                 country_code=self.country_code
             )
             
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             raw_data = self.query_result
             
             if raw_data:
@@ -474,14 +482,11 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting database stats for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_database_stats_query(country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.get_database_stats_query(country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -494,30 +499,18 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return self
 
-    def execute_query(self, query, country_code=None):
+    def execute_query(self, query, country_code=None, params=None):
         """
         Esegue query usando la connessione database specifica per paese
         :param query: query SQL da eseguire
         :param country_code: codice paese (DE, IT)
-        :return: risultati query
+        :param params: dict, valori dei placeholder %(name)s della query
+        :return: self, con le righe in query_result (database_manager.QueryResult, lista vuota senza righe)
         """
         try:
             if query and country_code:
-                # Ottieni cursor specifico per paese
-                cursor_attr = f'cursor_{country_code.lower()}'
-                if hasattr(g, cursor_attr):
-                    cursor = getattr(g, cursor_attr)
-                    cursor.execute(query)
-                    self.query_result = cursor.fetchall()
-                    
-                    if len(self.query_result) == 1:
-                        self.query_result = dict(self.query_result[0])
-                    elif len(self.query_result) > 1:
-                        self.query_result = [dict(record) for record in self.query_result]
-                    else:
-                        self.query_result = None
-                else:
-                    raise Exception(f"Nessuna connessione database disponibile per paese: {country_code}")
+                # Connessione specifica per paese (acquisita al primo uso)
+                self.query_result = database_manager.run_query(country_code, query, params)
                     
         except Exception as e:
             err_msg = f'Errore in execute_query per {country_code}: {query}: {e}'
@@ -525,6 +518,39 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             raise e
         
         return self
+
+    def refresh_enrichment_state(self, doctor_ids=None):
+        """
+        Ricalcola le righe di doctors.enrichment_state dei dottori indicati.
+        Le scritture lo chiamano dentro database_manager.transaction: un errore annulla anche la scrittura.
+        :param doctor_ids: list, ID dei dottori (tutti quelli del paese se None)
+        :return: dict {'refreshed': int, 'removed': int}
+        """
+        query, params = sql_queries.refresh_enrichment_state_query(doctor_ids=doctor_ids, country_code=self.country_code)
+        cursor = database_manager.get_cursor(self.country_code)
+        database_manager.execute_statement(cursor, query, params)
+        return dict(cursor.fetchone())
+
+    def refresh_search_projection(self, doctor_ids=None):
+        """
+        Aggiorna le righe di doctors.doctor_search_projection (ricerca lite) dei dottori indicati.
+        Chiamato dopo ogni scrittura che tocca un dottore: un errore viene loggato e non fa fallire la scrittura,
+        la proiezione resta indietro fino a "flask db-rebuild-search-projection".
+        :param doctor_ids: list, ID dei dottori (tutti se None)
+        :return: dict {'refreshed': int, 'removed': int} o None in caso di errore
+        """
+        try:
+            query, params = sql_queries.refresh_doctor_search_projection_query(
+                doctor_ids=doctor_ids, country_code=self.country_code
+            )
+            cursor = database_manager.get_cursor(self.country_code)
+            database_manager.execute_statement(cursor, query, params)
+            return dict(cursor.fetchone())
+        except Exception as e:
+            loggerManager.logger.error(f"Error refreshing search projection for country {self.country_code}, "
+                                       f"doctors {doctor_ids}: {e}")
+            return None
+
     # Aggiungi questi metodi alla classe EnhancedMedicalWorker in api/lib/worker.py
 
     def save_google_place_data(self, place_data):
@@ -543,13 +569,18 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             if not place_data.get('doctor_id'):
                 raise ValueError("doctor_id is required - Google Place must be linked to a doctor")
             
-            query = sql_queries.insert_google_place_data_query(place_data, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.insert_google_place_data_query(place_data, country_code=self.country_code)
+            with database_manager.transaction(self.country_code):
+                self.execute_query(query, country_code=self.country_code, params=params)
+                if self.query_result:
+                    self.refresh_enrichment_state([self.query_result.first().get('doctor_id')])
             
             if self.query_result:
-                self.result_data = self.query_result
+                self.result_data = self.query_result.first()
                 self.operation_successful = True
-                doctor_id = self.query_result.get('doctor_id')
+                doctor_id = self.result_data.get('doctor_id')
+                cache_manager.on_enrichment_write(self.country_code)
+                self.refresh_search_projection([doctor_id])
                 loggerManager.logger.info(f"Successfully saved Google Place: {place_data.get('google_place_id')} for doctor_id: {doctor_id}")
             else:
                 self.result_data = {}
@@ -574,19 +605,16 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting Google Places data for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_google_places_data_query(
+            query, params = sql_queries.get_google_places_data_query(
                 google_place_id=google_place_id,
                 doctor_id=doctor_id,
                 country_code=self.country_code,
                 limit=limit
             )
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -618,12 +646,17 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             if not attempt_data.get('attempt_status'):
                 raise ValueError("attempt_status is required")
             
-            query = sql_queries.insert_enrichment_attempt_query(attempt_data, country_code=self.country_code)
-            self.execute_query(query, country_code=self.country_code)
+            query, params = sql_queries.insert_enrichment_attempt_query(attempt_data, country_code=self.country_code)
+            with database_manager.transaction(self.country_code):
+                self.execute_query(query, country_code=self.country_code, params=params)
+                if self.query_result:
+                    self.refresh_enrichment_state([attempt_data.get('doctor_id')])
             
             if self.query_result:
-                self.result_data = self.query_result
+                self.result_data = self.query_result.first()
                 self.operation_successful = True
+                cache_manager.on_enrichment_write(self.country_code)
+                self.refresh_search_projection([attempt_data.get('doctor_id')])
                 loggerManager.logger.info(f"Successfully saved enrichment attempt: doctor_id {attempt_data.get('doctor_id')}, status: {attempt_data.get('attempt_status')}")
             else:
                 self.result_data = {}
@@ -637,6 +670,177 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return self
 
+    @staticmethod
+    def _google_place_attempt(place_data, processing_time_ms=None):
+        """
+        Tentativo di arricchimento generato per i dati di un Google Place, quando non è dato esplicitamente
+        :param place_data: dict, dati da Google Places API
+        :param processing_time_ms: int, durata dell'arricchimento (opzionale)
+        :return: dict, come per save_enrichment_attempt
+        """
+        return {
+            'doctor_id': place_data.get('doctor_id'),
+            'attempt_status': 'success' if place_data.get('google_place_id') else 'no_results',
+            'enrichment_source': 'google_places',
+            'search_query': place_data.get('search_query'),
+            'doctor_name': place_data.get('original_doctor', {}).get('name'),
+            'doctor_surname': place_data.get('original_doctor', {}).get('surname'),
+            'clinic_name': place_data.get('business_name'),
+            'clinic_address': place_data.get('formatted_address'),
+            'google_place_id': place_data.get('google_place_id'),
+            'places_found': 1 if place_data.get('google_place_id') else 0,
+            'attempted_by': place_data.get('attempted_by'),
+            'processing_time_ms': processing_time_ms
+        }
+
+    def _enrichment_attempt_row(self, attempt_data, doctor_id):
+        """
+        Valida un tentativo di arricchimento dei salvataggi batch e ne prepara i valori delle colonne
+        :param attempt_data: dict, come per save_enrichment_attempt
+        :param doctor_id: ID del dottore del tentativo
+        :return: dict {colonna: valore} per insert_enrichment_attempts_bulk_query; ValueError se non valido
+        """
+        if not isinstance(attempt_data, dict):
+            raise ValueError("attempt must be an object")
+        if not doctor_id:
+            raise ValueError("doctor_id is required for enrichment attempt")
+        if not attempt_data.get('attempt_status'):
+            raise ValueError("attempt_status is required")
+        params = sql_queries.enrichment_attempt_params(attempt_data, country_code=self.country_code)
+        try:
+            params['doctor_id'] = int(doctor_id)
+        except (TypeError, ValueError):
+            raise ValueError("doctor_id must be an integer")
+        return params
+
+    @staticmethod
+    def _add_attempt_row(rows, params):
+        """
+        Aggiunge un tentativo alle righe da scrivere: per lo stesso dottore e fonte resta l'ultimo
+        :param rows: dict {(doctor_id, enrichment_source): valori delle colonne}
+        :param params: dict, valori delle colonne (vedi _enrichment_attempt_row)
+        :return: tuple (doctor_id, enrichment_source), chiave del tentativo
+        """
+        key = (params['doctor_id'], params['enrichment_source'])
+        rows[key] = params
+        return key
+
+    def _insert_enrichment_attempts(self, cursor, rows):
+        """
+        Scrive i tentativi di _add_attempt_row con _insert_pages, dentro la transazione di cursor
+        :param cursor: cursore di database_manager.transaction
+        :param rows: dict {(doctor_id, enrichment_source): valori delle colonne}
+        :return: tuple (dict {chiave: {'id', 'doctor_id', 'attempt_status'}} dei tentativi salvati,
+                 dict {chiave: errore} dei tentativi rifiutati)
+        """
+        query, template = sql_queries.insert_enrichment_attempts_bulk_query(country_code=self.country_code)
+        returned, errors = self._insert_pages(cursor, query, template, list(rows.items()), 'enrichment_attempts')
+        saved = {
+            (row['doctor_id'], row['enrichment_source']): {
+                'id': row['id'], 'doctor_id': row['doctor_id'], 'attempt_status': row['attempt_status']
+            }
+            for row in returned
+        }
+        return saved, errors
+
+    def _insert_pages(self, cursor, query, template, rows, name):
+        """
+        Scrive le righe con INSERT multi-riga (psycopg2.extras.execute_values), BATCH_INSERT_PAGE_SIZE righe per
+        statement, dentro la transazione di cursor. Una pagina rifiutata dal database viene riscritta riga per riga
+        con un savepoint per riga, così solo le righe in errore falliscono.
+        :param cursor: cursore di database_manager.transaction
+        :param query: string, query con un VALUES %s (ON CONFLICT DO UPDATE ... RETURNING)
+        :param template: string, template di una riga
+        :param rows: list di (chiave, dict dei parametri della riga)
+        :param name: string, nome dei savepoint
+        :return: tuple (righe restituite da RETURNING, dict {chiave: errore} delle righe rifiutate)
+        """
+        page_size = current_app.config.get('BATCH_INSERT_PAGE_SIZE', 1000)
+        returned = []
+        errors = {}
+
+        for start in range(0, len(rows), page_size):
+            page = rows[start:start + page_size]
+            cursor.execute(f"SAVEPOINT {name}_page")
+            try:
+                returned += psycopg2.extras.execute_values(
+                    cursor, query, [params for key, params in page],
+                    template=template, page_size=len(page), fetch=True
+                )
+                cursor.execute(f"RELEASE SAVEPOINT {name}_page")
+            except psycopg2.Error as e:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}_page")
+                loggerManager.logger.warning(f"Batch insert page of {name} rejected, saving its rows one by one: {e}")
+                for key, params in page:
+                    cursor.execute(f"SAVEPOINT {name}_row")
+                    try:
+                        returned += psycopg2.extras.execute_values(cursor, query, [params], template=template, fetch=True)
+                        cursor.execute(f"RELEASE SAVEPOINT {name}_row")
+                    except psycopg2.Error as row_error:
+                        cursor.execute(f"ROLLBACK TO SAVEPOINT {name}_row")
+                        errors[key] = str(row_error)
+
+        return returned, errors
+
+    def save_enrichment_attempts(self, attempts):
+        """
+        Salva molti tentativi di arricchimento con INSERT multi-riga (BATCH_INSERT_PAGE_SIZE righe per statement)
+        in una sola transazione. La validazione è fatta in Python prima di scrivere; una pagina rifiutata dal
+        database viene riscritta riga per riga, così solo le righe in errore falliscono.
+        Più tentativi per lo stesso dottore e fonte: viene scritto l'ultimo, gli altri ne condividono l'esito.
+        :param attempts: list di dict, come per save_enrichment_attempt
+        :return: self, result_data è la lista degli esiti nell'ordine di attempts:
+                 {'doctor_id', 'status': 'saved', 'data': {...}} oppure {'doctor_id', 'status': 'failed', 'error': {...}}
+        """
+        loggerManager.logger.debug(f"Saving {len(attempts)} enrichment attempts for country: {self.country_code}")
+
+        results = [None] * len(attempts)
+        # Per ogni tentativo valido: (indice, chiave del tentativo)
+        items = []
+        rows = {}
+
+        for index, attempt_data in enumerate(attempts):
+            doctor_id = attempt_data.get('doctor_id') if isinstance(attempt_data, dict) else None
+            try:
+                params = self._enrichment_attempt_row(attempt_data, doctor_id)
+            except ValueError as e:
+                results[index] = {"doctor_id": doctor_id, "status": "failed", "error": {"error": str(e)}}
+                continue
+            items.append((index, self._add_attempt_row(rows, params)))
+
+        saved = {}
+        errors = {}
+        try:
+            if rows:
+                with database_manager.transaction(self.country_code) as cursor:
+                    saved, errors = self._insert_enrichment_attempts(cursor, rows)
+
+                    if saved:
+                        # Stessa transazione dei tentativi
+                        self.refresh_enrichment_state(sorted({doctor_id for doctor_id, source in saved}))
+
+        except Exception as e:
+            loggerManager.logger.error(f"Error saving enrichment attempts for country {self.country_code}: {e}")
+            saved = {}
+            errors = {key: str(e) for key in rows}
+
+        for index, key in items:
+            if key in saved:
+                result = {"status": "saved", "data": saved[key]}
+            else:
+                result = {"status": "failed", "error": {"error": errors.get(key, "attempt not saved")}}
+            results[index] = {"doctor_id": attempts[index].get('doctor_id'), **result}
+
+        if saved:
+            doctor_ids = sorted({doctor_id for doctor_id, source in saved})
+            cache_manager.on_enrichment_write(self.country_code)
+            self.refresh_search_projection(doctor_ids)
+            loggerManager.logger.info(f"Saved {len(saved)} enrichment attempts for {len(doctor_ids)} doctors in country {self.country_code}")
+
+        self.result_data = results
+        self.operation_successful = bool(saved)
+        return self
+
     def get_enrichment_attempts(self, doctor_id=None, status=None, limit=None):
         """
         Recupera tentativi di arricchimento con filtri opzionali
@@ -648,19 +852,16 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         loggerManager.logger.debug(f"Getting enrichment attempts for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_enrichment_attempts_query(
+            query, params = sql_queries.get_enrichment_attempts_query(
                 doctor_id=doctor_id,
                 country_code=self.country_code,
                 status=status,
                 limit=limit
             )
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -687,17 +888,14 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
                 self.operation_successful = True
                 return self
             
-            query = sql_queries.check_doctor_enrichment_status_query(
+            query, params = sql_queries.check_doctor_enrichment_status_query(
                 doctor_ids=doctor_ids,
                 country_code=self.country_code
             )
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -710,28 +908,27 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return self
 
-    def get_unenriched_doctors(self, limit=None, exclude_failed=False):
+    def get_unenriched_doctors(self, limit=None, exclude_failed=False, cursor=None):
         """
         Ottieni dottori che non sono mai stati arricchiti o che necessitano di re-arricchimento
-        :param limit: int, limite risultati (opzionale)
+        :param limit: int, limite dottori (opzionale)
         :param exclude_failed: bool, escludi dottori con tentativi falliti
+        :param cursor: tuple (rate, doctor_id), dottori successivi al cursore (opzionale)
         :return: self
         """
         loggerManager.logger.debug(f"Getting unenriched doctors for country: {self.country_code}")
         
         try:
-            query = sql_queries.get_unenriched_doctors_query(
+            query, params = sql_queries.get_unenriched_doctors_query(
                 country_code=self.country_code,
                 limit=limit,
-                exclude_failed=exclude_failed
+                exclude_failed=exclude_failed,
+                cursor=cursor
             )
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             
             if self.query_result:
-                if isinstance(self.query_result, dict):
-                    self.result_data = [self.query_result]
-                else:
-                    self.result_data = self.query_result
+                self.result_data = self.query_result
                 self.operation_successful = True
             else:
                 self.result_data = []
@@ -744,6 +941,23 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return self
 
+    def iter_unenriched_doctors(self, limit=None, exclude_failed=False, cursor=None):
+        """
+        Come get_unenriched_doctors, per gli export: le righe (una per clinica) sono lette a gruppi con un cursore
+        lato server invece di essere caricate tutte in result_data
+        :param limit: int, limite dottori (opzionale)
+        :param exclude_failed: bool, escludi dottori con tentativi falliti
+        :param cursor: tuple (rate, doctor_id), dottori successivi al cursore (opzionale)
+        :return: generatore di database_manager.Row
+        """
+        query, params = sql_queries.get_unenriched_doctors_query(
+            country_code=self.country_code,
+            limit=limit,
+            exclude_failed=exclude_failed,
+            cursor=cursor
+        )
+        return self.iter_query(query, country_code=self.country_code, params=params, row_type=database_manager.Row)
+
     def save_google_place_data_with_attempt(self, place_data, attempt_data=None):
         """
         Salva dati Google Places E traccia il tentativo di arricchimento
@@ -762,20 +976,9 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             
             # Salva prima il tentativo di arricchimento
             if not attempt_data:
-                attempt_data = {
-                    'doctor_id': place_data.get('doctor_id'),
-                    'attempt_status': 'success' if place_data.get('google_place_id') else 'no_results',
-                    'enrichment_source': 'google_places',
-                    'search_query': place_data.get('search_query'),
-                    'doctor_name': place_data.get('original_doctor', {}).get('name'),
-                    'doctor_surname': place_data.get('original_doctor', {}).get('surname'),
-                    'clinic_name': place_data.get('business_name'),
-                    'clinic_address': place_data.get('formatted_address'),
-                    'google_place_id': place_data.get('google_place_id'),
-                    'places_found': 1 if place_data.get('google_place_id') else 0,
-                    'attempted_by': place_data.get('attempted_by'),
-                    'processing_time_ms': int((datetime.now() - start_time).total_seconds() * 1000)
-                }
+                attempt_data = self._google_place_attempt(
+                    place_data, int((datetime.now() - start_time).total_seconds() * 1000)
+                )
             
             # Salva il tentativo
             attempt_worker = EnhancedMedicalWorker(country_code=self.country_code)
@@ -823,38 +1026,136 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             self.result_data = {"error": str(e), "doctor_id": place_data.get('doctor_id')}
 
         return self
-    def get_complete_doctor_profile(self, doctor_id):
+
+    def save_google_places_batch(self, places):
+        """
+        Versione batch di save_google_place_data_with_attempt: salva tentativi e Google Places di molti dottori con
+        INSERT ... ON CONFLICT multi-riga (BATCH_INSERT_PAGE_SIZE righe per statement) in una sola transazione,
+        prima i tentativi poi i Google Places, e aggiorna enrichment_state nella stessa transazione.
+        Più tentativi per lo stesso dottore e fonte: viene scritto l'ultimo. Più dati per lo stesso google_place_id:
+        il primo aggiornato dai successivi, come con salvataggi uno dopo l'altro. Gli elementi ripetuti condividono
+        l'esito della riga scritta.
+        :param places: list di dict, dati da Google Places API come per save_google_place_data_with_attempt;
+                       'attempt' (opzionale) sostituisce il tentativo generato
+        :return: self, result_data è la lista degli esiti nell'ordine di places, con le chiavi del risultato di
+                 save_google_place_data_with_attempt (più 'error' per i dati non validi)
+        """
+        loggerManager.logger.debug(f"Saving {len(places)} Google Places with attempt tracking for country: {self.country_code}")
+
+        results = [None] * len(places)
+        # Per ogni elemento valido: (indice, chiave del tentativo, chiave del Google Place o None, stato)
+        items = []
+        attempt_rows = {}
+        place_rows = {}
+
+        for index, place_data in enumerate(places):
+            doctor_id = place_data.get('doctor_id') if isinstance(place_data, dict) else None
+            try:
+                if not isinstance(place_data, dict):
+                    raise ValueError("place must be an object")
+                attempt_data = place_data.get('attempt') or self._google_place_attempt(
+                    place_data, place_data.get('processing_time_ms')
+                )
+                attempt_params = self._enrichment_attempt_row(attempt_data, doctor_id)
+                doctor_id = attempt_params['doctor_id']
+
+                place_params = None
+                if place_data.get('google_place_id'):
+                    place_params = sql_queries.google_place_params(place_data, country_code=self.country_code)
+                    place_params['doctor_id'] = doctor_id
+            except (ValueError, AttributeError) as e:
+                results[index] = {"doctor_id": doctor_id, "attempt_saved": False, "google_place_saved": False,
+                                  "error": str(e)}
+                continue
+
+            attempt_key = self._add_attempt_row(attempt_rows, attempt_params)
+            place_key = None
+            if place_params:
+                place_key = place_params['google_place_id']
+                if place_key in place_rows:
+                    # Come salvataggi uno dopo l'altro: il primo resta, i successivi aggiornano solo le colonne di ON CONFLICT
+                    place_params = dict(place_rows[place_key], **{
+                        column: place_params[column] for column in sql_queries.GOOGLE_PLACE_UPDATED_COLUMNS
+                    })
+                place_rows[place_key] = place_params
+            items.append((index, attempt_key, place_key, attempt_params['attempt_status']))
+
+        saved_attempts = {}
+        saved_places = {}
+        errors = {}
+        try:
+            if attempt_rows:
+                with database_manager.transaction(self.country_code) as cursor:
+                    saved_attempts, attempt_errors = self._insert_enrichment_attempts(cursor, attempt_rows)
+                    errors.update(attempt_errors)
+
+                    if place_rows:
+                        query, template = sql_queries.insert_google_places_bulk_query(country_code=self.country_code)
+                        returned, place_errors = self._insert_pages(cursor, query, template, list(place_rows.items()),
+                                                                    'google_places')
+                        errors.update(place_errors)
+                        for row in returned:
+                            saved_places[row['google_place_id']] = dict(row)
+
+                    # Un google_place_id già salvato resta del suo dottore: si aggiornano entrambi
+                    doctor_ids = {doctor_id for doctor_id, source in saved_attempts} \
+                        | {row['doctor_id'] for row in saved_places.values()}
+                    if doctor_ids:
+                        # Stessa transazione di tentativi e Google Places
+                        self.refresh_enrichment_state(sorted(doctor_ids))
+
+        except Exception as e:
+            loggerManager.logger.error(f"Error saving Google Places batch for country {self.country_code}: {e}")
+            saved_attempts = {}
+            saved_places = {}
+            errors = dict({key: str(e) for key in attempt_rows}, **{key: str(e) for key in place_rows})
+
+        for index, attempt_key, place_key, status in items:
+            attempt_saved = attempt_key in saved_attempts
+            google_place_result = saved_places.get(place_key) if place_key else None
+            results[index] = {
+                'attempt_saved': attempt_saved,
+                'attempt_data': saved_attempts[attempt_key] if attempt_saved
+                else {"error": errors.get(attempt_key, "attempt not saved")},
+                'google_place_saved': google_place_result is not None,
+                'google_place_data': google_place_result if google_place_result is not None or not place_key
+                else {"error": errors.get(place_key, "Google Place not saved")},
+                'doctor_id': attempt_key[0],
+                'status': status
+            }
+
+        if saved_attempts or saved_places:
+            doctor_ids = sorted({doctor_id for doctor_id, source in saved_attempts}
+                                | {row['doctor_id'] for row in saved_places.values()})
+            cache_manager.on_enrichment_write(self.country_code)
+            self.refresh_search_projection(doctor_ids)
+            loggerManager.logger.info(f"Saved {len(saved_attempts)} enrichment attempts and {len(saved_places)} Google Places "
+                                      f"for {len(doctor_ids)} doctors in country {self.country_code}")
+
+        self.result_data = results
+        self.operation_successful = bool(saved_attempts)
+        return self
+    def get_complete_doctor_profile(self, doctor_id, single_query=True):
         """
         Ottieni profilo completo del dottore con TUTTI i dati disponibili
         :param doctor_id: int, ID del dottore
+        :param single_query: bool, True per leggere tutte le sezioni con un solo statement (un round trip),
+                             False per eseguire una query per sezione
         :return: self
         """
         loggerManager.logger.debug(f"Getting complete profile for doctor {doctor_id} in country: {self.country_code}")
         
         try:
-            # Ottieni tutte le query
-            queries = sql_queries.get_complete_doctor_profile_query(doctor_id, country_code=self.country_code)
-            
-            # Esegui ogni query e raccogli i risultati
-            complete_data = {}
-            
-            for section_name, query in queries.items():
+            complete_data = None
+            if single_query:
                 try:
-                    self.execute_query(query, country_code=self.country_code)
-                    
-                    if self.query_result:
-                        if isinstance(self.query_result, list):
-                            complete_data[section_name] = self.query_result
-                        else:
-                            complete_data[section_name] = [self.query_result]
-                    else:
-                        complete_data[section_name] = []
-                        
-                    loggerManager.logger.debug(f"Section {section_name}: {len(complete_data[section_name])} records")
-                    
+                    complete_data = self._get_complete_profile_sections_single(doctor_id)
                 except Exception as e:
-                    loggerManager.logger.error(f"Error executing query for section {section_name}: {e}")
-                    complete_data[section_name] = []
+                    # Ripiega sulle query separate, che isolano l'errore nella singola sezione
+                    loggerManager.logger.error(f"Error executing complete profile single query for doctor {doctor_id}, falling back to section queries: {e}")
+
+            if complete_data is None:
+                complete_data = self._get_complete_profile_sections(doctor_id)
             
             # Verifica che il dottore esista
             if not complete_data.get('doctor_base'):
@@ -877,6 +1178,90 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
 
         return self
 
+    def get_complete_doctor_profiles(self, doctor_ids):
+        """
+        Ottieni il profilo completo di più dottori con una query per sezione per tutto il gruppo
+        :param doctor_ids: list di ID dei dottori
+        :return: self, result_data è un dict {doctor_id: profilo organizzato o None se non trovato} nell'ordine di doctor_ids
+        """
+        loggerManager.logger.debug(f"Getting complete profiles for {len(doctor_ids)} doctors in country: {self.country_code}")
+        
+        try:
+            queries = sql_queries.get_complete_doctors_profiles_query(doctor_ids, country_code=self.country_code)
+            sections_by_doctor = {
+                doctor_id: {section_name: [] for section_name in sql_queries.COMPLETE_PROFILE_SECTIONS}
+                for doctor_id in doctor_ids
+            }
+
+            for section_name, (query, params) in (queries or {}).items():
+                try:
+                    self.execute_query(query, country_code=self.country_code, params=params)
+                    records = self.query_result
+
+                    # Smista le righe per dottore, l'ordine della sezione è mantenuto
+                    for record in records:
+                        doctor_sections = sections_by_doctor.get(record.pop('profile_doctor_id'))
+                        if doctor_sections is not None:
+                            doctor_sections[section_name].append(record)
+                        
+                    loggerManager.logger.debug(f"Section {section_name}: {len(records)} records for {len(doctor_ids)} doctors")
+                    
+                except Exception as e:
+                    loggerManager.logger.error(f"Error executing batch query for section {section_name}: {e}")
+
+            self.result_data = {
+                doctor_id: self._organize_complete_doctor_data(complete_data, doctor_id)
+                if complete_data['doctor_base'] else None
+                for doctor_id, complete_data in sections_by_doctor.items()
+            }
+            self.operation_successful = True
+            
+        except Exception as e:
+            loggerManager.logger.error(f"Error getting complete doctor profiles in country {self.country_code}: {e}")
+            self.operation_successful = False
+            self.result_data = None
+
+        return self
+
+    def _get_complete_profile_sections_single(self, doctor_id):
+        """
+        Leggi tutte le sezioni del profilo completo con get_complete_doctor_profile_single_query
+        :param doctor_id: int, ID del dottore
+        :return: dict {sezione: list di record}
+        """
+        query, params = sql_queries.get_complete_doctor_profile_single_query(doctor_id, country_code=self.country_code)
+        self.execute_query(query, country_code=self.country_code, params=params)
+        rows = self.query_result
+
+        complete_data = sql_queries.split_complete_profile_rows(rows)
+        loggerManager.logger.debug(f"Complete profile of doctor {doctor_id}: {len(rows)} records in one query")
+        return complete_data
+
+    def _get_complete_profile_sections(self, doctor_id):
+        """
+        Leggi le sezioni del profilo completo con una query per sezione
+        :param doctor_id: int, ID del dottore
+        :return: dict {sezione: list di record}
+        """
+        # Ottieni tutte le query
+        queries = sql_queries.get_complete_doctor_profile_query(doctor_id, country_code=self.country_code)
+        
+        # Esegui ogni query e raccogli i risultati
+        complete_data = {}
+        
+        for section_name, (query, params) in queries.items():
+            try:
+                self.execute_query(query, country_code=self.country_code, params=params)
+                complete_data[section_name] = self.query_result
+                    
+                loggerManager.logger.debug(f"Section {section_name}: {len(complete_data[section_name])} records")
+                
+            except Exception as e:
+                loggerManager.logger.error(f"Error executing query for section {section_name}: {e}")
+                complete_data[section_name] = []
+
+        return complete_data
+
     def _organize_complete_doctor_data(self, data_sections, doctor_id):
         """
         Organizza i dati del dottore in una struttura logica e ben organizzata
@@ -888,28 +1273,28 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
         # Dati base del dottore
         doctor_base = data_sections['doctor_base'][0] if data_sections['doctor_base'] else {}
         
+        # Raggruppa servizi e telefoni per clinica con un solo passaggio su ogni sezione
+        services_by_clinic = defaultdict(list)
+        for service in data_sections['services']:
+            services_by_clinic[service['clinic_id']].append(service)
+
+        phones_by_clinic = defaultdict(list)
+        for phone in data_sections['phone_numbers']:
+            phones_by_clinic[phone['clinic_id']].append({
+                'telephone_id': phone['telephone_id'],
+                'phone_number': phone['phone_number'],
+                'phone_created': phone['phone_created'],
+                'phone_modified': phone['phone_modified']
+            })
+
         # Organizza cliniche con i loro servizi e telefoni
         clinics_data = []
         for clinic in data_sections['clinics']:
             clinic_id = clinic['clinic_id']
             
-            # Servizi per questa clinica
-            clinic_services = [
-                service for service in data_sections['services'] 
-                if service['clinic_id'] == clinic_id
-            ]
-            
-            # Telefoni per questa clinica
-            clinic_phones = [
-                {
-                    'telephone_id': phone['telephone_id'],
-                    'phone_number': phone['phone_number'],
-                    'phone_created': phone['phone_created'],
-                    'phone_modified': phone['phone_modified']
-                }
-                for phone in data_sections['phone_numbers'] 
-                if phone['clinic_id'] == clinic_id
-            ]
+            # Servizi e telefoni per questa clinica
+            clinic_services = list(services_by_clinic.get(clinic_id, []))
+            clinic_phones = list(phones_by_clinic.get(clinic_id, []))
             
             # Componi dati clinica completi
             clinic_data = dict(clinic)
@@ -932,18 +1317,9 @@ class EnhancedMedicalWorker(filter.DoctorsFilter, database_manager.ExecuteQuerie
             total_rating = sum(op['opinion_rate'] for op in opinions_with_rating)
             avg_opinion_rating = round(total_rating / len(opinions_with_rating), 2)
         
-        # Determina stato arricchimento
-        enrichment_status = 'never_attempted'
-        if data_sections['google_places']:
-            enrichment_status = 'enriched'
-        elif data_sections['enrichment_attempts']:
-            last_attempt = data_sections['enrichment_attempts'][0]  # Ordinato per data DESC
-            if last_attempt['attempt_status'] == 'success':
-                enrichment_status = 'enriched'
-            elif last_attempt['attempt_status'] in ['failed', 'error', 'no_results']:
-                enrichment_status = 'attempted_failed'
-            else:
-                enrichment_status = 'attempted'
+        # Stato arricchimento da doctors.enrichment_state (nessuna riga se mai tentato)
+        enrichment_state = data_sections.get('enrichment_state') or []
+        enrichment_status = enrichment_state[0]['enrichment_status'] if enrichment_state else 'never_attempted'
         
         # Struttura finale organizzata
         organized_profile = {
@@ -1083,34 +1459,44 @@ class Doctors(EnhancedMedicalWorker):
         self.doctors_returned = None
         self.returned_doctors = False
 
-    def get_doctors(self):
+    def get_doctors(self, json_items=False):
         """
         Metodo originale per ottenere dottori - mantiene compatibilità
+        :param json_items: bool, items costruiti da Postgres: doctors_returned è la lista dei testi JSON degli
+                           item, da inviare così come sono (json_provider.raw_items_response)
         :return: self
         """
         loggerManager.logger.debug(f"Getting doctors start for country: {self.country_code}")
         self.validate()
         
-        # Ottieni query
+        # Ottieni query (una riga per dottore, cliniche e specializzazioni aggregate in SQL)
         if self.doctor_id:
-            query = sql_queries.get_doctors_query(doctor_id=self.doctor_id, country_code=self.country_code)
+            query, params = sql_queries.get_doctors_aggregated_query(doctor_id=self.doctor_id, country_code=self.country_code,
+                                                                     json_items=json_items)
         elif self.city and self.profession:
-            query = sql_queries.get_doctors_query(city=self.city, profession=self.profession, country_code=self.country_code)
+            query, params = sql_queries.get_doctors_aggregated_query(city=self.city, profession=self.profession, country_code=self.country_code,
+                                                                     json_items=json_items)
         elif self.city:
-            query = sql_queries.get_doctors_query(city=self.city, country_code=self.country_code)
+            query, params = sql_queries.get_doctors_aggregated_query(city=self.city, country_code=self.country_code,
+                                                                     json_items=json_items)
         elif self.profession:
-            query = sql_queries.get_doctors_query(profession=self.profession, country_code=self.country_code)
+            query, params = sql_queries.get_doctors_aggregated_query(profession=self.profession, country_code=self.country_code,
+                                                                     json_items=json_items)
         else:
-            query = sql_queries.get_doctors_query(country_code=self.country_code)
+            query, params = sql_queries.get_doctors_aggregated_query(country_code=self.country_code,
+                                                                     json_items=json_items)
 
         # Esegui query usando connessione database specifica per paese
         try:
-            self.execute_query(query, country_code=self.country_code)
+            self.execute_query(query, country_code=self.country_code, params=params)
             raw_data = self.query_result
             
-            if raw_data:
-                # Trasforma dati grezzi nella struttura API originale
-                self.doctors_returned = self._transform_to_api_structure(raw_data)
+            if raw_data and json_items:
+                self.doctors_returned = [row['item'] for row in raw_data]
+                self.returned_doctors = True
+            elif raw_data:
+                # Trasforma dati aggregati nella struttura API originale
+                self.doctors_returned = self._transform_aggregated_to_api_structure(raw_data)
                 self.returned_doctors = True
             else:
                 self.doctors_returned = []
@@ -11,11 +11,15 @@
 """
 
 from flask import Flask, request, Blueprint, session, g, flash, render_template, jsonify, current_app, abort, redirect, \
-    url_for, make_response
-from api.lib import error_handlers, util, worker, sql_queries, database_manager, loggerManager
+    url_for, make_response, stream_with_context
+from contextlib import closing
+from api.lib import error_handlers, util, worker, sql_queries, database_manager, cache_manager, json_provider, \
+    compression, loggerManager
 
 # Blueprint per le route aggiuntive
 enhanced_bp = Blueprint("enhanced_api", __name__)
+# gzip / br above COMPRESSION_MIN_SIZE bytes
+enhanced_bp.after_request(compression.compress_response)
 
 
 @enhanced_bp.errorhandler(error_handlers.InvalidAPIUsage)
@@ -23,66 +27,160 @@ def invalid_api_usage(ex):
     return jsonify(ex.to_dict()), ex.status_code
 
 
-def validate_country_and_connection(country):
-    """Valida il paese e controlla la connessione database"""
+def validate_country(country):
+    """Valida il paese e la sua configurazione database, senza acquisire la connessione"""
     country = country.upper()
     if country not in ['DE', 'IT']:
         error_message = "Invalid country. Supported countries: DE, IT"
         raise error_handlers.InvalidAPIUsage(message=error_message, status_code=400)
     
-    # Controlla connessione database
-    if not g.get('db_connected', False):
-        error_message = "Database not available"
-        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
-    
-    # Controlla connessione specifica per paese
-    country_cursor_attr = f'cursor_{country.lower()}'
-    if not hasattr(g, country_cursor_attr):
+    # Controlla configurazione database per paese
+    if not database_manager.is_country_configured(country):
         error_message = f"Database for country {country} not available"
         raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
     
     return country
 
 
-def execute_query_for_country(query, country_code):
-    """Esegue una query per un paese specifico"""
+def connect_country(country):
+    """Acquisisce la connessione del paese (solo al primo uso nella richiesta), 503 se non disponibile"""
     try:
-        cursor_attr = f'cursor_{country_code.lower()}'
-        if hasattr(g, cursor_attr):
-            cursor = getattr(g, cursor_attr)
-            cursor.execute(query)
-            result = cursor.fetchall()
-            
-            if len(result) == 1:
-                return dict(result[0])
-            elif len(result) > 1:
-                return [dict(record) for record in result]
-            else:
-                return None
-        else:
-            raise Exception(f"No database connection available for country: {country_code}")
+        database_manager.get_connection(country)
+    except Exception as e:
+        loggerManager.logger.error(f"Failed to connect to database for country {country}: {e}")
+        error_message = "Database not available"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
+
+
+def validate_country_and_connection(country):
+    """Valida il paese e controlla la connessione database"""
+    country = validate_country(country)
+    connect_country(country)
+    return country
+
+
+def execute_query_for_country(query, country_code, params=None):
+    """Esegue una query per un paese specifico, righe in un database_manager.QueryResult (lista vuota senza righe)"""
+    try:
+        return database_manager.run_query(country_code, query, params)
     except Exception as e:
         loggerManager.logger.error(f"Error executing query for {country_code}: {e}")
         raise e
 
 
+def execute_cached_query_for_country(endpoint, query, country_code, params=None):
+    """
+    Come execute_query_for_country, con il risultato nella cache dei dati di riferimento (cache_manager).
+    La connessione è acquisita solo in caso di miss: le view in cache validano il paese con validate_country.
+    """
+    def load():
+        connect_country(country_code)
+        return execute_query_for_country(query, country_code, params)
+
+    return cache_manager.get_or_load(endpoint, country_code, params, load)
+
+
+def get_search_order(request_data, cursor=None):
+    """Ordine della ricerca: 'rate' (default, paginabile con cursore) o 'relevance' (similarità del nome)"""
+    order = request_data.get('order') or 'rate'
+    if order not in ('rate', 'relevance'):
+        error_message = "Invalid order. Supported orders: rate, relevance"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=400)
+    if order == 'relevance' and cursor:
+        error_message = "Cursor pagination is only available with order=rate"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=400)
+    return order
+
+
+def doctor_item_cursor_key(item):
+    """(rate, doctor_id) di un item costruito da _transform_to_api_structure, per la paginazione a cursore"""
+    return item['details']['rate'], item['details']['doctor_id']
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_ndjson(request_data):
+    """Il client chiede NDJSON: parametro format=ndjson (anche nella query string di un POST) o Accept: application/x-ndjson"""
+    output_format = request_data.get('format') or request.args.get('format')
+    if output_format:
+        return output_format == 'ndjson'
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_rows_response(rows, country, to_item, limit, summary, cursor_pagination=True, first_row_only=True):
+    """
+    Risposta NDJSON di un elenco di dottori: ogni item è inviato appena costruito, un item JSON per riga.
+    L'ultima riga è {"summary": {...}} con total e next_cursor, oppure {"error": ...} se la lettura si interrompe.
+    :param rows: iteratore delle righe (database_manager.stream_query), limit + 1 dottori con righe contigue
+    :param country: string, paese
+    :param to_item: funzione che costruisce l'item da una riga
+    :param limit: int, dottori per pagina (None senza paginazione)
+    :param summary: dict, campi della riga finale (country, order, ...)
+    :param cursor_pagination: bool, next_cursor (rate, doctor_id) quando esiste una pagina successiva
+    :param first_row_only: bool, un item per dottore (dalla prima riga) invece di uno per riga
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        total = 0
+        last_key = None
+        next_cursor = None
+        try:
+            with closing(rows) as stream:
+                for row in stream:
+                    key = util.row_cursor_key(row)
+                    if key != last_key:
+                        if limit is not None and total >= limit:
+                            if cursor_pagination and last_key is not None:
+                                next_cursor = util.encode_cursor(*last_key)
+                            break
+                        last_key = key
+                        total += 1
+                    elif first_row_only:
+                        continue  # Altra riga (clinica, specializzazione, servizio) dello stesso dottore
+                    yield dumps(to_item(row)) + "\n"
+        except Exception as e:
+            loggerManager.logger.error(f"Error streaming results for country {country}: {e}")
+            yield dumps({"error": "Error streaming results", "country": country}) + "\n"
+            return
+        yield dumps({"summary": dict(summary, total=total, limit=limit, next_cursor=next_cursor)}) + "\n"
+
+    return current_app.response_class(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def ndjson_search_response(query, params, country, to_item, limit, summary):
+    """
+    Risposta NDJSON di una ricerca: le righe sono lette a gruppi con un cursore lato server come Row
+    (database_manager.stream_query) e ogni dottore è inviato appena trasformato dalla sua prima riga
+    :param query: string, query di ricerca con limit + 1 dottori (righe dello stesso dottore contigue)
+    :param params: dict, parametri della query
+    :param summary: dict, campi della riga finale (country, order, ...); next_cursor solo con order=rate
+    """
+    rows = database_manager.stream_query(country, query, params, row_type=database_manager.Row)
+    return ndjson_rows_response(rows, country, to_item, limit, summary,
+                                cursor_pagination=summary.get('order') == 'rate')
+
+
 # ====================== SPECIALIZATIONS ENDPOINTS ======================
 
 @enhanced_bp.route('/specializations', methods=('GET',))
+@cache_manager.conditional_response
 def get_specializations():
     """Ottieni tutte le specializzazioni"""
     request_data = util.process_request(request)
-    country = validate_country_and_connection(request_data.get('country', 'IT'))
+    country = validate_country(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_specializations_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_specializations_query(country_code=country)
+        result = execute_cached_query_for_country('specializations', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_specializations: {e}")
         output = {
@@ -95,19 +193,22 @@ def get_specializations():
 
 
 @enhanced_bp.route('/<country>/specializations', methods=('GET',))
+@cache_manager.conditional_response
 def get_specializations_by_country(country):
     """Ottieni specializzazioni per paese specifico"""
-    country = validate_country_and_connection(country)
+    country = validate_country(country)
     
     try:
-        query = sql_queries.get_specializations_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_specializations_query(country_code=country)
+        result = execute_cached_query_for_country('specializations', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_specializations_by_country: {e}")
         output = {
@@ -120,22 +221,25 @@ def get_specializations_by_country(country):
 
 
 @enhanced_bp.route('/specializations/popular', methods=('GET',))
+@cache_manager.conditional_response
 def get_popular_specializations():
     """Ottieni specializzazioni più popolari"""
     request_data = util.process_request(request)
-    country = validate_country_and_connection(request_data.get('country', 'IT'))
+    country = validate_country(request_data.get('country', 'IT'))
     limit = int(request_data.get('limit', 10))
     
     try:
-        query = sql_queries.get_popular_specializations_query(limit=limit, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_popular_specializations_query(limit=limit, country_code=country)
+        result = execute_cached_query_for_country('popular_specializations', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
             "limit": limit,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_popular_specializations: {e}")
         output = {
@@ -149,22 +253,25 @@ def get_popular_specializations():
 
 
 @enhanced_bp.route('/<country>/specializations/popular', methods=('GET',))
+@cache_manager.conditional_response
 def get_popular_specializations_by_country(country):
     """Ottieni specializzazioni popolari per paese specifico"""
-    country = validate_country_and_connection(country)
+    country = validate_country(country)
     request_data = util.process_request(request)
     limit = int(request_data.get('limit', 10))
     
     try:
-        query = sql_queries.get_popular_specializations_query(limit=limit, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_popular_specializations_query(limit=limit, country_code=country)
+        result = execute_cached_query_for_country('popular_specializations', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
             "limit": limit,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_popular_specializations_by_country: {e}")
         output = {
@@ -180,20 +287,23 @@ def get_popular_specializations_by_country(country):
 # ====================== CITIES ENDPOINTS ======================
 
 @enhanced_bp.route('/cities', methods=('GET',))
+@cache_manager.conditional_response
 def get_cities():
     """Ottieni tutte le città con dottori"""
     request_data = util.process_request(request)
-    country = validate_country_and_connection(request_data.get('country', 'IT'))
+    country = validate_country(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_cities_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_cities_query(country_code=country)
+        result = execute_cached_query_for_country('cities', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_cities: {e}")
         output = {
@@ -206,19 +316,22 @@ def get_cities():
 
 
 @enhanced_bp.route('/<country>/cities', methods=('GET',))
+@cache_manager.conditional_response
 def get_cities_by_country(country):
     """Ottieni città per paese specifico"""
-    country = validate_country_and_connection(country)
+    country = validate_country(country)
     
     try:
-        query = sql_queries.get_cities_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_cities_query(country_code=country)
+        result = execute_cached_query_for_country('cities', query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_cities_by_country: {e}")
         output = {
@@ -237,6 +350,11 @@ def search_doctors_advanced():
     """Ricerca avanzata dottori"""
     request_data = util.process_request(request)
     country = validate_country_and_connection(request_data.get('country', 'IT'))
+    cursor = util.decode_cursor(request_data.get('cursor'))
+    order = get_search_order(request_data, cursor)
+    ndjson = wants_ndjson(request_data)
+    # Items costruiti da Postgres e inviati così come sono
+    json_items = not ndjson and json_provider.sql_items_enabled()
     
     try:
         # Estrai parametri di ricerca
@@ -249,6 +367,7 @@ def search_doctors_advanced():
         allow_questions = request_data.get('allow_questions')
         enriched_only = request_data.get('enriched_only')
         limit = request_data.get('limit')
+        offset = request_data.get('offset')
         
         # Converti parametri boolean
         if has_slots is not None:
@@ -262,8 +381,13 @@ def search_doctors_advanced():
             min_rate = int(min_rate)
         if max_rate is not None:
             max_rate = int(max_rate)
+        # Limit e offset contano i dottori, non le righe della join
+        if limit is not None:
+            limit = int(limit)
+        if offset is not None:
+            offset = int(offset)
         
-        query = sql_queries.search_doctors_advanced_query(
+        query, params = sql_queries.search_doctors_advanced_query(
             search_term=search_term,
             city=city,
             profession=profession,
@@ -271,23 +395,43 @@ def search_doctors_advanced():
             max_rate=max_rate,
             has_slots=has_slots,
             allow_questions=allow_questions,
-            limit=limit,
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
             enriched_only=enriched_only,
-            country_code=country
+            country_code=country,
+            offset=offset,
+            cursor=cursor,
+            order=order,
+            json_items=json_items
         )
         
-        raw_data = execute_query_for_country(query, country)
-        
-        # Trasforma i dati nella struttura API usando il worker esistente
-        if raw_data:
+        if ndjson:
             med_worker = worker.Doctors({}, country_code=country)
-            transformed_data = med_worker._transform_to_api_structure(raw_data)
+            return ndjson_search_response(query, params, country,
+                                          lambda row: med_worker._transform_to_api_structure([row])[0],
+                                          limit, {"country": country, "order": order, "offset": offset or 0})
+
+        raw_data = execute_query_for_country(query, country, params)
+        
+        if json_items:
+            # Una riga per dottore con il testo JSON dell'item
+            rows, next_cursor = util.paginate(raw_data, limit)
+            transformed_data = [row['item'] for row in rows]
         else:
-            transformed_data = []
+            # Trasforma i dati nella struttura API usando il worker esistente
+            if raw_data:
+                med_worker = worker.Doctors({}, country_code=country)
+                transformed_data = med_worker._transform_to_api_structure(raw_data)
+            else:
+                transformed_data = []
+            transformed_data, next_cursor = util.paginate(transformed_data, limit, key=doctor_item_cursor_key)
+        if order != 'rate':
+            next_cursor = None  # Il cursore segue l'ordine (rate, doctor_id)
         
         output = {
             "items": transformed_data,
             "country": country,
+            "order": order,
             "filters": {
                 "search_term": search_term,
                 "city": city,
@@ -297,6 +441,9 @@ def search_doctors_advanced():
                 "has_slots": has_slots,
                 "allow_questions": allow_questions
             },
+            "limit": limit,
+            "offset": offset or 0,
+            "next_cursor": next_cursor,
             "total": len(transformed_data)
         }
     except Exception as e:
@@ -307,6 +454,8 @@ def search_doctors_advanced():
             "items": []
         }
     
+    if json_items and "error" not in output:
+        return current_app.json.raw_items_response(output.pop("items"), **output)
     return jsonify(output)
 
 
@@ -315,6 +464,11 @@ def search_doctors_advanced_by_country(country):
     """Ricerca avanzata dottori per paese"""
     country = validate_country_and_connection(country)
     request_data = util.process_request(request)
+    cursor = util.decode_cursor(request_data.get('cursor'))
+    order = get_search_order(request_data, cursor)
+    ndjson = wants_ndjson(request_data)
+    # Items costruiti da Postgres e inviati così come sono
+    json_items = not ndjson and json_provider.sql_items_enabled()
     
     try:
         # Estrai parametri di ricerca
@@ -327,6 +481,7 @@ def search_doctors_advanced_by_country(country):
         allow_questions = request_data.get('allow_questions')
         enriched_only = request_data.get('enriched_only')
         limit = request_data.get('limit')
+        offset = request_data.get('offset')
         
         # Converti parametri boolean
         if has_slots is not None:
@@ -339,8 +494,13 @@ def search_doctors_advanced_by_country(country):
             min_rate = int(min_rate)
         if max_rate is not None:
             max_rate = int(max_rate)
+        # Limit e offset contano i dottori, non le righe della join
+        if limit is not None:
+            limit = int(limit)
+        if offset is not None:
+            offset = int(offset)
         
-        query = sql_queries.search_doctors_advanced_query(
+        query, params = sql_queries.search_doctors_advanced_query(
             search_term=search_term,
             city=city,
             profession=profession,
@@ -348,23 +508,43 @@ def search_doctors_advanced_by_country(country):
             max_rate=max_rate,
             has_slots=has_slots,
             allow_questions=allow_questions,
-            limit=limit,
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
             enriched_only=enriched_only,
-            country_code=country
+            country_code=country,
+            offset=offset,
+            cursor=cursor,
+            order=order,
+            json_items=json_items
         )
         
-        raw_data = execute_query_for_country(query, country)
-        
-        # Trasforma i dati nella struttura API
-        if raw_data:
+        if ndjson:
             med_worker = worker.Doctors({}, country_code=country)
-            transformed_data = med_worker._transform_to_api_structure(raw_data)
+            return ndjson_search_response(query, params, country,
+                                          lambda row: med_worker._transform_to_api_structure([row])[0],
+                                          limit, {"country": country, "order": order, "offset": offset or 0})
+
+        raw_data = execute_query_for_country(query, country, params)
+        
+        if json_items:
+            # Una riga per dottore con il testo JSON dell'item
+            rows, next_cursor = util.paginate(raw_data, limit)
+            transformed_data = [row['item'] for row in rows]
         else:
-            transformed_data = []
+            # Trasforma i dati nella struttura API
+            if raw_data:
+                med_worker = worker.Doctors({}, country_code=country)
+                transformed_data = med_worker._transform_to_api_structure(raw_data)
+            else:
+                transformed_data = []
+            transformed_data, next_cursor = util.paginate(transformed_data, limit, key=doctor_item_cursor_key)
+        if order != 'rate':
+            next_cursor = None  # Il cursore segue l'ordine (rate, doctor_id)
         
         output = {
             "items": transformed_data,
             "country": country,
+            "order": order,
             "filters": {
                 "search_term": search_term,
                 "city": city,
@@ -374,6 +554,9 @@ def search_doctors_advanced_by_country(country):
                 "has_slots": has_slots,
                 "allow_questions": allow_questions
             },
+            "limit": limit,
+            "offset": offset or 0,
+            "next_cursor": next_cursor,
             "total": len(transformed_data)
         }
     except Exception as e:
@@ -384,6 +567,8 @@ def search_doctors_advanced_by_country(country):
             "items": []
         }
     
+    if json_items and "error" not in output:
+        return current_app.json.raw_items_response(output.pop("items"), **output)
     return jsonify(output)
 
 
@@ -394,17 +579,23 @@ def get_top_rated_doctors():
     country = validate_country_and_connection(request_data.get('country', 'IT'))
     limit = int(request_data.get('limit', 20))
     min_rate = int(request_data.get('min_rate', 4))
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
-        query = sql_queries.get_top_rated_doctors_query(limit=limit, min_rate=min_rate, country_code=country)
-        result = execute_query_for_country(query, country)
+        # Un dottore in più per sapere se esiste una pagina successiva
+        query, params = sql_queries.get_top_rated_doctors_query(
+            limit=limit + 1, min_rate=min_rate, country_code=country, cursor=cursor
+        )
+        result = execute_query_for_country(query, country, params)
+        result, next_cursor = util.paginate(result, limit)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
             "limit": limit,
             "min_rate": min_rate,
-            "total": len(result) if result else 0
+            "next_cursor": next_cursor,
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_top_rated_doctors: {e}")
@@ -426,17 +617,23 @@ def get_top_rated_doctors_by_country(country):
     request_data = util.process_request(request)
     limit = int(request_data.get('limit', 20))
     min_rate = int(request_data.get('min_rate', 4))
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
-        query = sql_queries.get_top_rated_doctors_query(limit=limit, min_rate=min_rate, country_code=country)
-        result = execute_query_for_country(query, country)
+        # Un dottore in più per sapere se esiste una pagina successiva
+        query, params = sql_queries.get_top_rated_doctors_query(
+            limit=limit + 1, min_rate=min_rate, country_code=country, cursor=cursor
+        )
+        result = execute_query_for_country(query, country, params)
+        result, next_cursor = util.paginate(result, limit)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "country": country,
             "limit": limit,
             "min_rate": min_rate,
-            "total": len(result) if result else 0
+            "next_cursor": next_cursor,
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_top_rated_doctors_by_country: {e}")
@@ -456,18 +653,25 @@ def get_doctors_with_slots():
     """Ottieni dottori con slot disponibili"""
     request_data = util.process_request(request)
     country = validate_country_and_connection(request_data.get('country', 'IT'))
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
         city = request_data.get('city')
         profession = request_data.get('profession')
+        limit = request_data.get('limit')
+        if limit is not None:
+            limit = int(limit)
         
-        query = sql_queries.get_doctors_with_slots_query(
+        query, params = sql_queries.get_doctors_with_slots_query(
             city=city,
             profession=profession,
-            country_code=country
+            country_code=country,
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
+            cursor=cursor
         )
         
-        raw_data = execute_query_for_country(query, country)
+        raw_data = execute_query_for_country(query, country, params)
         
         # Trasforma i dati nella struttura API
         if raw_data:
@@ -475,6 +679,7 @@ def get_doctors_with_slots():
             transformed_data = med_worker._transform_to_api_structure(raw_data)
         else:
             transformed_data = []
+        transformed_data, next_cursor = util.paginate(transformed_data, limit, key=doctor_item_cursor_key)
         
         output = {
             "items": transformed_data,
@@ -483,6 +688,8 @@ def get_doctors_with_slots():
                 "city": city,
                 "profession": profession
             },
+            "limit": limit,
+            "next_cursor": next_cursor,
             "total": len(transformed_data)
         }
     except Exception as e:
@@ -501,18 +708,25 @@ def get_doctors_with_slots_by_country(country):
     """Ottieni dottori con slot per paese"""
     country = validate_country_and_connection(country)
     request_data = util.process_request(request)
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
         city = request_data.get('city')
         profession = request_data.get('profession')
+        limit = request_data.get('limit')
+        if limit is not None:
+            limit = int(limit)
         
-        query = sql_queries.get_doctors_with_slots_query(
+        query, params = sql_queries.get_doctors_with_slots_query(
             city=city,
             profession=profession,
-            country_code=country
+            country_code=country,
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
+            cursor=cursor
         )
         
-        raw_data = execute_query_for_country(query, country)
+        raw_data = execute_query_for_country(query, country, params)
         
         # Trasforma i dati nella struttura API
         if raw_data:
@@ -520,6 +734,7 @@ def get_doctors_with_slots_by_country(country):
             transformed_data = med_worker._transform_to_api_structure(raw_data)
         else:
             transformed_data = []
+        transformed_data, next_cursor = util.paginate(transformed_data, limit, key=doctor_item_cursor_key)
         
         output = {
             "items": transformed_data,
@@ -528,6 +743,8 @@ def get_doctors_with_slots_by_country(country):
                 "city": city,
                 "profession": profession
             },
+            "limit": limit,
+            "next_cursor": next_cursor,
             "total": len(transformed_data)
         }
     except Exception as e:
@@ -550,14 +767,14 @@ def get_doctor_opinions(doctor_id):
     country = validate_country_and_connection(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_doctor_opinions_query(doctor_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_doctor_opinions_query(doctor_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "doctor_id": doctor_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_doctor_opinions: {e}")
@@ -577,14 +794,14 @@ def get_doctor_opinions_by_country(country, doctor_id):
     country = validate_country_and_connection(country)
     
     try:
-        query = sql_queries.get_doctor_opinions_query(doctor_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_doctor_opinions_query(doctor_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "doctor_id": doctor_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_doctor_opinions_by_country: {e}")
@@ -605,11 +822,11 @@ def get_doctor_opinion_stats(doctor_id):
     country = validate_country_and_connection(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "data": result if result else {},
+            "data": result.first() or {},
             "doctor_id": doctor_id,
             "country": country
         }
@@ -631,11 +848,11 @@ def get_doctor_opinion_stats_by_country(country, doctor_id):
     country = validate_country_and_connection(country)
     
     try:
-        query = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_doctor_opinion_stats_query(doctor_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "data": result if result else {},
+            "data": result.first() or {},
             "doctor_id": doctor_id,
             "country": country
         }
@@ -660,14 +877,14 @@ def get_clinic_telephones(clinic_id):
     country = validate_country_and_connection(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_clinic_telephones_query(clinic_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_clinic_telephones_query(clinic_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "clinic_id": clinic_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_clinic_telephones: {e}")
@@ -687,14 +904,14 @@ def get_clinic_telephones_by_country(country, clinic_id):
     country = validate_country_and_connection(country)
     
     try:
-        query = sql_queries.get_clinic_telephones_query(clinic_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_clinic_telephones_query(clinic_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "clinic_id": clinic_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_clinic_telephones_by_country: {e}")
@@ -715,14 +932,14 @@ def get_clinic_services(clinic_id):
     country = validate_country_and_connection(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_clinic_services_query(clinic_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_clinic_services_query(clinic_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "clinic_id": clinic_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_clinic_services: {e}")
@@ -742,14 +959,14 @@ def get_clinic_services_by_country(country, clinic_id):
     country = validate_country_and_connection(country)
     
     try:
-        query = sql_queries.get_clinic_services_query(clinic_id, country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_clinic_services_query(clinic_id, country_code=country)
+        result = execute_query_for_country(query, country, params)
         
         output = {
-            "items": result if result else [],
+            "items": result,
             "clinic_id": clinic_id,
             "country": country,
-            "total": len(result) if result else 0
+            "total": len(result)
         }
     except Exception as e:
         loggerManager.logger.error(f"Error in get_clinic_services_by_country: {e}")
@@ -766,14 +983,15 @@ def get_clinic_services_by_country(country, clinic_id):
 # ====================== STATISTICS ENDPOINTS ======================
 
 @enhanced_bp.route('/stats', methods=('GET',))
+@cache_manager.conditional_response
 def get_database_stats():
     """Ottieni statistiche database"""
     request_data = util.process_request(request)
-    country = validate_country_and_connection(request_data.get('country', 'IT'))
+    country = validate_country(request_data.get('country', 'IT'))
     
     try:
-        query = sql_queries.get_database_stats_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_database_stats_query(country_code=country)
+        result = execute_cached_query_for_country('stats', query, country, params)
         
         # Trasforma array di stats in dizionario
         stats_dict = {}
@@ -784,8 +1002,10 @@ def get_database_stats():
         output = {
             "stats": stats_dict,
             "country": country,
-            "raw_data": result if result else []
+            "raw_data": result
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_database_stats: {e}")
         output = {
@@ -799,13 +1019,14 @@ def get_database_stats():
 
 
 @enhanced_bp.route('/<country>/stats', methods=('GET',))
+@cache_manager.conditional_response
 def get_database_stats_by_country(country):
     """Ottieni statistiche per paese"""
-    country = validate_country_and_connection(country)
+    country = validate_country(country)
     
     try:
-        query = sql_queries.get_database_stats_query(country_code=country)
-        result = execute_query_for_country(query, country)
+        query, params = sql_queries.get_database_stats_query(country_code=country)
+        result = execute_cached_query_for_country('stats', query, country, params)
         
         # Trasforma array di stats in dizionario
         stats_dict = {}
@@ -816,8 +1037,10 @@ def get_database_stats_by_country(country):
         output = {
             "stats": stats_dict,
             "country": country,
-            "raw_data": result if result else []
+            "raw_data": result
         }
+    except error_handlers.InvalidAPIUsage:
+        raise
     except Exception as e:
         loggerManager.logger.error(f"Error in get_database_stats_by_country: {e}")
         output = {
@@ -846,7 +1069,13 @@ def api_info():
                 "by_country": "/<country>/doctors",
                 "search": "/doctors/search",
                 "top_rated": "/doctors/top-rated",
-                "available": "/doctors/available"
+                "available": "/doctors/available",
+                "complete": "/doctors/<doctor_id>/complete?country=<DE|IT>",
+                "complete_batch": "POST /doctors/complete/batch {\"doctor_ids\": [...], \"country\": \"<DE|IT>\"}"
+            },
+            "google_places": {
+                "batch": "POST /google-places/batch {\"places\": [...], \"country\": \"<DE|IT>\"}",
+                "batch_by_country": "POST /<country>/google-places/batch {\"places\": [...]}"
             },
             "specializations": {
                 "all": "/specializations?country=<DE|IT>",
@@ -882,10 +1111,13 @@ def api_info():
             "doctors": ["id", "city", "profession", "search_term", "min_rate", "max_rate", "has_slots", "allow_questions"],
             "specializations": ["limit"],
             "cities": [],
-            "top_rated": ["limit", "min_rate"],
-            "available": ["city", "profession"],
-            "advanced_search": ["search_term", "city", "profession", "min_rate", "max_rate", "has_slots", "allow_questions"]
+            "top_rated": ["limit", "min_rate", "cursor"],
+            "available": ["city", "profession", "limit", "cursor"],
+            "advanced_search": ["search_term", "city", "profession", "min_rate", "max_rate", "has_slots", "allow_questions", "limit", "offset", "cursor", "order"]
         },
+        "pagination": "Paginated endpoints return next_cursor: pass it back as cursor to get the next page, null on the last page",
+        "streaming": "Search and unenriched endpoints return NDJSON (one item per line, then a summary line) with format=ndjson or Accept: application/x-ndjson",
+        "compression": "Responses of at least COMPRESSION_MIN_SIZE bytes (1 KiB by default) are compressed with gzip or br (Accept-Encoding), NDJSON streams are not",
         "examples": {
             "basic_doctors": "/doctors?country=IT&city=Roma",
             "advanced_search": "/doctors/search?country=DE&search_term=Schmidt&min_rate=4",
@@ -1376,6 +1608,7 @@ def get_unenriched_doctors():
     """Ottieni dottori non ancora arricchiti"""
     request_data = util.process_request(request)
     country = validate_country_and_connection(request_data.get('country', 'IT'))
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
         limit = request_data.get('limit')
@@ -1384,21 +1617,34 @@ def get_unenriched_doctors():
         if limit:
             limit = int(limit)
         
-        # Recupera usando il worker
+        # Recupera usando il worker (un dottore in più per sapere se esiste una pagina successiva)
         med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        if wants_ndjson(request_data):
+            # Export: righe lette a gruppi con un cursore lato server, una riga NDJSON per clinica
+            rows = med_worker.iter_unenriched_doctors(
+                limit=limit + 1 if limit else None,
+                exclude_failed=exclude_failed,
+                cursor=cursor
+            )
+            return ndjson_rows_response(rows, country, dict, limit or None,
+                                        {"country": country, "filters": {"limit": limit, "exclude_failed": exclude_failed}},
+                                        first_row_only=False)
         med_worker.get_unenriched_doctors(
-            limit=limit,
-            exclude_failed=exclude_failed
+            limit=limit + 1 if limit else None,
+            exclude_failed=exclude_failed,
+            cursor=cursor
         )
+        items, next_cursor = util.paginate(med_worker.result_data or [], limit or None)
         
         output = {
-            "items": med_worker.result_data if med_worker.result_data else [],
+            "items": items,
             "country": country,
             "filters": {
                 "limit": limit,
                 "exclude_failed": exclude_failed
             },
-            "total": len(med_worker.result_data) if med_worker.result_data else 0,
+            "next_cursor": next_cursor,
+            "total": len(items),
             "message": "Dottori che non sono mai stati arricchiti o con tentativi falliti"
         }
         
@@ -1418,6 +1664,7 @@ def get_unenriched_doctors_by_country(country):
     """Ottieni dottori non arricchiti per paese specifico"""
     country = validate_country_and_connection(country)
     request_data = util.process_request(request)
+    cursor = util.decode_cursor(request_data.get('cursor'))
     
     try:
         limit = request_data.get('limit')
@@ -1426,21 +1673,34 @@ def get_unenriched_doctors_by_country(country):
         if limit:
             limit = int(limit)
         
-        # Recupera usando il worker
+        # Recupera usando il worker (un dottore in più per sapere se esiste una pagina successiva)
         med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        if wants_ndjson(request_data):
+            # Export: righe lette a gruppi con un cursore lato server, una riga NDJSON per clinica
+            rows = med_worker.iter_unenriched_doctors(
+                limit=limit + 1 if limit else None,
+                exclude_failed=exclude_failed,
+                cursor=cursor
+            )
+            return ndjson_rows_response(rows, country, dict, limit or None,
+                                        {"country": country, "filters": {"limit": limit, "exclude_failed": exclude_failed}},
+                                        first_row_only=False)
         med_worker.get_unenriched_doctors(
-            limit=limit,
-            exclude_failed=exclude_failed
+            limit=limit + 1 if limit else None,
+            exclude_failed=exclude_failed,
+            cursor=cursor
         )
+        items, next_cursor = util.paginate(med_worker.result_data or [], limit or None)
         
         output = {
-            "items": med_worker.result_data if med_worker.result_data else [],
+            "items": items,
             "country": country,
             "filters": {
                 "limit": limit,
                 "exclude_failed": exclude_failed
             },
-            "total": len(med_worker.result_data) if med_worker.result_data else 0,
+            "next_cursor": next_cursor,
+            "total": len(items),
             "message": "Dottori che non sono mai stati arricchiti o con tentativi falliti"
         }
         
@@ -1470,38 +1730,11 @@ def save_batch_enrichment_attempts():
         if not attempts or not isinstance(attempts, list):
             raise error_handlers.InvalidAPIUsage(message="attempts must be a non-empty list", status_code=400)
         
-        results = []
-        successful = 0
-        failed = 0
-        
-        # Processa ogni tentativo
-        for attempt_data in attempts:
-            try:
-                med_worker = worker.EnhancedMedicalWorker(country_code=country)
-                med_worker.save_enrichment_attempt(attempt_data)
-                
-                if med_worker.operation_successful:
-                    successful += 1
-                    results.append({
-                        "doctor_id": attempt_data.get('doctor_id'),
-                        "status": "saved",
-                        "data": med_worker.result_data
-                    })
-                else:
-                    failed += 1
-                    results.append({
-                        "doctor_id": attempt_data.get('doctor_id'),
-                        "status": "failed",
-                        "error": med_worker.result_data
-                    })
-                    
-            except Exception as e:
-                failed += 1
-                results.append({
-                    "doctor_id": attempt_data.get('doctor_id'),
-                    "status": "error",
-                    "error": str(e)
-                })
+        # Tutti i tentativi con INSERT multi-riga in una transazione, esito per tentativo
+        med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        results = med_worker.save_enrichment_attempts(attempts).result_data
+        successful = sum(1 for result in results if result['status'] == 'saved')
+        failed = len(results) - successful
         
         output = {
             "success": True,
@@ -1547,38 +1780,11 @@ def save_batch_enrichment_attempts_by_country(country):
         if not attempts or not isinstance(attempts, list):
             raise error_handlers.InvalidAPIUsage(message="attempts must be a non-empty list", status_code=400)
         
-        results = []
-        successful = 0
-        failed = 0
-        
-        # Processa ogni tentativo
-        for attempt_data in attempts:
-            try:
-                med_worker = worker.EnhancedMedicalWorker(country_code=country)
-                med_worker.save_enrichment_attempt(attempt_data)
-                
-                if med_worker.operation_successful:
-                    successful += 1
-                    results.append({
-                        "doctor_id": attempt_data.get('doctor_id'),
-                        "status": "saved",
-                        "data": med_worker.result_data
-                    })
-                else:
-                    failed += 1
-                    results.append({
-                        "doctor_id": attempt_data.get('doctor_id'),
-                        "status": "failed",
-                        "error": med_worker.result_data
-                    })
-                    
-            except Exception as e:
-                failed += 1
-                results.append({
-                    "doctor_id": attempt_data.get('doctor_id'),
-                    "status": "error",
-                    "error": str(e)
-                })
+        # Tutti i tentativi con INSERT multi-riga in una transazione, esito per tentativo
+        med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        results = med_worker.save_enrichment_attempts(attempts).result_data
+        successful = sum(1 for result in results if result['status'] == 'saved')
+        failed = len(results) - successful
         
         output = {
             "success": True,
@@ -1608,7 +1814,74 @@ def save_batch_enrichment_attempts_by_country(country):
     return jsonify(output), status_code
        
 
+def google_places_batch_response(data, country):
+    """
+    Risposta del batch di Google Places: tentativi e Google Places di tutti i dottori scritti con INSERT multi-riga
+    in una transazione, esito per dottore con le chiavi di save_google_place_data_with_attempt
+    """
+    places = data.get('places', [])
+    if not places or not isinstance(places, list):
+        raise error_handlers.InvalidAPIUsage(message="places must be a non-empty list", status_code=400)
+
+    try:
+        med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        results = med_worker.save_google_places_batch(places).result_data
+        attempts_saved = sum(1 for result in results if result['attempt_saved'])
+        google_places_saved = sum(1 for result in results if result['google_place_saved'])
+
+        output = {
+            "success": True,
+            "message": "Batch Google Places processed",
+            "summary": {
+                "total": len(places),
+                "attempts_saved": attempts_saved,
+                "google_places_saved": google_places_saved,
+                "failed": len(places) - attempts_saved,
+                "success_rate": round((attempts_saved / len(places)) * 100, 2)
+            },
+            "results": results,
+            "country": country
+        }
+        status_code = 200 if attempts_saved > 0 else 400
+
+    except Exception as e:
+        loggerManager.logger.error(f"Error in google_places_batch_response: {e}")
+        output = {
+            "success": False,
+            "message": "Error processing batch Google Places",
+            "error": str(e),
+            "country": country
+        }
+        status_code = 500
+
+    return jsonify(output), status_code
+
+
+@enhanced_bp.route('/google-places/batch', methods=('POST',))
+def save_google_places_batch():
+    """Salva in batch dati Google Places e tentativi di arricchimento di molti dottori"""
+    if not request.is_json:
+        raise error_handlers.InvalidAPIUsage(message="Content-Type must be application/json", status_code=400)
+
+    data = request.json
+    country = validate_country_and_connection(data.get('country', 'IT'))
+
+    return google_places_batch_response(data, country)
+
+
+@enhanced_bp.route('/<country>/google-places/batch', methods=('POST',))
+def save_google_places_batch_by_country(country):
+    """Salva in batch dati Google Places e tentativi per paese specifico"""
+    country = validate_country_and_connection(country)
+
+    if not request.is_json:
+        raise error_handlers.InvalidAPIUsage(message="Content-Type must be application/json", status_code=400)
+
+    return google_places_batch_response(request.json, country)
+
+
 @enhanced_bp.route('/doctors/<int:doctor_id>/complete', methods=('GET',))
+@cache_manager.conditional_response
 def get_complete_doctor_profile(doctor_id):
     """Ottieni profilo completo di un dottore con TUTTI i dati disponibili"""
     request_data = util.process_request(request)
@@ -1653,6 +1926,7 @@ def get_complete_doctor_profile(doctor_id):
 
 
 @enhanced_bp.route('/<country>/doctors/<int:doctor_id>/complete', methods=('GET',))
+@cache_manager.conditional_response
 def get_complete_doctor_profile_by_country(country, doctor_id):
     """Ottieni profilo completo di un dottore per paese specifico"""
     country = validate_country_and_connection(country)
@@ -1696,11 +1970,119 @@ def get_complete_doctor_profile_by_country(country, doctor_id):
 
 
 
+def get_batch_doctor_ids(data):
+    """Valida la lista doctor_ids di una richiesta batch: interi, senza duplicati, al massimo COMPLETE_PROFILE_BATCH_MAX"""
+    doctor_ids = data.get('doctor_ids', [])
+    if not doctor_ids or not isinstance(doctor_ids, list):
+        raise error_handlers.InvalidAPIUsage(message="doctor_ids must be a non-empty list", status_code=400)
+
+    try:
+        # Converti a interi mantenendo l'ordine della richiesta
+        doctor_ids = list(dict.fromkeys(int(doc_id) for doc_id in doctor_ids))
+    except (TypeError, ValueError):
+        raise error_handlers.InvalidAPIUsage(message="doctor_ids must contain only integers", status_code=400)
+
+    max_doctors = current_app.config.get('COMPLETE_PROFILE_BATCH_MAX', 200)
+    if len(doctor_ids) > max_doctors:
+        error_message = f"Too many doctor_ids: {len(doctor_ids)}, max {max_doctors} per request"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=400)
+
+    return doctor_ids
+
+
+def iter_complete_profiles(doctor_ids, country):
+    """
+    Profili completi di doctor_ids caricati a gruppi di COMPLETE_PROFILE_BATCH_CHUNK dottori
+    (una query per sezione per ogni gruppo)
+    :return: generatore di item {"doctor_id", "success", "profile"[, "message"]} nell'ordine di doctor_ids
+    """
+    chunk_size = max(current_app.config.get('COMPLETE_PROFILE_BATCH_CHUNK', 25), 1)
+    for start in range(0, len(doctor_ids), chunk_size):
+        chunk = doctor_ids[start:start + chunk_size]
+        med_worker = worker.EnhancedMedicalWorker(country_code=country)
+        med_worker.get_complete_doctor_profiles(chunk)
+
+        for doctor_id in chunk:
+            if not med_worker.operation_successful:
+                message = "Error retrieving complete doctor profile"
+                profile = None
+            else:
+                profile = med_worker.result_data.get(doctor_id)
+                message = None if profile else f"Doctor {doctor_id} not found or no data available"
+
+            item = {"doctor_id": doctor_id, "success": profile is not None, "profile": profile}
+            if message:
+                item["message"] = message
+            yield item
+
+
+def complete_profiles_batch_response(doctor_ids, country):
+    """
+    Risposta del batch di profili completi. Fino a COMPLETE_PROFILE_BATCH_CHUNK dottori il JSON è costruito
+    in memoria, oltre è inviato in streaming un gruppo di dottori alla volta con la stessa struttura
+    """
+    chunk_size = max(current_app.config.get('COMPLETE_PROFILE_BATCH_CHUNK', 25), 1)
+    if len(doctor_ids) <= chunk_size:
+        items = list(iter_complete_profiles(doctor_ids, country))
+        output = {
+            "success": True,
+            "country": country,
+            "requested": len(doctor_ids),
+            "items": items,
+            "found": sum(1 for item in items if item["success"]),
+            "not_found": [item["doctor_id"] for item in items if not item["success"]]
+        }
+        return jsonify(output)
+
+    def generate():
+        dumps = current_app.json.dumps
+        found = 0
+        not_found = []
+        yield '{"success": true, "country": %s, "requested": %d, "items": [' % (dumps(country), len(doctor_ids))
+        for index, item in enumerate(iter_complete_profiles(doctor_ids, country)):
+            if item["success"]:
+                found += 1
+            else:
+                not_found.append(item["doctor_id"])
+            yield ("," if index else "") + dumps(item)
+        yield '], "found": %d, "not_found": %s}' % (found, dumps(not_found))
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+
+@enhanced_bp.route('/doctors/complete/batch', methods=('POST',))
+def get_complete_doctor_profiles_batch():
+    """Ottieni i profili completi di una lista di dottori (doctor_ids) con una query per sezione"""
+    if not request.is_json:
+        raise error_handlers.InvalidAPIUsage(message="Content-Type must be application/json", status_code=400)
+
+    data = request.json
+    country = validate_country_and_connection(data.get('country', 'IT'))
+    doctor_ids = get_batch_doctor_ids(data)
+
+    return complete_profiles_batch_response(doctor_ids, country)
+
+
+@enhanced_bp.route('/<country>/doctors/complete/batch', methods=('POST',))
+def get_complete_doctor_profiles_batch_by_country(country):
+    """Ottieni i profili completi di una lista di dottori per paese specifico"""
+    country = validate_country_and_connection(country)
+
+    if not request.is_json:
+        raise error_handlers.InvalidAPIUsage(message="Content-Type must be application/json", status_code=400)
+
+    doctor_ids = get_batch_doctor_ids(request.json)
+
+    return complete_profiles_batch_response(doctor_ids, country)
+
+
 @enhanced_bp.route('/doctors/search/lite', methods=('GET', 'POST'))
 def search_doctors_lite():
     """Ricerca LITE dottori - versione gratuita con informazioni ridotte"""
     request_data = util.process_request(request)
     country = validate_country_and_connection(request_data.get('country', 'IT'))
+    cursor = util.decode_cursor(request_data.get('cursor'))
+    order = get_search_order(request_data, cursor)
     
     try:
         # Estrai TUTTI i parametri come nella versione premium
@@ -1729,7 +2111,7 @@ def search_doctors_lite():
             limit = min(int(limit), 1000)  # Massimo 50 risultati per versione gratuita
         
         # Usa query lite con TUTTI i parametri
-        query = sql_queries.search_doctors_lite_query(
+        query, params = sql_queries.search_doctors_lite_query(
             search_term=search_term,
             city=city,
             profession=profession,
@@ -1738,49 +2120,55 @@ def search_doctors_lite():
             has_slots=has_slots,
             allow_questions=allow_questions,
             enriched_only=enriched_only,  # AGGIUNTO
-            limit=limit,
-            country_code=country
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
+            country_code=country,
+            cursor=cursor,
+            order=order
         )
         
-        result = execute_query_for_country(query, country)
+        def to_lite_item(doctor):
+            return {
+                'doctor_id': doctor['doctor_id'],
+                'full_name': doctor['full_name'],
+                'rate': doctor['rate'],
+                'has_slots': doctor['has_slots'],
+                'allow_questions': doctor['allow_questions'],
+                'primary_city': doctor.get('primary_city'),
+                'primary_specialization': doctor.get('primary_specialization'),
+                # Informazioni arricchimento (cruciali per upselling)
+                'enrichment_status': doctor['enrichment_status'],
+                'has_google_data': doctor['has_google_data'],
+                'google_rating': doctor.get('google_rating'),
+                'google_reviews_count': doctor.get('google_reviews_count'),
+                'onlyne_payment': doctor.get('onlyne_payment'),
+                'street': doctor.get('street'),
+                'city_name': doctor.get('city_name'),
+                'clinic_name': doctor.get('clinic_name'),
+                'latitude': doctor.get('latitude'),
+                'longitude': doctor.get('longitude'),
+                'clinics': doctor.get('clinics'),
+                # Flag per upgrade
+                'upgrade_available': doctor['has_google_data'],  # Se ha dati Google, upgrade disponibile
+            }
+
+        if wants_ndjson(request_data):
+            return ndjson_search_response(query, params, country, to_lite_item, limit,
+                                          {"country": country, "version": "lite", "order": order})
+
+        result = execute_query_for_country(query, country, params)
         
         # Trasforma i risultati in formato lite
-        lite_results = []
-        if result:
-            if isinstance(result, dict):
-                result = [result]
-            
-            for doctor in result:
-               
-                lite_doctor = {
-                    'doctor_id': doctor['doctor_id'],
-                    'full_name': doctor['full_name'],
-                    'rate': doctor['rate'],
-                    'has_slots': doctor['has_slots'],
-                    'allow_questions': doctor['allow_questions'],
-                    'primary_city': doctor.get('primary_city'),
-                    'primary_specialization': doctor.get('primary_specialization'),
-                    # Informazioni arricchimento (cruciali per upselling)
-                    'enrichment_status': doctor['enrichment_status'],
-                    'has_google_data': doctor['has_google_data'],
-                    'google_rating': doctor.get('google_rating'),
-                    'google_reviews_count': doctor.get('google_reviews_count'),
-                    'onlyne_payment': doctor.get('onlyne_payment'),
-                    'street': doctor.get('street'),
-                    'city_name': doctor.get('city_name'),
-                    'clinic_name': doctor.get('clinic_name'),
-                    'latitude': doctor.get('latitude'),
-                    'longitude': doctor.get('longitude'),
-                    'clinics': doctor.get('clinics'),
-                    # Flag per upgrade
-                    'upgrade_available': doctor['has_google_data'],  # Se ha dati Google, upgrade disponibile
-                }
-                lite_results.append(lite_doctor)
+        lite_results = [to_lite_item(doctor) for doctor in result]
+        lite_results, next_cursor = util.paginate(lite_results, limit)
+        if order != 'rate':
+            next_cursor = None  # Il cursore segue l'ordine (rate, doctor_id)
         
         output = {
             "items": lite_results,
             "country": country,
             "version": "lite",
+            "order": order,
             "filters": {
                 "search_term": search_term,
                 "city": city,
@@ -1793,6 +2181,7 @@ def search_doctors_lite():
             },
             "total": len(lite_results),
             "limit": limit,
+            "next_cursor": next_cursor,
             "upgrade_info": {
                 "message": "For complete doctor profiles with clinics, services, and detailed information, upgrade to premium API",
                 "premium_endpoint": "/doctors/search",
@@ -1823,6 +2212,8 @@ def search_doctors_lite_by_country(country):
     """Ricerca LITE dottori per paese specifico - versione gratuita"""
     country = validate_country_and_connection(country)
     request_data = util.process_request(request)
+    cursor = util.decode_cursor(request_data.get('cursor'))
+    order = get_search_order(request_data, cursor)
     
     try:
         # Estrai TUTTI i parametri come nella versione premium
@@ -1851,7 +2242,7 @@ def search_doctors_lite_by_country(country):
             limit = min(int(limit), 1000)  # Massimo 1000 risultati per versione gratuita
         
         # Usa query lite con TUTTI i parametri
-        query = sql_queries.search_doctors_lite_query(
+        query, params = sql_queries.search_doctors_lite_query(
             search_term=search_term,
             city=city,
             profession=profession,
@@ -1860,39 +2251,46 @@ def search_doctors_lite_by_country(country):
             has_slots=has_slots,
             allow_questions=allow_questions,
             enriched_only=enriched_only,  # AGGIUNTO
-            limit=limit,
-            country_code=country
+            # Un dottore in più per sapere se esiste una pagina successiva
+            limit=limit + 1 if limit is not None else None,
+            country_code=country,
+            cursor=cursor,
+            order=order
         )
         
-        result = execute_query_for_country(query, country)
+        def to_lite_item(doctor):
+            return {
+                'doctor_id': doctor['doctor_id'],
+                'full_name': doctor['full_name'],
+                'rate': doctor['rate'],
+                'has_slots': doctor['has_slots'],
+                'allow_questions': doctor['allow_questions'],
+                'primary_city': doctor.get('primary_city'),
+                'primary_specialization': doctor.get('primary_specialization'),
+                'enrichment_status': doctor['enrichment_status'],
+                'has_google_data': doctor['has_google_data'],
+                'google_rating': doctor.get('google_rating'),
+                'google_reviews_count': doctor.get('google_reviews_count'),
+                'upgrade_available': doctor['has_google_data']
+            }
+
+        if wants_ndjson(request_data):
+            return ndjson_search_response(query, params, country, to_lite_item, limit,
+                                          {"country": country, "version": "lite", "order": order})
+
+        result = execute_query_for_country(query, country, params)
         
         # Trasforma i risultati in formato lite
-        lite_results = []
-        if result:
-            if isinstance(result, dict):
-                result = [result]
-            
-            for doctor in result:
-                lite_doctor = {
-                    'doctor_id': doctor['doctor_id'],
-                    'full_name': doctor['full_name'],
-                    'rate': doctor['rate'],
-                    'has_slots': doctor['has_slots'],
-                    'allow_questions': doctor['allow_questions'],
-                    'primary_city': doctor.get('primary_city'),
-                    'primary_specialization': doctor.get('primary_specialization'),
-                    'enrichment_status': doctor['enrichment_status'],
-                    'has_google_data': doctor['has_google_data'],
-                    'google_rating': doctor.get('google_rating'),
-                    'google_reviews_count': doctor.get('google_reviews_count'),
-                    'upgrade_available': doctor['has_google_data']
-                }
-                lite_results.append(lite_doctor)
+        lite_results = [to_lite_item(doctor) for doctor in result]
+        lite_results, next_cursor = util.paginate(lite_results, limit)
+        if order != 'rate':
+            next_cursor = None  # Il cursore segue l'ordine (rate, doctor_id)
         
         output = {
             "items": lite_results,
             "country": country,
             "version": "lite",
+            "order": order,
             "filters": {
                 "search_term": search_term,
                 "city": city,
@@ -1905,6 +2303,7 @@ def search_doctors_lite_by_country(country):
             },
             "total": len(lite_results),
             "limit": limit,
+            "next_cursor": next_cursor,
             "upgrade_info": {
                 "message": "Upgrade to premium for complete profiles with clinics, services, contact details",
                 "premium_endpoint": f"/{country}/doctors/search",
@@ -47,43 +47,9 @@ def print_info_after(response):
     return response
 
 
-@bp.before_app_request
-def connect_to_db():
-    """Connect to all country databases"""
-    loggerManager.logger.info("Connecting to databases")
-    
-    # Try to connect to all country databases
-    connections = database_manager.connect_all_country_dbs()
-    
-    # Store connections in Flask's g object
-    for country, conn_data in connections.items():
-        setattr(g, f'engine_{country}', conn_data['engine'])
-        setattr(g, f'conn_{country}', conn_data['conn'])
-        setattr(g, f'cursor_{country}', conn_data['cursor'])
-        loggerManager.logger.info(f"Connected to {country} database")
-    
-    # Set default connection (first available)
-    if connections:
-        first_country = list(connections.keys())[0]
-        g.engine = getattr(g, f'engine_{first_country}')
-        g.conn = getattr(g, f'conn_{first_country}')
-        g.cursor = getattr(g, f'cursor_{first_country}')
-        loggerManager.logger.info(f"Set default connection to: {first_country}")
-    else:
-        # No country databases available - this is OK, will handle in routes
-        loggerManager.logger.warning("No country databases configured or available")
-        g.engine = None
-        g.conn = None
-        g.cursor = None
-    
-    g.db_connected = bool(connections)
-
-
-@bp.after_app_request
-def close_db_if_open(response):
-    """Close all database connections"""
-    connected = g.get("db_connected")
-    if connected:
-        loggerManager.logger.info("Closing databases")
+@bp.teardown_app_request
+def close_db_if_open(exception=None):
+    """Give the database connections acquired by the request back to the pools"""
+    if g.get("db_connected"):
+        loggerManager.logger.info("Releasing databases")
         database_manager.close_all_db_connections()
-    return response
\ No newline at end of file
@@ -12,9 +12,12 @@
 
 from flask import Flask, request, Blueprint, session, g, flash, render_template, jsonify, current_app, abort, redirect, \
     url_for, make_response
-from api.lib import error_handlers, util, worker, loggerManager
+from api.lib import error_handlers, util, worker, database_manager, cache_manager, json_provider, compression, \
+    loggerManager
 
 bp = Blueprint("api", __name__)
+# gzip / br above COMPRESSION_MIN_SIZE bytes
+bp.after_request(compression.compress_response)
 
 
 @bp.errorhandler(error_handlers.InvalidAPIUsage)
@@ -22,6 +25,19 @@ def invalid_api_usage(ex):
     return jsonify(ex.to_dict()), ex.status_code
 
 
+def check_country_connection(country):
+    """Make sure the database of a country can be reached, raise 503 otherwise"""
+    if not database_manager.is_country_configured(country):
+        error_message = f"Database for country {country} not available"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
+    try:
+        database_manager.get_connection(country)
+    except Exception as e:
+        loggerManager.logger.error(f"Failed to connect to database for country {country}: {e}")
+        error_message = "Database not available"
+        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
+
+
 @bp.route('/', methods=('GET',))
 def index():
     """
@@ -40,6 +56,7 @@ def index():
 
 
 @bp.route('/doctors', methods=('GET', 'POST'))
+@cache_manager.conditional_response
 def doctors():
     """
     Get doctors with optional country parameter
@@ -57,25 +74,21 @@ def doctors():
         error_message = "Invalid country. Supported countries: DE, IT"
         raise error_handlers.InvalidAPIUsage(message=error_message, status_code=400)
     
-    # Check if we have database connections
-    if not g.get('db_connected', False):
-        error_message = "Database not available"
-        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
-    
-    # Check if specific country database is available
-    country_cursor_attr = f'cursor_{country.lower()}'
-    if not hasattr(g, country_cursor_attr):
-        error_message = f"Database for country {country} not available"
-        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
+    # Check if specific country database is available (the connection is acquired here, on first use)
+    check_country_connection(country)
     
     # Get doctors data
+    json_items = json_provider.sql_items_enabled()
     med_worker = worker.Doctors(request_data, country_code=country)
-    med_worker.get_doctors()
+    med_worker.get_doctors(json_items=json_items)
     
     if not med_worker.returned_doctors:
         loggerManager.logger.warning("Could not find doctors")
         
     # Return response in original API format
+    if json_items:
+        # Items already encoded by Postgres
+        return current_app.json.raw_items_response(med_worker.doctors_returned or [])
     output = {
         "items": med_worker.doctors_returned if med_worker.doctors_returned else []
     }
@@ -83,6 +96,7 @@ def doctors():
 
 
 @bp.route('/<country>/doctors', methods=('GET', 'POST'))
+@cache_manager.conditional_response
 def doctors_by_country(country):
     """
     Get doctors for specific country via URL path
@@ -95,29 +109,25 @@ def doctors_by_country(country):
         error_message = "Invalid country. Supported countries: DE, IT"
         raise error_handlers.InvalidAPIUsage(message=error_message, status_code=404)
     
-    # Check if we have database connections
-    if not g.get('db_connected', False):
-        error_message = "Database not available"
-        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
-    
-    # Check if specific country database is available
-    country_cursor_attr = f'cursor_{country.lower()}'
-    if not hasattr(g, country_cursor_attr):
-        error_message = f"Database for country {country} not available"
-        raise error_handlers.InvalidAPIUsage(message=error_message, status_code=503)
+    # Check if specific country database is available (the connection is acquired here, on first use)
+    check_country_connection(country)
     
     # Get request data
     request_data = util.process_request(request)
     request_data = dict(request_data)
     
     # Get doctors data
+    json_items = json_provider.sql_items_enabled()
     med_worker = worker.Doctors(request_data, country_code=country)
-    med_worker.get_doctors()
+    med_worker.get_doctors(json_items=json_items)
     
     if not med_worker.returned_doctors:
         loggerManager.logger.warning("Could not find doctors")
         
     # Return response in original API format
+    if json_items:
+        # Items already encoded by Postgres
+        return current_app.json.raw_items_response(med_worker.doctors_returned or [])
     output = {
         "items": med_worker.doctors_returned if med_worker.doctors_returned else []
     }
@@ -138,6 +148,7 @@ def doctors_italy():
 
 
 # Health check endpoints for each country
+# They do not touch the databases: configuration, pool and cache status of the current worker only
 @bp.route('/health', methods=('GET',))
 def health_check():
     """General health check"""
@@ -145,9 +156,12 @@ def health_check():
         output = {
             "status": "healthy",
             "countries": {
-                "DE": bool(hasattr(g, 'engine_de') and g.engine_de),
-                "IT": bool(hasattr(g, 'engine_it') and g.engine_it)
-            }
+                "DE": database_manager.is_country_configured('DE'),
+                "IT": database_manager.is_country_configured('IT')
+            },
+            "pools": database_manager.get_pools_status(),
+            "cache": cache_manager.get_status(),
+            "compression": compression.get_status()
         }
         return jsonify(output)
     except Exception as e:
@@ -162,14 +176,14 @@ def health_check_country(country):
         return jsonify({"status": "error", "message": "Invalid country"}), 404
     
     try:
-        engine_attr = f'engine_{country.lower()}'
-        is_connected = bool(hasattr(g, engine_attr) and getattr(g, engine_attr))
+        is_configured = database_manager.is_country_configured(country)
         
         output = {
-            "status": "healthy" if is_connected else "disconnected",
+            "status": "healthy" if is_configured else "disconnected",
             "country": country,
-            "database_connected": is_connected
+            "database_connected": is_configured,
+            "pool": database_manager.get_pools_status().get(country)
         }
         return jsonify(output)
     except Exception as e:
-        return jsonify({"status": "unhealthy", "country": country, "error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"status": "unhealthy", "country": country, "error": str(e)}), 500
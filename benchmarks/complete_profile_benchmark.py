@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Micro-benchmark of EnhancedMedicalWorker._organize_complete_doctor_data on synthetic profiles of
+                doctors attached to 10 up to 1000 clinics, against the previous clinic grouping (services and phone
+                numbers scanned once per clinic). The legacy column only groups the clinics, the current one runs the
+                whole organization of the profile, so the speedup is a lower bound.
+
+                No database is needed:
+
+                    python benchmarks/complete_profile_benchmark.py --sizes 10,100,1000 --services-per-clinic 10
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.lib import worker, loggerManager  # noqa: E402
+
+
+def build_sections(clinics, services_per_clinic, phones_per_clinic):
+    """Synthetic data_sections shaped like the rows of get_complete_doctor_profile_query"""
+    now = datetime.now()
+    sections = {
+        'doctor_base': [{
+            'internal_id': 1, 'doctor_id': 1, 'salutation': 'Dr.', 'given_name': 'Given', 'surname': 'Surname',
+            'full_name': 'Dr. Given Surname', 'gender': 'f', 'rate': Decimal('4.50'), 'branding': True,
+            'doctor_has_slots': True, 'allow_questions': True, 'doctor_url': 'https://example.org/1',
+            'import_date': now, 'doctor_created': now, 'doctor_modified': now
+        }],
+        'clinics': [
+            {'clinic_internal_id': c, 'clinic_id': c, 'clinic_name': f'Clinic {c}', 'city_name': 'Roma',
+             'street': f'Street {c}', 'latitude': Decimal('41.9'), 'longitude': Decimal('12.5'),
+             'fee': Decimal('80.00'), 'clinic_created': now, 'clinic_modified': now}
+            for c in range(1, clinics + 1)
+        ],
+        'specializations': [
+            {'spec_internal_id': s, 'specialization_id': s, 'specialization_name': f'Specialization {s}',
+             'is_popular': s % 2 == 0}
+            for s in range(1, 4)
+        ],
+        # Ordered by clinic as in the query, the grouping must not depend on it anyway
+        'services': [
+            {'service_mapping_id': c * 1000 + s, 'clinic_id': c, 'service_price': '80',
+             'service_price_decimal': Decimal('80.00'), 'is_default_service': s == 0, 'service_id': s,
+             'service_name': f'Service {s}', 'service_created': now, 'service_modified': now}
+            for c in range(1, clinics + 1) for s in range(services_per_clinic)
+        ],
+        'opinions': [
+            {'opinion_internal_id': o, 'opinion_id': o, 'opinion_rate': 1 + o % 5, 'opinion_created': now}
+            for o in range(1, 51)
+        ],
+        'opinion_stats': [{'stats_internal_id': 1, 'positive': 40, 'neutral': 5, 'negative': 5, 'total': 50,
+                           'positive_percentage': Decimal('80.00')}],
+        'google_places': [],
+        'enrichment_attempts': [{'attempt_internal_id': 1, 'attempt_status': 'no_results', 'attempted_at': now}],
+        'phone_numbers': [
+            {'telephone_id': c * 10 + p, 'clinic_id': c, 'phone_number': f'+39 06 {c:04d}{p:02d}',
+             'phone_created': now, 'phone_modified': now, 'clinic_name': f'Clinic {c}'}
+            for c in range(1, clinics + 1) for p in range(phones_per_clinic)
+        ],
+    }
+    return sections
+
+
+def legacy_organize_clinics(data_sections):
+    """Clinic grouping of _organize_complete_doctor_data before the single pass (reference for the comparison)"""
+    clinics_data = []
+    for clinic in data_sections['clinics']:
+        clinic_id = clinic['clinic_id']
+        clinic_services = [
+            service for service in data_sections['services']
+            if service['clinic_id'] == clinic_id
+        ]
+        clinic_phones = [
+            {
+                'telephone_id': phone['telephone_id'],
+                'phone_number': phone['phone_number'],
+                'phone_created': phone['phone_created'],
+                'phone_modified': phone['phone_modified']
+            }
+            for phone in data_sections['phone_numbers']
+            if phone['clinic_id'] == clinic_id
+        ]
+        clinic_data = dict(clinic)
+        clinic_data['services'] = clinic_services
+        clinic_data['phone_numbers'] = clinic_phones
+        clinic_data['total_services'] = len(clinic_services)
+        clinic_data['total_phones'] = len(clinic_phones)
+        clinics_data.append(clinic_data)
+    return clinics_data
+
+
+def measure(function, runs):
+    result = function()
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return result, {
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(round(len(timings) * 0.95)) - 1)]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,500,1000', help='comma separated numbers of clinics')
+    parser.add_argument('--services-per-clinic', type=int, default=10)
+    parser.add_argument('--phones-per-clinic', type=int, default=2)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    loggerManager.logger.setLevel(logging.WARNING)
+
+    med_worker = worker.EnhancedMedicalWorker({}, country_code='IT')
+
+    print(f"{'clinics':>8}  {'services':>8}  {'legacy median/p95 ms':>22}  {'current median/p95 ms':>22}  {'speedup':>7}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        sections = build_sections(size, args.services_per_clinic, args.phones_per_clinic)
+        legacy_clinics, legacy = measure(lambda: legacy_organize_clinics(sections), args.runs)
+        profile, current = measure(lambda: med_worker._organize_complete_doctor_data(sections, 1), args.runs)
+        if profile['clinics']['items'] != legacy_clinics:
+            print(f"WARNING: the clinics of the profile with {size} clinics differ from the legacy grouping")
+        print(f"{size:>8}  {len(sections['services']):>8}  "
+              f"{legacy['median']:>10.2f} / {legacy['p95']:>9.2f}  "
+              f"{current['median']:>10.2f} / {current['p95']:>9.2f}  "
+              f"{legacy['median'] / current['median']:>6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
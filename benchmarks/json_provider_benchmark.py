@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Benchmark of the JSON provider (json_provider.MedInsightJSONProvider) with the stdlib and the orjson
+                backends, on payloads shaped like the responses of the API: /doctors and /doctors/search pages built
+                by EnhancedMedicalWorker._transform_to_api_structure and /doctors/<id>/complete profiles built by
+                _organize_complete_doctor_data, with their datetimes and Decimals. The default provider of Flask is
+                the reference. The timing is the one of jsonify (provider.response), the bodies of every provider are
+                checked to hold the same document as the reference.
+
+                No database is needed, orjson must be installed for the last column:
+
+                    python benchmarks/json_provider_benchmark.py --doctors 20,100,500 --clinics 10,100,1000
+                    python benchmarks/json_provider_benchmark.py --datetime-format iso
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.lib import worker, json_provider, loggerManager  # noqa: E402
+from benchmarks.complete_profile_benchmark import build_sections  # noqa: E402
+
+
+def build_doctor_rows(doctors, clinics_per_doctor):
+    """Synthetic rows shaped like the ones of get_doctors_aggregated_query (clinics as a JSON array)"""
+    now = datetime.now()
+    return [
+        {
+            'doctor_id': d, 'salutation': 'Dr.', 'given_name': f'Given {d}', 'surname': f'Surname {d}',
+            'full_name': f'Dr. Given {d} Surname {d}', 'gender': 'm' if d % 2 else 'f',
+            'rate': Decimal('4.50'), 'branding': True, 'has_slots': d % 3 == 0, 'allow_questions': True,
+            'url': f'https://example.org/doctors/{d}', 'enriched_status': 'enriched' if d % 2 else 'not_enriched',
+            'google_place_id': f'ChIJ{d:012d}' if d % 2 else None, 'enriched_at': now if d % 2 else None,
+            'last_enrichment_update': now if d % 2 else None, 'google_business_name': f'Studio {d}',
+            'google_rating': Decimal('4.7'), 'google_reviews_count': 120, 'has_enrichment_attempts': True,
+            'last_attempt_status': 'success', 'has_google_places_data': bool(d % 2),
+            'clinics': [
+                {'clinic_id': d * 100 + c, 'clinic_name': f'Clinic {c}', 'street': f'Via Roma {c}',
+                 'city_name': 'Roma', 'post_code': '00100', 'province': 'RM', 'latitude': Decimal('41.902782'),
+                 'longitude': Decimal('12.496366'), 'calendar_active': True, 'online_payment': c % 2 == 0}
+                for c in range(clinics_per_doctor)
+            ],
+            'specializations': [
+                {'specialization_name': f'Specialization {s}', 'name_plural': f'Specializations {s}',
+                 'is_popular': s == 0}
+                for s in range(2)
+            ]
+        }
+        for d in range(1, doctors + 1)
+    ]
+
+
+def build_search_payload(med_worker, doctors, clinics_per_doctor):
+    items = med_worker._transform_aggregated_to_api_structure(build_doctor_rows(doctors, clinics_per_doctor))
+    return {'country': 'IT', 'items': items, 'total': len(items), 'page': 1, 'page_size': doctors}
+
+
+def build_profile_payload(med_worker, clinics, services_per_clinic, phones_per_clinic):
+    sections = build_sections(clinics, services_per_clinic, phones_per_clinic)
+    profile = med_worker._organize_complete_doctor_data(sections, 1)
+    return {'country': 'IT', 'doctor_id': 1, 'profile': profile}
+
+
+def create_app(backend, datetime_format):
+    app = Flask(__name__)
+    if backend == 'flask':
+        return app
+    app.config['JSON_BACKEND'] = backend
+    app.config['JSON_DATETIME_FORMAT'] = datetime_format
+    return json_provider.init_app(app)
+
+
+def measure(function, runs):
+    result = function()
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return result, {
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(round(len(timings) * 0.95)) - 1)]
+    }
+
+
+def compare(label, payload, providers, runs, iso=False):
+    bodies, timings = {}, {}
+    for backend, provider in providers.items():
+        response, timings[backend] = measure(lambda: provider.response(payload), runs)
+        bodies[backend] = response.get_data()
+
+    reference = json.loads(bodies['flask'])
+    line = f"{label:>24}  {len(bodies['flask']) / 1024:>8.0f}"
+    for backend in providers:
+        # ISO datetimes are not the HTTP dates of the reference
+        if backend != 'flask' and json.loads(bodies[backend]) != reference and not iso:
+            print(f"WARNING: the {backend} document of {label} differs from the reference")
+        line += f"  {timings[backend]['median']:>9.2f} / {timings[backend]['p95']:>8.2f}" \
+                f"  {timings['flask']['median'] / timings[backend]['median']:>5.1f}x"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--doctors', default='20,100,500', help='comma separated doctors per search page')
+    parser.add_argument('--clinics-per-doctor', type=int, default=3)
+    parser.add_argument('--clinics', default='10,100,1000', help='comma separated clinics per complete profile')
+    parser.add_argument('--services-per-clinic', type=int, default=10)
+    parser.add_argument('--phones-per-clinic', type=int, default=2)
+    parser.add_argument('--datetime-format', default='http', choices=json_provider.DATETIME_FORMATS)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    loggerManager.logger.setLevel(logging.WARNING)
+
+    # The providers keep a weak reference to their app
+    apps = {'flask': create_app('flask', args.datetime_format),
+            'stdlib': create_app('stdlib', args.datetime_format)}
+    if json_provider.orjson is not None:
+        apps['orjson'] = create_app('orjson', args.datetime_format)
+    else:
+        print("orjson is not installed: only the stdlib backend is measured")
+    providers = {backend: app.json for backend, app in apps.items()}
+
+    med_worker = worker.EnhancedMedicalWorker({}, country_code='IT')
+
+    iso = args.datetime_format == 'iso'
+    print(f"{'payload':>24}  {'KiB':>8}" + ''.join(f"  {backend + ' median/p95 ms':>20} {'speedup':>7}"
+                                                  for backend in providers))
+    for doctors in [int(size) for size in args.doctors.split(',')]:
+        payload = build_search_payload(med_worker, doctors, args.clinics_per_doctor)
+        compare(f"search, {doctors} doctors", payload, providers, args.runs, iso=iso)
+    for clinics in [int(size) for size in args.clinics.split(',')]:
+        payload = build_profile_payload(med_worker, clinics, args.services_per_clinic, args.phones_per_clinic)
+        compare(f"complete, {clinics} clinics", payload, providers, args.runs, iso=iso)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Benchmark of search_doctors_lite_query against the previous version (one correlated subquery per
+                output column) on synthetic databases of 1k, 10k and 100k doctors.
+
+                The benchmark creates (and drops first) its own database, never point it to a real one:
+
+                    python benchmarks/lite_search_benchmark.py --host localhost --user postgres --password secret
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import time
+
+import psycopg2
+import psycopg2.extras
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from api.lib import sql_queries, loggerManager  # noqa: E402
+
+
+SCHEMA = """
+    DROP SCHEMA IF EXISTS doctors CASCADE;
+    CREATE SCHEMA doctors;
+    CREATE TABLE doctors.doctors (
+        id serial PRIMARY KEY, doctor_id bigint UNIQUE, salutation text, given_name text, surname text,
+        full_name text, gender text, rate numeric(3, 2), branding boolean, has_slots boolean,
+        allow_questions boolean, url text, import_date timestamp,
+        created timestamp DEFAULT now(), modified timestamp DEFAULT now()
+    );
+    CREATE TABLE doctors.clinics (
+        id serial PRIMARY KEY, clinic_id bigint UNIQUE, clinic_name text, province text, street text,
+        post_code text, city_name text, latitude numeric, longitude numeric, calendar_active boolean,
+        has_slots boolean, online_payment boolean
+    );
+    CREATE TABLE doctors.doctors_clinics_map (id serial PRIMARY KEY, doctor_id bigint, clinic_id bigint);
+    CREATE TABLE doctors.specializations (
+        id serial PRIMARY KEY, specialization_id bigint UNIQUE, specialization_name text, name_plural text,
+        is_popular boolean
+    );
+    CREATE TABLE doctors.doctors_specializations_map (id serial PRIMARY KEY, doctor_id bigint, specialization_id bigint);
+    CREATE TABLE doctors.google_places_data (
+        id serial PRIMARY KEY, google_place_id text UNIQUE, doctor_id bigint, rating numeric, reviews_count int,
+        country_code text, created_at timestamp DEFAULT now(), updated_at timestamp DEFAULT now()
+    );
+    CREATE TABLE doctors.enrichment_attempts (
+        id serial PRIMARY KEY, doctor_id bigint, country_code text, attempt_status text, enrichment_source text,
+        attempted_at timestamp DEFAULT now(), UNIQUE (doctor_id, country_code, enrichment_source)
+    );
+    CREATE INDEX ON doctors.doctors_clinics_map (doctor_id);
+    CREATE INDEX ON doctors.doctors_clinics_map (clinic_id);
+    CREATE INDEX ON doctors.doctors_specializations_map (doctor_id);
+    CREATE INDEX ON doctors.google_places_data (doctor_id);
+"""
+
+SEED = """
+    INSERT INTO doctors.specializations (specialization_id, specialization_name, name_plural, is_popular)
+    SELECT i, 'Specialization ' || i, 'Specializations ' || i, i %% 5 = 0
+    FROM generate_series(1, 60) i;
+
+    INSERT INTO doctors.doctors (doctor_id, given_name, surname, full_name, rate, has_slots, allow_questions)
+    SELECT i, 'Given' || i, 'Surname' || i, 'Dr Given' || i || ' Surname' || i,
+           CASE WHEN i %% 7 = 0 THEN NULL ELSE round((random() * 5)::numeric, 2) END,
+           random() < 0.4, random() < 0.5
+    FROM generate_series(1, %(doctors)s) i;
+
+    INSERT INTO doctors.clinics (clinic_id, clinic_name, province, street, post_code, city_name, latitude, longitude,
+                                 calendar_active, has_slots, online_payment)
+    SELECT i, 'Clinic ' || i, 'PR', 'Street ' || i, '00100',
+           (ARRAY['Roma', 'Milano', 'Napoli', 'Torino', 'Bologna', 'Firenze', 'Bari', 'Genova'])[1 + i %% 8],
+           41.9, 12.5, true, random() < 0.3, random() < 0.5
+    FROM generate_series(1, %(clinics)s) i;
+
+    INSERT INTO doctors.doctors_clinics_map (doctor_id, clinic_id)
+    SELECT d, 1 + (d * 7 + k * 13) %% %(clinics)s
+    FROM generate_series(1, %(doctors)s) d, generate_series(0, 2) k
+    WHERE k < 1 + d %% 3;
+
+    INSERT INTO doctors.doctors_specializations_map (doctor_id, specialization_id)
+    SELECT d, 1 + (d + k * 17) %% 60
+    FROM generate_series(1, %(doctors)s) d, generate_series(0, 1) k
+    WHERE k < 1 + d %% 2;
+
+    INSERT INTO doctors.google_places_data (google_place_id, doctor_id, rating, reviews_count, country_code)
+    SELECT 'place_' || d, d, round((random() * 5)::numeric, 1), (random() * 300)::int, 'IT'
+    FROM generate_series(1, %(doctors)s) d
+    WHERE d %% 4 = 0;
+
+    INSERT INTO doctors.enrichment_attempts (doctor_id, country_code, attempt_status, enrichment_source)
+    SELECT d, 'IT', (ARRAY['success', 'failed', 'no_results', 'error', 'pending'])[1 + d %% 5], 'google_places'
+    FROM generate_series(1, %(doctors)s) d
+    WHERE d %% 5 < 2;
+
+    ANALYZE;
+"""
+
+SCENARIOS = [
+    ("default (limit 1000)", {}),
+    ("city", {'city': 'Roma'}),
+    ("search term + min rate", {'search_term': 'given1', 'min_rate': 2}),
+    ("enriched only, limit 100", {'enriched_only': True, 'limit': 100}),
+]
+
+
+def legacy_search_doctors_lite_query(search_term=None, city=None, profession=None, min_rate=None, max_rate=None,
+                                     has_slots=None, allow_questions=None, limit=None, enriched_only=None,
+                                     country_code='IT'):
+    """search_doctors_lite_query as it was before the set-based rewrite (reference for the comparison)"""
+    params = {'country_code': country_code}
+    doctor_filters = []
+    if search_term:
+        params['search_pattern'] = f"%{search_term}%"
+        doctor_filters.append("(UPPER(d.full_name) LIKE UPPER(%(search_pattern)s) OR UPPER(d.given_name) LIKE UPPER(%(search_pattern)s) OR UPPER(d.surname) LIKE UPPER(%(search_pattern)s))")
+    if min_rate is not None:
+        params['min_rate'] = min_rate
+        doctor_filters.append("d.rate >= %(min_rate)s")
+    if max_rate is not None:
+        params['max_rate'] = max_rate
+        doctor_filters.append("d.rate <= %(max_rate)s")
+    if has_slots is not None:
+        params['has_slots'] = has_slots
+        doctor_filters.append("d.has_slots = %(has_slots)s")
+    if allow_questions is not None:
+        params['allow_questions'] = allow_questions
+        doctor_filters.append("d.allow_questions = %(allow_questions)s")
+    doctor_where = ("WHERE " + " AND ".join(doctor_filters)) if doctor_filters else ""
+
+    query = f"""
+        WITH doctor_base AS (
+            SELECT DISTINCT d.doctor_id, d.full_name, d.rate, d.has_slots, d.allow_questions
+            FROM doctors.doctors d
+            {doctor_where}
+        )
+        SELECT
+            db.doctor_id, db.full_name, db.rate, db.has_slots, db.allow_questions,
+            (SELECT c_sub.city_name
+             FROM doctors.doctors_clinics_map dcm_sub
+             JOIN doctors.clinics c_sub ON dcm_sub.clinic_id = c_sub.clinic_id
+             WHERE dcm_sub.doctor_id = db.doctor_id
+             ORDER BY c_sub.clinic_id
+             LIMIT 1) as primary_city,
+            (SELECT s_sub.specialization_name
+             FROM doctors.doctors_specializations_map dsm_sub
+             JOIN doctors.specializations s_sub ON dsm_sub.specialization_id = s_sub.specialization_id
+             WHERE dsm_sub.doctor_id = db.doctor_id
+             ORDER BY s_sub.is_popular DESC, s_sub.specialization_name
+             LIMIT 1) as primary_specialization,
+            (SELECT COALESCE(json_agg(jsonb_build_object(
+                        'clinic_id', c_json.clinic_id, 'clinic_name', c_json.clinic_name, 'street', c_json.street,
+                        'city_name', c_json.city_name, 'post_code', c_json.post_code, 'province', c_json.province,
+                        'latitude', c_json.latitude, 'longitude', c_json.longitude,
+                        'calendar_active', c_json.calendar_active, 'online_payment', c_json.online_payment
+                    )), '[]'::json)
+             FROM doctors.doctors_clinics_map dcm_json
+             JOIN doctors.clinics c_json ON dcm_json.clinic_id = c_json.clinic_id
+             WHERE dcm_json.doctor_id = db.doctor_id) as clinics,
+            (SELECT CASE
+                    WHEN gpd_sub.google_place_id IS NOT NULL THEN 'enriched'
+                    WHEN ea_sub.id IS NOT NULL AND ea_sub.attempt_status = 'success' THEN 'enriched'
+                    WHEN ea_sub.id IS NOT NULL AND ea_sub.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
+                    WHEN ea_sub.id IS NOT NULL THEN 'attempted'
+                    ELSE 'never_attempted'
+                END
+             FROM doctors.doctors d_sub
+             LEFT JOIN doctors.google_places_data gpd_sub ON d_sub.doctor_id = gpd_sub.doctor_id
+             LEFT JOIN doctors.enrichment_attempts ea_sub ON (
+                 d_sub.doctor_id = ea_sub.doctor_id
+                 AND ea_sub.country_code = %(country_code)s
+                 AND ea_sub.enrichment_source = 'google_places'
+             )
+             WHERE d_sub.doctor_id = db.doctor_id
+             LIMIT 1) as enrichment_status,
+            (SELECT CASE WHEN gpd_flag.google_place_id IS NOT NULL THEN true ELSE false END
+             FROM doctors.google_places_data gpd_flag WHERE gpd_flag.doctor_id = db.doctor_id LIMIT 1) as has_google_data,
+            (SELECT gpd_rating.rating
+             FROM doctors.google_places_data gpd_rating WHERE gpd_rating.doctor_id = db.doctor_id LIMIT 1) as google_rating,
+            (SELECT gpd_reviews.reviews_count
+             FROM doctors.google_places_data gpd_reviews WHERE gpd_reviews.doctor_id = db.doctor_id LIMIT 1) as google_reviews_count
+        FROM doctor_base db
+    """
+    conditions = ["1=1"]
+    if city:
+        params['city'] = city.upper()
+        conditions.append("""db.doctor_id IN (
+            SELECT dcm_city.doctor_id FROM doctors.doctors_clinics_map dcm_city
+            JOIN doctors.clinics c_city ON dcm_city.clinic_id = c_city.clinic_id
+            WHERE UPPER(c_city.city_name) = %(city)s)""")
+    if profession:
+        params['profession'] = profession.upper()
+        conditions.append("""db.doctor_id IN (
+            SELECT dsm_prof.doctor_id FROM doctors.doctors_specializations_map dsm_prof
+            JOIN doctors.specializations s_prof ON dsm_prof.specialization_id = s_prof.specialization_id
+            WHERE UPPER(s_prof.specialization_name) = %(profession)s)""")
+    if enriched_only is not None:
+        conditions.append(("db.doctor_id IN" if enriched_only else "db.doctor_id NOT IN") + """ (
+            SELECT gpd_enr.doctor_id FROM doctors.google_places_data gpd_enr WHERE gpd_enr.doctor_id IS NOT NULL)""")
+    query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY db.rate DESC, db.doctor_id"
+    params['limit'] = 1000 if limit is None else limit
+    query += " LIMIT %(limit)s"
+    return query, params
+
+
+def create_database(args):
+    conn = psycopg2.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                            dbname=args.maintenance_db)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP DATABASE IF EXISTS {args.db_name}')
+        cursor.execute(f"CREATE DATABASE {args.db_name} ENCODING 'UTF8' TEMPLATE template0")
+    conn.close()
+
+
+def seed(cursor, doctors):
+    cursor.execute(SCHEMA)
+    cursor.execute(SEED, {'doctors': doctors, 'clinics': max(doctors // 2, 1)})
+
+
+def measure(cursor, builder, filters, runs):
+    query, params = builder(**filters)
+    # Warm up the caches and check the query works
+    for i in range(2):
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        cursor.execute(query, params)
+        cursor.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'rows': len(rows),
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(round(len(timings) * 0.95)) - 1)]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('BENCH_DB_HOST', 'localhost'))
+    parser.add_argument('--port', default=os.environ.get('BENCH_DB_PORT', '5432'))
+    parser.add_argument('--user', default=os.environ.get('BENCH_DB_USER', 'postgres'))
+    parser.add_argument('--password', default=os.environ.get('BENCH_DB_PASSWORD'))
+    parser.add_argument('--maintenance-db', default='postgres', help='database used to create the benchmark one')
+    parser.add_argument('--db-name', default='medinsight_bench')
+    parser.add_argument('--sizes', default='1000,10000,100000', help='comma separated numbers of doctors')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+    # The builders log every query they return
+    loggerManager.logger.setLevel(logging.WARNING)
+
+    create_database(args)
+    conn = psycopg2.connect(host=args.host, port=args.port, user=args.user, password=args.password,
+                            dbname=args.db_name)
+    conn.autocommit = True
+    cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+
+    print(f"{'doctors':>8}  {'scenario':<26} {'rows':>5}  {'legacy median/p95 ms':>22}  {'current median/p95 ms':>22}  {'speedup':>7}")
+    for size in [int(size) for size in args.sizes.split(',')]:
+        seed(cursor, size)
+        for label, filters in SCENARIOS:
+            legacy = measure(cursor, legacy_search_doctors_lite_query, filters, args.runs)
+            current = measure(cursor, sql_queries.search_doctors_lite_query, filters, args.runs)
+            if legacy['rows'] != current['rows']:
+                print(f"WARNING: {label} returned {legacy['rows']} legacy rows and {current['rows']} new rows")
+            print(f"{size:>8}  {label:<26} {current['rows']:>5}  "
+                  f"{legacy['median']:>10.2f} / {legacy['p95']:>9.2f}  "
+                  f"{current['median']:>10.2f} / {current['p95']:>9.2f}  "
+                  f"{legacy['median'] / current['median']:>6.1f}x")
+
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
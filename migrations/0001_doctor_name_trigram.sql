@@ -0,0 +1,14 @@
+-- migrate:no-transaction
+-- Trigram GIN indexes for the search_term filter (ILIKE '%term%' and similarity ranking on doctor names).
+-- Built CONCURRENTLY so that searches keep running on large country databases while the indexes are created.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_full_name_trgm
+    ON doctors.doctors USING gin (full_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_given_name_trgm
+    ON doctors.doctors USING gin (given_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_surname_trgm
+    ON doctors.doctors USING gin (surname gin_trgm_ops);
@@ -0,0 +1,35 @@
+-- migrate:no-transaction
+-- Indexes the query builders of api/lib/sql_queries.py rely on, so that DE and IT stop drifting.
+-- "flask db-check-indexes" reports the ones that are missing or invalid on a country database.
+-- The unique key of doctors.enrichment_attempts (doctor_id, country_code, enrichment_source) is part of the
+-- table definition (ON CONFLICT needs it) and is only checked, never created here.
+
+-- Order and keyset pagination of every doctor listing: ORDER BY rate DESC, doctor_id
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_rate_doctor_id
+    ON doctors.doctors (rate DESC, doctor_id);
+
+-- Clinics of a doctor and doctors of a clinic
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_clinics_map_doctor_id
+    ON doctors.doctors_clinics_map (doctor_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_clinics_map_clinic_id
+    ON doctors.doctors_clinics_map (clinic_id);
+
+-- Specializations of a doctor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_specializations_map_doctor_id
+    ON doctors.doctors_specializations_map (doctor_id);
+
+-- city and profession filters: UPPER(c.city_name) = %(city)s, UPPER(s.specialization_name) = %(profession)s
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clinics_upper_city_name
+    ON doctors.clinics (UPPER(city_name));
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_specializations_upper_specialization_name
+    ON doctors.specializations (UPPER(specialization_name));
+
+-- Services of a doctor in a clinic
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_clinics_service_options_map_doctor_clinic
+    ON doctors.clinics_service_options_map (doctor_id, clinic_id);
+
+-- Google Places data of a doctor
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_google_places_data_doctor_id
+    ON doctors.google_places_data (doctor_id);
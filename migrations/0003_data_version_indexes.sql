@@ -0,0 +1,12 @@
+-- migrate:no-transaction
+-- Indexes of the per-country data version (get_data_version_query): max(modified), max(updated_at) and
+-- max(attempted_at) are read from the end of these indexes instead of scanning the tables.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_modified
+    ON doctors.doctors (modified);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_google_places_data_country_updated_at
+    ON doctors.google_places_data (country_code, updated_at);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_enrichment_attempts_country_attempted_at
+    ON doctors.enrichment_attempts (country_code, attempted_at);
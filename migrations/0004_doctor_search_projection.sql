@@ -0,0 +1,141 @@
+-- One row per doctor with the columns of the lite search precomputed (search_doctors_lite_query reads only this
+-- table). It is filled and kept up to date by refresh_doctor_search_projection_query: the enrichment write paths
+-- refresh the doctors they touch, "flask db-rebuild-search-projection" rebuilds a country after an import.
+-- The table is filled at the end of this migration, for the country of the database.
+
+-- Column types follow the source tables (doctors, clinics, specializations, google_places_data)
+CREATE TABLE IF NOT EXISTS doctors.doctor_search_projection AS
+SELECT
+    d.doctor_id,
+    d.full_name,
+    d.given_name,
+    d.surname,
+    d.rate,
+    d.has_slots,
+    d.allow_questions,
+    c.city_name as primary_city,
+    s.specialization_name as primary_specialization,
+    ARRAY[UPPER(c.city_name)] as city_names,
+    ARRAY[UPPER(s.specialization_name)] as specialization_names,
+    NULL::json as clinics,
+    NULL::text as enrichment_status,
+    NULL::boolean as has_google_data,
+    gpd.rating as google_rating,
+    gpd.reviews_count as google_reviews_count,
+    NOW()::timestamp as refreshed_at
+FROM doctors.doctors d, doctors.clinics c, doctors.specializations s, doctors.google_places_data gpd
+WITH NO DATA;
+
+ALTER TABLE doctors.doctor_search_projection
+    ADD CONSTRAINT doctor_search_projection_pkey PRIMARY KEY (doctor_id),
+    ALTER COLUMN city_names SET NOT NULL,
+    ALTER COLUMN specialization_names SET NOT NULL,
+    ALTER COLUMN clinics SET NOT NULL,
+    ALTER COLUMN enrichment_status SET NOT NULL,
+    ALTER COLUMN refreshed_at SET DEFAULT NOW();
+
+-- Order and keyset pagination: ORDER BY rate DESC, doctor_id
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_rate_doctor_id
+    ON doctors.doctor_search_projection (rate DESC, doctor_id);
+
+-- city and profession filters: city_names @> ARRAY[%(city)s], specialization_names @> ARRAY[%(profession)s]
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_city_names
+    ON doctors.doctor_search_projection USING gin (city_names);
+
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_specialization_names
+    ON doctors.doctor_search_projection USING gin (specialization_names);
+
+-- search_term filter (pg_trgm, see 0001_doctor_name_trigram.sql)
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_full_name_trgm
+    ON doctors.doctor_search_projection USING gin (full_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_given_name_trgm
+    ON doctors.doctor_search_projection USING gin (given_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_doctor_search_projection_surname_trgm
+    ON doctors.doctor_search_projection USING gin (surname gin_trgm_ops);
+
+-- Backfill: the body of refresh_doctor_search_projection_query for every doctor. The enrichment columns come from
+-- google_places_data and enrichment_attempts here, 0005_enrichment_state.sql refreshes them from the new state table.
+INSERT INTO doctors.doctor_search_projection (
+    doctor_id, full_name, given_name, surname, rate, has_slots, allow_questions,
+    primary_city, primary_specialization, city_names, specialization_names, clinics,
+    enrichment_status, has_google_data, google_rating, google_reviews_count, refreshed_at
+)
+WITH doctor_clinics AS (
+    SELECT
+        dcm.doctor_id,
+        (array_agg(c.city_name ORDER BY c.clinic_id))[1] as primary_city,
+        array_agg(DISTINCT UPPER(c.city_name)) FILTER (WHERE c.city_name IS NOT NULL) as city_names,
+        json_agg(
+            jsonb_build_object(
+                'clinic_id', c.clinic_id,
+                'clinic_name', c.clinic_name,
+                'street', c.street,
+                'city_name', c.city_name,
+                'post_code', c.post_code,
+                'province', c.province,
+                'latitude', c.latitude,
+                'longitude', c.longitude,
+                'calendar_active', c.calendar_active,
+                'online_payment', c.online_payment
+            )
+            ORDER BY c.clinic_id
+        ) as clinics
+    FROM doctors.doctors_clinics_map dcm
+    JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
+    GROUP BY dcm.doctor_id
+),
+doctor_specializations AS (
+    SELECT
+        dsm.doctor_id,
+        (array_agg(s.specialization_name ORDER BY s.is_popular DESC, s.specialization_name))[1]
+            as primary_specialization,
+        array_agg(DISTINCT UPPER(s.specialization_name)) FILTER (WHERE s.specialization_name IS NOT NULL)
+            as specialization_names
+    FROM doctors.doctors_specializations_map dsm
+    JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
+    GROUP BY dsm.doctor_id
+),
+doctor_google AS (
+    SELECT DISTINCT ON (gpd.doctor_id)
+        gpd.doctor_id,
+        gpd.google_place_id,
+        gpd.rating,
+        gpd.reviews_count
+    FROM doctors.google_places_data gpd
+    ORDER BY gpd.doctor_id
+)
+SELECT
+    d.doctor_id,
+    d.full_name,
+    d.given_name,
+    d.surname,
+    d.rate,
+    d.has_slots,
+    d.allow_questions,
+    dc.primary_city,
+    ds.primary_specialization,
+    COALESCE(dc.city_names, '{}'),
+    COALESCE(ds.specialization_names, '{}'),
+    COALESCE(dc.clinics, '[]'::json),
+    CASE
+        WHEN dg.google_place_id IS NOT NULL THEN 'enriched'
+        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
+        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
+        WHEN ea.id IS NOT NULL THEN 'attempted'
+        ELSE 'never_attempted'
+    END,
+    CASE WHEN dg.doctor_id IS NOT NULL THEN dg.google_place_id IS NOT NULL END,
+    dg.rating,
+    dg.reviews_count,
+    NOW()
+FROM doctors.doctors d
+LEFT JOIN doctor_clinics dc ON dc.doctor_id = d.doctor_id
+LEFT JOIN doctor_specializations ds ON ds.doctor_id = d.doctor_id
+LEFT JOIN doctor_google dg ON dg.doctor_id = d.doctor_id
+LEFT JOIN doctors.enrichment_attempts ea ON (
+    d.doctor_id = ea.doctor_id
+    AND ea.country_code = current_setting('medinsight.country_code')
+    AND ea.enrichment_source = 'google_places'
+);
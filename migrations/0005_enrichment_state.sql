@@ -0,0 +1,192 @@
+-- Enrichment state of every doctor with Google Places data or enrichment attempts in a country: status, latest
+-- Google place, Google source attempt and counts. Readers look it up by (doctor_id, country_code) instead of
+-- joining google_places_data and enrichment_attempts; a doctor without a row was never attempted.
+-- It is written by refresh_enrichment_state_query, in the same transaction as the writes of the worker save paths.
+-- The table is filled at the end of this migration for the country of the database, then the lite search projection
+-- (0004_doctor_search_projection.sql) is refreshed from it.
+
+-- Column types follow the source tables (google_places_data, enrichment_attempts)
+CREATE TABLE IF NOT EXISTS doctors.enrichment_state AS
+SELECT
+    ea.doctor_id,
+    ea.country_code,
+    NULL::text as enrichment_status,
+    gpd.google_place_id,
+    gpd.enriched_at,
+    gpd.updated_at as last_enrichment_update,
+    gpd.business_name as google_business_name,
+    gpd.rating as google_rating,
+    gpd.reviews_count as google_reviews_count,
+    0 as google_places_count,
+    ea.id as last_attempt_id,
+    ea.attempt_status as last_attempt_status,
+    ea.attempted_at as last_attempt_date,
+    ea.error_message as last_attempt_error,
+    ea.search_query as last_search_query,
+    ea.processing_time_ms as last_processing_time,
+    ea.attempted_by as last_attempted_by,
+    ea.places_found as last_places_found,
+    ea.google_place_id as last_attempt_place_id,
+    0 as attempts_count,
+    NOW()::timestamp as updated_at
+FROM doctors.enrichment_attempts ea, doctors.google_places_data gpd
+WITH NO DATA;
+
+ALTER TABLE doctors.enrichment_state
+    ADD CONSTRAINT enrichment_state_pkey PRIMARY KEY (doctor_id, country_code),
+    ALTER COLUMN enrichment_status SET NOT NULL,
+    ALTER COLUMN google_places_count SET NOT NULL,
+    ALTER COLUMN attempts_count SET NOT NULL,
+    ALTER COLUMN updated_at SET DEFAULT NOW();
+
+-- Backfill: the body of refresh_enrichment_state_query for every doctor of the country
+INSERT INTO doctors.enrichment_state (
+    doctor_id, country_code, enrichment_status,
+    google_place_id, enriched_at, last_enrichment_update, google_business_name,
+    google_rating, google_reviews_count, google_places_count,
+    last_attempt_id, last_attempt_status, last_attempt_date, last_attempt_error, last_search_query,
+    last_processing_time, last_attempted_by, last_places_found, last_attempt_place_id,
+    attempts_count, updated_at
+)
+WITH target AS (
+    SELECT gpd.doctor_id FROM doctors.google_places_data gpd
+    WHERE gpd.country_code = current_setting('medinsight.country_code')
+    UNION
+    SELECT ea.doctor_id FROM doctors.enrichment_attempts ea
+    WHERE ea.country_code = current_setting('medinsight.country_code')
+),
+doctor_google AS (
+    SELECT DISTINCT ON (gpd.doctor_id)
+        gpd.doctor_id, gpd.google_place_id, gpd.enriched_at, gpd.updated_at,
+        gpd.business_name, gpd.rating, gpd.reviews_count,
+        COUNT(*) OVER (PARTITION BY gpd.doctor_id) as google_places_count
+    FROM doctors.google_places_data gpd
+    WHERE gpd.country_code = current_setting('medinsight.country_code')
+    ORDER BY gpd.doctor_id, gpd.updated_at DESC NULLS LAST, gpd.id DESC
+),
+doctor_attempts AS (
+    SELECT ea.doctor_id, COUNT(*) as attempts_count
+    FROM doctors.enrichment_attempts ea
+    WHERE ea.country_code = current_setting('medinsight.country_code')
+    GROUP BY ea.doctor_id
+)
+SELECT
+    t.doctor_id,
+    current_setting('medinsight.country_code'),
+    CASE
+        WHEN dg.google_place_id IS NOT NULL THEN 'enriched'
+        WHEN ea.id IS NOT NULL AND ea.attempt_status = 'success' THEN 'enriched'
+        WHEN ea.id IS NOT NULL AND ea.attempt_status IN ('failed', 'error', 'no_results') THEN 'attempted_failed'
+        WHEN ea.id IS NOT NULL THEN 'attempted'
+        ELSE 'never_attempted'
+    END,
+    dg.google_place_id,
+    dg.enriched_at,
+    dg.updated_at,
+    dg.business_name,
+    dg.rating,
+    dg.reviews_count,
+    COALESCE(dg.google_places_count, 0),
+    ea.id,
+    ea.attempt_status,
+    ea.attempted_at,
+    ea.error_message,
+    ea.search_query,
+    ea.processing_time_ms,
+    ea.attempted_by,
+    ea.places_found,
+    ea.google_place_id,
+    COALESCE(da.attempts_count, 0),
+    NOW()
+FROM target t
+LEFT JOIN doctor_google dg ON dg.doctor_id = t.doctor_id
+LEFT JOIN doctor_attempts da ON da.doctor_id = t.doctor_id
+LEFT JOIN doctors.enrichment_attempts ea ON (
+    t.doctor_id = ea.doctor_id
+    AND ea.country_code = current_setting('medinsight.country_code')
+    AND ea.enrichment_source = 'google_places'
+);
+
+-- Refresh of the lite search projection, which now reads its enrichment columns from the state: the body of
+-- refresh_doctor_search_projection_query for every doctor (also fills a projection left empty by an older 0004)
+INSERT INTO doctors.doctor_search_projection (
+    doctor_id, full_name, given_name, surname, rate, has_slots, allow_questions,
+    primary_city, primary_specialization, city_names, specialization_names, clinics,
+    enrichment_status, has_google_data, google_rating, google_reviews_count, refreshed_at
+)
+WITH doctor_clinics AS (
+    SELECT
+        dcm.doctor_id,
+        (array_agg(c.city_name ORDER BY c.clinic_id))[1] as primary_city,
+        array_agg(DISTINCT UPPER(c.city_name)) FILTER (WHERE c.city_name IS NOT NULL) as city_names,
+        json_agg(
+            jsonb_build_object(
+                'clinic_id', c.clinic_id,
+                'clinic_name', c.clinic_name,
+                'street', c.street,
+                'city_name', c.city_name,
+                'post_code', c.post_code,
+                'province', c.province,
+                'latitude', c.latitude,
+                'longitude', c.longitude,
+                'calendar_active', c.calendar_active,
+                'online_payment', c.online_payment
+            )
+            ORDER BY c.clinic_id
+        ) as clinics
+    FROM doctors.doctors_clinics_map dcm
+    JOIN doctors.clinics c ON dcm.clinic_id = c.clinic_id
+    GROUP BY dcm.doctor_id
+),
+doctor_specializations AS (
+    SELECT
+        dsm.doctor_id,
+        (array_agg(s.specialization_name ORDER BY s.is_popular DESC, s.specialization_name))[1]
+            as primary_specialization,
+        array_agg(DISTINCT UPPER(s.specialization_name)) FILTER (WHERE s.specialization_name IS NOT NULL)
+            as specialization_names
+    FROM doctors.doctors_specializations_map dsm
+    JOIN doctors.specializations s ON dsm.specialization_id = s.specialization_id
+    GROUP BY dsm.doctor_id
+)
+SELECT
+    d.doctor_id,
+    d.full_name,
+    d.given_name,
+    d.surname,
+    d.rate,
+    d.has_slots,
+    d.allow_questions,
+    dc.primary_city,
+    ds.primary_specialization,
+    COALESCE(dc.city_names, '{}'),
+    COALESCE(ds.specialization_names, '{}'),
+    COALESCE(dc.clinics, '[]'::json),
+    COALESCE(es.enrichment_status, 'never_attempted'),
+    CASE WHEN es.google_places_count > 0 THEN es.google_place_id IS NOT NULL END,
+    es.google_rating,
+    es.google_reviews_count,
+    NOW()
+FROM doctors.doctors d
+LEFT JOIN doctor_clinics dc ON dc.doctor_id = d.doctor_id
+LEFT JOIN doctor_specializations ds ON ds.doctor_id = d.doctor_id
+LEFT JOIN doctors.enrichment_state es ON (
+    es.doctor_id = d.doctor_id AND es.country_code = current_setting('medinsight.country_code')
+)
+ON CONFLICT (doctor_id) DO UPDATE SET
+    full_name = EXCLUDED.full_name,
+    given_name = EXCLUDED.given_name,
+    surname = EXCLUDED.surname,
+    rate = EXCLUDED.rate,
+    has_slots = EXCLUDED.has_slots,
+    allow_questions = EXCLUDED.allow_questions,
+    primary_city = EXCLUDED.primary_city,
+    primary_specialization = EXCLUDED.primary_specialization,
+    city_names = EXCLUDED.city_names,
+    specialization_names = EXCLUDED.specialization_names,
+    clinics = EXCLUDED.clinics,
+    enrichment_status = EXCLUDED.enrichment_status,
+    has_google_data = EXCLUDED.has_google_data,
+    google_rating = EXCLUDED.google_rating,
+    google_reviews_count = EXCLUDED.google_reviews_count,
+    refreshed_at = EXCLUDED.refreshed_at;
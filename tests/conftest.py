@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Fixtures of the tests. The query tests run on the Postgres database of TEST_DATABASE_URL (a libpq
+                connection string, e.g. "host=/tmp port=5432 dbname=medinsight_test user=postgres") and are skipped
+                when it is not set. They create the doctors schema inside a transaction that is rolled back, and
+                are skipped on a database that already has one.
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def postgres_cursor():
+    """Cursor in a transaction with an empty doctors schema, rolled back at the end of the test"""
+    dsn = os.environ.get('TEST_DATABASE_URL')
+    if not dsn:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    import psycopg2
+    import psycopg2.extras
+
+    connection = psycopg2.connect(dsn)
+    try:
+        cursor = connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT 1 FROM pg_namespace WHERE nspname = 'doctors'")
+        if cursor.fetchone():
+            pytest.skip('the database of TEST_DATABASE_URL already has a doctors schema')
+        cursor.execute("CREATE SCHEMA doctors")
+        yield cursor
+    finally:
+        connection.rollback()
+        connection.close()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the per-worker TTL / LRU cache of cache_manager
+"""
+
+import pytest
+
+from api.lib import cache_manager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic of cache_manager"""
+    now = [1000.0]
+    monkeypatch.setattr(cache_manager.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_get_of_a_missing_key():
+    cache = cache_manager.TTLCache()
+    assert cache.get('a') == (False, None)
+    assert cache.status()['misses'] == 1
+
+
+def test_set_and_get():
+    cache = cache_manager.TTLCache()
+    cache.set('a', None)
+    # A cached None is still a hit
+    assert cache.get('a') == (True, None)
+    assert cache.status()['hits'] == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = cache_manager.TTLCache(ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=30)
+    clock[0] += 10
+    assert cache.get('a') == (False, None)
+    assert cache.get('b') == (True, 2)
+    status = cache.status()
+    assert status['expirations'] == 1
+    assert status['entries'] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = cache_manager.TTLCache(max_entries=2)
+    cache.set('a', 1).set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.get('c') == (True, 3)
+    assert cache.status()['evictions'] == 1
+
+
+def test_invalidate_with_predicate():
+    cache = cache_manager.TTLCache()
+    cache.set(('cities', 'IT'), 1).set(('cities', 'DE'), 2).set(('stats', 'IT'), 3)
+    assert cache.invalidate(lambda key: key[1] == 'IT') == 2
+    assert cache.get(('cities', 'DE')) == (True, 2)
+    assert cache.status()['invalidations'] == 2
+
+
+def test_invalidate_everything():
+    cache = cache_manager.TTLCache()
+    cache.set('a', 1).set('b', 2)
+    assert cache.invalidate() == 2
+    assert cache.status()['entries'] == 0
+
+
+def test_hit_ratio():
+    cache = cache_manager.TTLCache()
+    assert cache.status()['hit_ratio'] is None
+    cache.set('a', 1)
+    cache.get('a')
+    cache.get('b')
+    assert cache.status()['hit_ratio'] == 0.5
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the prepared statements helpers of database_manager
+"""
+
+from collections import OrderedDict
+
+import pytest
+from flask import Flask
+
+from api.lib import database_manager
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.prepared_statements = OrderedDict()
+        self.autocommit = True
+
+
+class FakeCursor(object):
+    """Records the statements executed instead of sending them to Postgres"""
+
+    def __init__(self):
+        self.connection = FakeConnection()
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    with app.app_context():
+        yield app
+
+
+def test_to_prepared_statement_numbers_parameters_in_order():
+    query, names = database_manager.to_prepared_statement(
+        "SELECT * FROM t WHERE a = %(a)s AND b = %(b)s OR a > %(a)s")
+    assert query == "SELECT * FROM t WHERE a = $1 AND b = $2 OR a > $1"
+    assert names == ['a', 'b']
+
+
+def test_to_prepared_statement_unescapes_percent():
+    query, names = database_manager.to_prepared_statement("SELECT 'x%%' LIKE %(pattern)s")
+    assert query == "SELECT 'x%' LIKE $1"
+    assert names == ['pattern']
+
+
+def test_to_prepared_statement_without_parameters():
+    assert database_manager.to_prepared_statement("SELECT 1") == ("SELECT 1", [])
+
+
+def test_statement_name_is_stable_and_depends_on_the_query():
+    assert database_manager.statement_name("SELECT 1") == database_manager.statement_name("SELECT 1")
+    assert database_manager.statement_name("SELECT 1") != database_manager.statement_name("SELECT 2")
+    assert database_manager.statement_name("SELECT 1").startswith('mi_')
+
+
+def test_execute_prepared_prepares_once(app):
+    cursor = FakeCursor()
+    database_manager._execute_prepared(cursor, 'mi_a', "SELECT %(x)s", {'x': 1})
+    database_manager._execute_prepared(cursor, 'mi_a', "SELECT %(x)s", {'x': 2})
+    assert cursor.executed == [
+        ('PREPARE mi_a AS SELECT $1', None),
+        ('EXECUTE mi_a (%s)', [1]),
+        ('EXECUTE mi_a (%s)', [2]),
+    ]
+
+
+def test_execute_prepared_evicts_least_recently_used(app):
+    app.config['DATABASE_PREPARED_STATEMENTS_MAX'] = 2
+    cursor = FakeCursor()
+    for name in ('mi_a', 'mi_b', 'mi_a', 'mi_c'):
+        database_manager._execute_prepared(cursor, name, "SELECT 1", None)
+    assert list(cursor.connection.prepared_statements) == ['mi_a', 'mi_c']
+    assert ('DEALLOCATE mi_b', None) in cursor.executed
+
+
+@pytest.mark.parametrize('max_statements', [0, -1])
+def test_execute_prepared_keeps_the_new_statement(app, max_statements):
+    app.config['DATABASE_PREPARED_STATEMENTS_MAX'] = max_statements
+    cursor = FakeCursor()
+    database_manager._execute_prepared(cursor, 'mi_a', "SELECT %(x)s", {'x': 1})
+    database_manager._execute_prepared(cursor, 'mi_b', "SELECT 2", None)
+    assert list(cursor.connection.prepared_statements) == ['mi_b']
+    assert cursor.executed[-1] == ('EXECUTE mi_b', None)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the migration file helpers of migration_manager
+"""
+
+from api.lib import migration_manager
+
+
+def test_split_statements_on_line_ending_semicolons():
+    sql = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a
+    ON doctors.doctors (rate DESC, doctor_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON doctors.clinics (UPPER(city_name));
+"""
+    assert migration_manager.split_statements(sql) == [
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_a\n    ON doctors.doctors (rate DESC, doctor_id);",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_b ON doctors.clinics (UPPER(city_name));",
+    ]
+
+
+def test_split_statements_drops_comments_and_keeps_the_last_statement():
+    sql = "-- migrate:no-transaction\n-- comment; with a semicolon\nSELECT 1;\n  -- indented comment\nSELECT 2"
+    assert migration_manager.split_statements(sql) == ["SELECT 1;", "SELECT 2"]
+
+
+def test_split_statements_semicolon_inside_a_line():
+    assert migration_manager.split_statements("SELECT ';' as s,\n 1;") == ["SELECT ';' as s,\n 1;"]
+
+
+def test_list_migrations_of_the_repository():
+    migrations = migration_manager.list_migrations()
+    versions = [migration['version'] for migration in migrations]
+    assert versions == sorted(versions)
+    assert len(versions) == len(set(versions))
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    for migration in migrations:
+        with open(migration['path']) as f:
+            if 'CONCURRENTLY' in f.read():
+                assert not migration['transactional'], migration['name']
+
+
+def test_index_key_columns_of_pg_get_indexdef():
+    definition = ("CREATE INDEX idx ON doctors.clinics USING btree (upper((city_name)::text), clinic_id) "
+                  "INCLUDE (post_code)")
+    assert migration_manager.index_key_columns(definition, 'btree') == ['upper((city_name)::text)', 'clinic_id']
+
+
+def test_index_satisfies_compares_method_uniqueness_and_leading_columns():
+    index = {'method': 'btree', 'is_unique': False,
+             'definition': "CREATE INDEX idx ON doctors.clinics USING btree (upper((city_name)::text), clinic_id)"}
+    assert migration_manager.index_satisfies(index, {'method': 'btree', 'columns': ['UPPER(city_name)']})
+    assert not migration_manager.index_satisfies(index, {'method': 'gin', 'columns': ['UPPER(city_name)']})
+    assert not migration_manager.index_satisfies(index, {'method': 'btree', 'columns': ['clinic_id']})
+    assert not migration_manager.index_satisfies(
+        index, {'method': 'btree', 'unique': True, 'columns': ['UPPER(city_name)']})
+
+
+def test_created_index_of_create_index_statements():
+    assert migration_manager.created_index(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_doctors_modified\n    ON doctors.doctors (modified);"
+    ) == 'doctors.idx_doctors_modified'
+    assert migration_manager.created_index(
+        "create unique index idx_a on t (a);") == 'public.idx_a'
+    assert migration_manager.created_index("CREATE EXTENSION IF NOT EXISTS pg_trgm;") is None
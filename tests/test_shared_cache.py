@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the shared cache on the SQLite backend, the threads stand for the gunicorn workers
+"""
+
+import time
+import threading
+
+import pytest
+
+from api.lib import shared_cache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return shared_cache.SharedCache(shared_cache.SQLiteBackend(str(tmp_path / 'cache.sqlite3')), ttl=60,
+                                    stale_ttl=60, wait_timeout=5, wait_interval=0.01)
+
+
+def slow_loader(calls, value='value', delay=0.2):
+    def loader():
+        with calls['lock']:
+            calls['count'] += 1
+        time.sleep(delay)
+        return value
+    return loader
+
+
+def read_concurrently(cache, loader, readers=8):
+    results = []
+
+    def read():
+        results.append(cache.get_or_load('stats', 'IT', {}, loader))
+
+    threads = [threading.Thread(target=read) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_miss_is_loaded_once(cache):
+    calls = {'count': 0, 'lock': threading.Lock()}
+    results = read_concurrently(cache, slow_loader(calls))
+    assert results == ['value'] * 8
+    assert calls['count'] == 1
+    status = cache.status()
+    assert status['misses'] == 8
+    assert status['waits'] == 7
+
+
+def test_invalidation_is_reloaded_once(cache):
+    calls = {'count': 0, 'lock': threading.Lock()}
+    cache.get_or_load('stats', 'IT', {}, slow_loader(calls, delay=0))
+    assert cache.invalidate(country_code='IT') == 1
+    results = read_concurrently(cache, slow_loader(calls, value='new'))
+    assert results == ['new'] * 8
+    assert calls['count'] == 2
+
+
+def test_waiters_load_after_the_wait_timeout(cache):
+    cache.wait_timeout = 0.05
+    key = shared_cache.make_key('stats', 'IT', {})
+    # Lock left by a worker that died while loading
+    assert cache.backend.try_lock(key)
+    assert cache.get_or_load('stats', 'IT', {}, lambda: 'value') == 'value'
+    assert cache.status()['wait_timeouts'] == 1
+    assert cache.get_or_load('stats', 'IT', {}, lambda: 'other') == 'value'
+
+
+def test_failed_load_releases_the_lock(cache):
+    def failing_loader():
+        raise RuntimeError('query failed')
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('stats', 'IT', {}, failing_loader)
+    assert cache.backend.try_lock(shared_cache.make_key('stats', 'IT', {}))
+
+
+def test_stale_entry_is_served_while_another_worker_refreshes(cache):
+    cache.ttl = 0
+    cache.get_or_load('stats', 'IT', {}, lambda: 'old')
+    key = shared_cache.make_key('stats', 'IT', {})
+    assert cache.backend.try_lock(key)
+    assert cache.get_or_load('stats', 'IT', {}, lambda: 'new') == 'old'
+    cache.backend.release(key)
+    assert cache.get_or_load('stats', 'IT', {}, lambda: 'new') == 'new'
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the query builders of sql_queries: pure helpers, and queries run on Postgres when
+                TEST_DATABASE_URL is set (see conftest.py)
+"""
+
+from decimal import Decimal
+
+from api.lib import sql_queries
+
+# Tables and columns read by get_doctors_with_slots_query
+SLOTS_SCHEMA = """
+    CREATE TABLE doctors.doctors (
+        doctor_id bigint PRIMARY KEY, salutation text, given_name text, surname text, full_name text, gender text,
+        rate numeric(3,2), branding boolean, has_slots boolean, allow_questions boolean, url text
+    );
+    CREATE TABLE doctors.clinics (
+        clinic_id bigint PRIMARY KEY, clinic_name text, street text, city_name text, post_code text, province text,
+        latitude numeric, longitude numeric, calendar_active boolean, online_payment boolean, non_doctor boolean,
+        default_fee numeric, fee numeric, has_slots boolean, nearest_slot_date timestamp
+    );
+    CREATE TABLE doctors.doctors_clinics_map (doctor_id bigint, clinic_id bigint);
+    CREATE TABLE doctors.specializations (
+        specialization_id bigint PRIMARY KEY, specialization_name text, name_plural text, is_popular boolean
+    );
+    CREATE TABLE doctors.doctors_specializations_map (doctor_id bigint, specialization_id bigint);
+    CREATE TABLE doctors.service_options (service_id bigint PRIMARY KEY, option_name text, description text);
+    CREATE TABLE doctors.clinics_service_options_map (
+        clinic_id bigint, doctor_id bigint, service_id bigint, service_price text, service_price_decimal numeric,
+        is_price_from boolean, is_default boolean
+    );
+    CREATE TABLE doctors.enrichment_state (
+        doctor_id bigint, country_code text, google_place_id text, enriched_at timestamp,
+        last_enrichment_update timestamp, google_business_name text, google_rating numeric,
+        google_reviews_count integer
+    );
+"""
+
+
+def test_escape_like_escapes_wildcards_and_backslash():
+    assert sql_queries.escape_like('50%_off\\') == '50\\%\\_off\\\\'
+
+
+def test_escape_like_leaves_plain_text():
+    assert sql_queries.escape_like("Rossi d'Amico") == "Rossi d'Amico"
+
+
+def test_name_search_condition_uses_escaped_pattern():
+    params = {}
+    condition = sql_queries.name_search_condition('a%b', params)
+    assert params['search_pattern'] == '%a\\%b%'
+    assert 'd.full_name ILIKE %(search_pattern)s' in condition
+
+
+def test_name_relevance_expression_on_the_given_alias():
+    params = {}
+    expression = sql_queries.name_relevance_expression('rossi', params, alias='p')
+    assert params == {'search_term': 'rossi'}
+    assert 'word_similarity(%(search_term)s, p.surname)' in expression
+
+
+def test_keyset_condition_with_rate():
+    params = {}
+    condition = sql_queries.keyset_condition((Decimal('4.5'), 10), params, alias='p')
+    assert params == {'cursor_rate': Decimal('4.5'), 'cursor_doctor_id': 10}
+    assert condition.startswith('(p.rate < %(cursor_rate)s')
+
+
+def test_keyset_condition_with_null_rate():
+    params = {}
+    condition = sql_queries.keyset_condition((None, 10), params)
+    assert params == {'cursor_doctor_id': 10}
+    assert condition == '(d.rate IS NOT NULL OR d.doctor_id > %(cursor_doctor_id)s)'
+
+
+def test_slots_city_page_skips_doctors_with_slots_outside_the_city(postgres_cursor):
+    cursor = postgres_cursor
+    cursor.execute(SLOTS_SCHEMA)
+    cursor.execute("""
+        INSERT INTO doctors.doctors (doctor_id, full_name, rate, has_slots) VALUES
+            (1, 'Slots in Milano, clinic without slots in Roma', 5.0, false),
+            (2, 'Slots in Roma', 4.0, false),
+            (3, 'Slots on the doctor', 3.0, true),
+            (4, 'Slots in Roma too', 2.0, false);
+        INSERT INTO doctors.clinics (clinic_id, city_name, has_slots) VALUES
+            (10, 'Milano', true), (11, 'Roma', false), (12, 'Roma', true);
+        INSERT INTO doctors.doctors_clinics_map (doctor_id, clinic_id) VALUES
+            (1, 10), (1, 11), (2, 12), (3, 11), (4, 12);
+    """)
+
+    def page(cursor_key=None):
+        query, params = sql_queries.get_doctors_with_slots_query(city='Roma', limit=2, cursor=cursor_key)
+        cursor.execute(query, params)
+        return [(row['rate'], row['doctor_id']) for row in cursor.fetchall()]
+
+    # Doctor 1 has slots only outside Roma: it must not take a place in the page
+    first_page = page()
+    assert [doctor_id for rate, doctor_id in first_page] == [2, 3]
+    assert [doctor_id for rate, doctor_id in page(first_page[-1])] == [4]
+
+
+def test_slots_without_city_keeps_doctors_with_slots_anywhere(postgres_cursor):
+    cursor = postgres_cursor
+    cursor.execute(SLOTS_SCHEMA)
+    cursor.execute("""
+        INSERT INTO doctors.doctors (doctor_id, rate, has_slots) VALUES (1, 5.0, false), (2, 4.0, false);
+        INSERT INTO doctors.clinics (clinic_id, city_name, has_slots) VALUES (10, 'Milano', true), (11, 'Roma', false);
+        INSERT INTO doctors.doctors_clinics_map (doctor_id, clinic_id) VALUES (1, 10), (1, 11), (2, 11);
+    """)
+    query, params = sql_queries.get_doctors_with_slots_query()
+    cursor.execute(query, params)
+    rows = cursor.fetchall()
+    assert [(row['doctor_id'], row['clinic_id']) for row in rows] == [(1, 10)]
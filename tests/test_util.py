@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@Description:   Tests of the cursor pagination helpers of util
+"""
+
+from decimal import Decimal
+
+import pytest
+from flask import Flask
+
+from api.lib import util, error_handlers
+
+
+def rows(*keys):
+    return [{'rate': rate, 'doctor_id': doctor_id} for rate, doctor_id in keys]
+
+
+def test_cursor_round_trip():
+    assert util.decode_cursor(util.encode_cursor(Decimal('4.50'), 42)) == (Decimal('4.50'), 42)
+    assert util.decode_cursor(util.encode_cursor(None, 7)) == (None, 7)
+
+
+def test_encode_cursor_is_url_safe_without_padding():
+    cursor = util.encode_cursor(Decimal('3.25'), 123456)
+    assert '=' not in cursor and '+' not in cursor and '/' not in cursor
+
+
+@pytest.mark.parametrize('cursor', [None, ''])
+def test_decode_cursor_of_the_first_page(cursor):
+    assert util.decode_cursor(cursor) is None
+
+
+@pytest.mark.parametrize('payload', ['not base64!', 'WzEsMiwzXQ', 'WyJOYU4iLDFd', 'WyIxIix0cnVlXQ', 'WyIxIiwiMiJd'])
+def test_decode_cursor_rejects_invalid_tokens(payload):
+    # [1,2,3], ["NaN",1], ["1",true], ["1","2"]
+    with Flask(__name__).app_context(), pytest.raises(error_handlers.InvalidAPIUsage) as excinfo:
+        util.decode_cursor(payload)
+    assert excinfo.value.status_code == 400
+
+
+def test_paginate_without_limit():
+    items = rows((5, 1), (4, 2))
+    assert util.paginate(items, None) == (items, None)
+
+
+def test_paginate_with_non_positive_limit():
+    assert util.paginate(rows((5, 1)), 0) == ([], None)
+
+
+def test_paginate_last_page_has_no_cursor():
+    items = rows((5, 1), (4, 2))
+    assert util.paginate(items, 2) == (items, None)
+
+
+def test_paginate_cuts_after_limit_doctors():
+    items = rows((5, 1), (4, 2), (4, 3))
+    page, cursor = util.paginate(items, 2)
+    assert page == items[:2]
+    assert util.decode_cursor(cursor) == (Decimal('4'), 2)
+
+
+def test_paginate_keeps_rows_of_the_same_doctor_together():
+    # Joined rows: doctor 1 has two clinics
+    items = rows((5, 1), (5, 1), (4, 2), (3, 3))
+    page, cursor = util.paginate(items, 2)
+    assert page == items[:3]
+    assert util.decode_cursor(cursor) == (Decimal('4'), 2)
+
+
+def test_paginate_with_key_function():
+    items = [{'doctor': {'id': 1, 'rate': None}}, {'doctor': {'id': 2, 'rate': None}}]
+    page, cursor = util.paginate(items, 1, key=lambda item: (item['doctor']['rate'], item['doctor']['id']))
+    assert page == items[:1]
+    assert util.decode_cursor(cursor) == (None, 1)